@@ -69,9 +69,83 @@ def _retry_if_not_cancelled_and_failed(retry_state):
     return False
 
 
-def verify_file(path: Path, sha3_256: str):
-    if not path.exists():
-        return False
+class VerifiedAssetManifest:
+    """Persisted record of asset files whose SHA3-256 has already been checked.
+
+    Hashing every font and model on each access costs seconds per document.
+    A file is trusted without re-hashing while its size, mtime and inode are
+    unchanged since it was last verified against the same digest.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamps: dict[str, dict] | None = None
+
+    @staticmethod
+    def _stamp(path: Path, sha3_256: str) -> dict | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "inode": st.st_ino,
+            "sha3_256": sha3_256,
+        }
+
+    def _load(self) -> dict[str, dict]:
+        if self._stamps is None:
+            import orjson
+
+            try:
+                self._stamps = orjson.loads(self.path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                self._stamps = {}
+        return self._stamps
+
+    def _save(self):
+        import orjson
+
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            tmp_path.write_bytes(orjson.dumps(self._stamps))
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.debug(f"Failed to save verified asset manifest: {e}")
+
+    def is_verified(self, path: Path, sha3_256: str) -> bool:
+        stamp = self._stamp(path, sha3_256)
+        with self._lock:
+            return stamp is not None and self._load().get(str(path)) == stamp
+
+    def mark_verified(self, path: Path, sha3_256: str):
+        stamp = self._stamp(path, sha3_256)
+        if stamp is None:
+            return
+        with self._lock:
+            stamps = self._load()
+            if stamps.get(str(path)) != stamp:
+                stamps[str(path)] = stamp
+                self._save()
+
+    def forget(self, path: Path):
+        with self._lock:
+            if self._load().pop(str(path), None) is not None:
+                self._save()
+
+    def entries(self) -> list[tuple[Path, str]]:
+        with self._lock:
+            return [(Path(k), v["sha3_256"]) for k, v in self._load().items()]
+
+
+verified_asset_manifest = VerifiedAssetManifest(
+    get_cache_file_path("verified_assets.json", "assets")
+)
+
+
+def _hash_file(path: Path) -> str:
     hash_ = hashlib.sha3_256()
     with path.open("rb") as f:
         while True:
@@ -79,7 +153,46 @@ def verify_file(path: Path, sha3_256: str):
             if not chunk:
                 break
             hash_.update(chunk)
-    return hash_.hexdigest() == sha3_256
+    return hash_.hexdigest()
+
+
+def verify_file(path: Path, sha3_256: str, full: bool = False):
+    """Check ``path`` against ``sha3_256``.
+
+    Unless ``full`` is set, files recorded in the verified asset manifest with
+    an unchanged size, mtime and inode are not hashed again.
+    """
+    if not path.exists():
+        return False
+    if not full and verified_asset_manifest.is_verified(path, sha3_256):
+        return True
+    if _hash_file(path) != sha3_256:
+        verified_asset_manifest.forget(path)
+        return False
+    verified_asset_manifest.mark_verified(path, sha3_256)
+    return True
+
+
+def reverify_assets() -> list[Path]:
+    """Fully re-hash every asset in the manifest, returning the corrupted ones.
+
+    Corrupted files are dropped from the manifest so the next access downloads
+    them again.
+    """
+    corrupted = []
+    for path, sha3_256 in verified_asset_manifest.entries():
+        if path.exists() and not verify_file(path, sha3_256, full=True):
+            logger.warning(f"Asset {path} is corrupted, it will be downloaded again")
+            corrupted.append(path)
+    return corrupted
+
+
+def start_background_reverify() -> threading.Thread:
+    thread = threading.Thread(
+        target=reverify_assets, name="babeldoc-asset-reverify", daemon=True
+    )
+    thread.start()
+    return thread
 
 
 @retry(
@@ -208,6 +321,51 @@ async def get_doclayout_onnx_model_path_async(client: httpx.AsyncClient | None =
     return onnx_path
 
 
+def _quantize_onnx_model(model_path: Path, output_path: Path):
+    from onnxruntime.quantization import QuantType
+    from onnxruntime.quantization import quantize_dynamic
+
+    tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+    try:
+        # Dynamic quantization turns the convolutions into ConvInteger, which
+        # has no CPU kernel for signed weights and is not faster than FP32 on
+        # every CPU, see babeldoc/tools/benchmark_doclayout.py.
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QUInt8)
+        tmp_path.replace(output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+async def get_doclayout_int8_onnx_model_path_async(
+    client: httpx.AsyncClient | None = None,
+):
+    """Return the INT8 layout model, quantizing the FP32 model on first use.
+
+    No INT8 model is published upstream, so its SHA3-256 is recorded in a
+    sidecar file when it is produced and checked like any downloaded asset.
+    The hash is computed from the written file, so it only catches later
+    truncation or corruption, not a bad quantization.
+    """
+    onnx_path = get_cache_file_path(
+        "doclayout_yolo_docstructbench_imgsz1024_int8.onnx", "models"
+    )
+    sha3_path = onnx_path.with_name(f"{onnx_path.name}.sha3_256")
+    try:
+        if verify_file(onnx_path, sha3_path.read_text().strip()):
+            return onnx_path
+    except OSError:
+        pass
+
+    fp32_path = await get_doclayout_onnx_model_path_async(client)
+    logger.info("doclayout int8 onnx model not found or corrupted, quantizing...")
+    await asyncio.to_thread(_quantize_onnx_model, fp32_path, onnx_path)
+    sha3_256 = _hash_file(onnx_path)
+    sha3_path.write_text(sha3_256)
+    verified_asset_manifest.mark_verified(onnx_path, sha3_256)
+    logger.info(f"Quantized doclayout onnx model to {onnx_path}")
+    return onnx_path
+
+
 async def get_table_detection_rapidocr_model_path_async(
     client: httpx.AsyncClient | None = None,
 ):
@@ -234,6 +392,10 @@ def get_doclayout_onnx_model_path():
     return run_coro(get_doclayout_onnx_model_path_async())
 
 
+def get_doclayout_int8_onnx_model_path():
+    return run_coro(get_doclayout_int8_onnx_model_path_async())
+
+
 def get_table_detection_rapidocr_model_path():
     return run_coro(get_table_detection_rapidocr_model_path_async())
 
@@ -323,9 +485,9 @@ async def download_all_fonts_async(client: httpx.AsyncClient | None = None):
 
 async def async_warmup():
     logger.info("Downloading all assets...")
-    from tiktoken import encoding_for_model
+    from babeldoc.translator.tokenizer import get_tokenizer
 
-    _ = encoding_for_model("gpt-4o")
+    _ = get_tokenizer()
     async with httpx.AsyncClient() as client:
         onnx_task = asyncio.create_task(get_doclayout_onnx_model_path_async(client))
         onnx_task2 = asyncio.create_task(
@@ -387,7 +549,7 @@ async def generate_offline_assets_package_async(output_directory: Path | None =
                 file_name = file_desc["name"]
                 sha3_256 = file_desc["sha3_256"]
                 file_path = get_cache_file_path(file_name, file_type)
-                if not verify_file(file_path, sha3_256):
+                if not verify_file(file_path, sha3_256, full=True):
                     logger.error(f"File {file_path} is corrupted")
                     exit(1)
 
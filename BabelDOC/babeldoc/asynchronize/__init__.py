@@ -1,4 +1,6 @@
 import asyncio
+import concurrent.futures
+import threading
 import time
 
 
@@ -49,3 +51,47 @@ class AsyncCallback:
 
         result = await self.queue.get()
         return result
+
+
+class BackgroundEventLoop:
+    """An asyncio event loop running forever in a daemon thread.
+
+    Synchronous code hands coroutines to the loop with ``submit`` (returns a
+    ``concurrent.futures.Future``) or ``run`` (blocks until the result is ready).
+    """
+
+    def __init__(self, name: str = "babeldoc-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError(
+                "BackgroundEventLoop.run would block its own event loop, await the coroutine instead"
+            )
+        return self.submit(coro).result()
+
+
+_background_loop: BackgroundEventLoop | None = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundEventLoop:
+    """Return the process-wide background event loop, starting it on first use."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundEventLoop()
+        return _background_loop
@@ -38,17 +38,32 @@ class YoloBox:
 
 
 class DocLayoutModel(abc.ABC):
+    # Identifies the model and its settings in the layout result cache, None
+    # disables caching
+    cache_id: str | None = None
+
     @staticmethod
-    def load_onnx():
-        logger.info("Loading ONNX model...")
+    def load_onnx(quantized: bool = False, **kwargs):
+        """Return the layout model, loaded once per process for each configuration."""
         from babeldoc.docvision.doclayout import OnnxModel
+        from babeldoc.docvision.model_registry import model_registry
+
+        def load():
+            logger.info("Loading ONNX model...")
+            return OnnxModel.from_pretrained(quantized=quantized, **kwargs)
 
-        model = OnnxModel.from_pretrained()
-        return model
+        key = ("doclayout", quantized, *sorted(kwargs.items()))
+        return model_registry.get(key, load)
 
     @staticmethod
-    def load_available():
-        return DocLayoutModel.load_onnx()
+    def load_available(quantized: bool = False):
+        """Load the local layout model.
+
+        With ``quantized`` the INT8 variant is used, which may place some
+        boxes differently and is not faster on every CPU;
+        ``babeldoc/tools/benchmark_doclayout.py`` measures both.
+        """
+        return DocLayoutModel.load_onnx(quantized=quantized)
 
     @property
     @abc.abstractmethod
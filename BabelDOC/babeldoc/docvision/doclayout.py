@@ -1,19 +1,23 @@
 import ast
 import logging
+import os
 import platform
 import re
 import threading
+from collections import deque
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import cv2
 import numpy as np
 
 from babeldoc.docvision.base_doclayout import DocLayoutModel
 from babeldoc.docvision.base_doclayout import YoloResult
-from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
+from babeldoc.docvision.model_registry import create_inference_session
+from babeldoc.docvision.model_registry import make_session_options
 
 try:
-    import onnx
     import onnxruntime
 except ImportError as e:
     if "DLL load failed" in str(e):
@@ -25,6 +29,7 @@ except ImportError as e:
 import pymupdf
 
 import babeldoc.format.pdf.document_il.il_version_1
+from babeldoc.assets.assets import get_doclayout_int8_onnx_model_path
 from babeldoc.assets.assets import get_doclayout_onnx_model_path
 
 # from huggingface_hub import hf_hub_download
@@ -37,13 +42,18 @@ os_name = platform.system()
 
 
 class OnnxModel(DocLayoutModel):
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        batch_size: int = 8,
+        intra_op_num_threads: int | None = None,
+        inter_op_num_threads: int | None = None,
+        prefetch_workers: int | None = None,
+    ):
         self.model_path = model_path
+        model_file = Path(model_path)
+        self.cache_id = f"onnx:{model_file.name}:{model_file.stat().st_size}"
 
-        model = onnx.load(model_path)
-        metadata = {d.key: d.value for d in model.metadata_props}
-        self._stride = ast.literal_eval(metadata["stride"])
-        self._names = ast.literal_eval(metadata["names"])
         providers = []
 
         available_providers = onnxruntime.get_available_providers()
@@ -51,16 +61,39 @@ class OnnxModel(DocLayoutModel):
             if re.match(r"dml|cuda|cpu", provider, re.IGNORECASE):
                 logger.info(f"Available Provider: {provider}")
                 providers.append(provider)
-        self.model = onnxruntime.InferenceSession(
-            model.SerializeToString(),
-            providers=providers,
+        self.model = create_inference_session(
+            model_path,
+            make_session_options(intra_op_num_threads, inter_op_num_threads),
+            providers,
         )
+        metadata = self.model.get_modelmeta().custom_metadata_map
+        self._stride = ast.literal_eval(metadata["stride"])
+        self._names = ast.literal_eval(metadata["names"])
+        # Models exported with a fixed batch dimension can only take one image
+        # per run; a symbolic or missing dimension means any batch size works.
+        batch_dim = self.model.get_inputs()[0].shape[0]
+        self.supports_batching = not isinstance(batch_dim, int) or batch_dim <= 0
+        self.batch_size = max(1, batch_size) if self.supports_batching else 1
+        self.prefetch_workers = prefetch_workers or min(4, os.cpu_count() or 1)
         self.lock = threading.Lock()
 
     @staticmethod
-    def from_pretrained():
-        pth = get_doclayout_onnx_model_path()
-        return OnnxModel(pth)
+    def from_pretrained(quantized: bool = False, **kwargs):
+        if quantized:
+            pth = get_doclayout_int8_onnx_model_path()
+        else:
+            pth = get_doclayout_onnx_model_path()
+        model = OnnxModel(pth, **kwargs)
+        model.warmup()
+        return model
+
+    def warmup(self, imgsz: int = 1024):
+        """Run one inference on a blank page.
+
+        ONNX Runtime sizes its memory arena and initializes kernels on the
+        first run, which would otherwise slow down the first real page.
+        """
+        self.predict(np.full((imgsz, imgsz * 3 // 4, 3), 255, np.uint8), imgsz)
 
     @property
     def stride(self):
@@ -140,14 +173,62 @@ class OnnxModel(DocLayoutModel):
         boxes[..., :4] = (boxes[..., :4] - [pad_x, pad_y, pad_x, pad_y]) / gain
         return boxes
 
-    def predict(self, image, imgsz=800, batch_size=16, **kwargs):
+    def preprocess(self, image: np.ndarray, imgsz: int = 1024) -> np.ndarray:
+        """Letterbox one BGR image and return it as a normalized CHW float array."""
+        pix = self.resize_and_pad_image(image, new_shape=imgsz)
+        pix = np.transpose(pix, (2, 0, 1))  # CHW
+        return pix.astype(np.float32) / 255.0  # Normalize to [0, 1]
+
+    def postprocess(self, preds, input_shape, orig_shape) -> YoloResult:
+        preds = preds[preds[..., 4] > 0.25]
+        if len(preds) > 0:
+            preds[..., :4] = self.scale_boxes(input_shape, preds[..., :4], orig_shape)
+        return YoloResult(boxes_data=preds, names=self._names)
+
+    def predict_preprocessed(
+        self,
+        inputs: list[np.ndarray],
+        orig_shapes: list[tuple[int, int]],
+        batch_size: int | None = None,
+    ) -> list[YoloResult]:
+        """Run inference on images already passed through :meth:`preprocess`.
+
+        Inputs are grouped into buckets of identical letterboxed shape so each
+        bucket can be stacked into real batches of up to ``batch_size`` images.
+        Results are returned in input order.
+        """
+        if not self.supports_batching:
+            batch_size = 1
+        else:
+            batch_size = max(1, batch_size or self.batch_size)
+
+        buckets: dict[tuple[int, ...], list[int]] = {}
+        for i, pix in enumerate(inputs):
+            buckets.setdefault(pix.shape, []).append(i)
+
+        results: list[YoloResult | None] = [None] * len(inputs)
+        for shape, indices in buckets.items():
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start : start + batch_size]
+                batch_input = np.stack([inputs[i] for i in chunk], axis=0)  # BCHW
+                batch_preds = self.model.run(None, {"images": batch_input})[0]
+                for j, i in enumerate(chunk):
+                    results[i] = self.postprocess(
+                        batch_preds[j],
+                        shape[1:],
+                        orig_shapes[i],
+                    )
+        return results
+
+    def predict(self, image, imgsz=1024, batch_size=None, **kwargs):
         """
         Predict the layout of document pages.
 
         Args:
             image: A single image or a list of images of document pages.
             imgsz: Resize the image to this size. Must be a multiple of the stride.
-            batch_size: Number of images to process in one batch.
+            batch_size: Number of images to process in one batch. Defaults to
+                the batch size the model was loaded with.
             **kwargs: Additional arguments.
 
         Returns:
@@ -157,51 +238,9 @@ class OnnxModel(DocLayoutModel):
         if isinstance(image, np.ndarray) and len(image.shape) == 3:
             image = [image]
 
-        total_images = len(image)
-        results = []
-        batch_size = 1
-
-        # Process images in batches
-        for i in range(0, total_images, batch_size):
-            batch_images = image[i : i + batch_size]
-            batch_size_actual = len(batch_images)
-
-            # Calculate target size based on the maximum height in the batch
-            max_height = max(img.shape[0] for img in batch_images)
-            target_imgsz = 1024
-
-            # Preprocess batch
-            processed_batch = []
-            orig_shapes = []
-            for img in batch_images:
-                orig_h, orig_w = img.shape[:2]
-                orig_shapes.append((orig_h, orig_w))
-
-                pix = self.resize_and_pad_image(img, new_shape=target_imgsz)
-                pix = np.transpose(pix, (2, 0, 1))  # CHW
-                pix = pix.astype(np.float32) / 255.0  # Normalize to [0, 1]
-                processed_batch.append(pix)
-
-            # Stack batch
-            batch_input = np.stack(processed_batch, axis=0)  # BCHW
-            new_h, new_w = batch_input.shape[2:]
-
-            # Run inference
-            batch_preds = self.model.run(None, {"images": batch_input})[0]
-
-            # Process each prediction in the batch
-            for j in range(batch_size_actual):
-                preds = batch_preds[j]
-                preds = preds[preds[..., 4] > 0.25]
-                if len(preds) > 0:
-                    preds[..., :4] = self.scale_boxes(
-                        (new_h, new_w),
-                        preds[..., :4],
-                        orig_shapes[j],
-                    )
-                results.append(YoloResult(boxes_data=preds, names=self._names))
-
-        return results
+        inputs = [self.preprocess(img, imgsz) for img in image]
+        orig_shapes = [img.shape[:2] for img in image]
+        return self.predict_preprocessed(inputs, orig_shapes, batch_size)
 
     def handle_document(
         self,
@@ -212,20 +251,55 @@ class OnnxModel(DocLayoutModel):
     ) -> Generator[
         tuple[babeldoc.format.pdf.document_il.il_version_1.Page, YoloResult], None, None
     ]:
-        for page in pages:
+        """Detect layouts page by page with rendering pipelined ahead of inference.
+
+        A small thread pool renders and letterboxes up to two batches of pages
+        ahead while the current batch runs through the session, so the model
+        never waits on MuPDF. Pages are yielded in their original order.
+        """
+        raster_cache = translate_config.get_page_raster_cache(mupdf_doc)
+
+        def prepare(page):
             translate_config.raise_if_cancelled()
-            with self.lock:
-                # pix = mupdf_doc[page.page_number].get_pixmap(dpi=72)
-                pix = get_no_rotation_img(mupdf_doc[page.page_number])
-            image = np.frombuffer(pix.samples, np.uint8).reshape(
-                pix.height,
-                pix.width,
-                3,
-            )[:, :, ::-1]
-            predict_result = self.predict(image)[0]
-            save_debug_image(
-                image,
-                predict_result,
-                page.page_number + 1,
-            )
-            yield page, predict_result
+            image = raster_cache.get_image(page.page_number)
+            return image, self.preprocess(image)
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.prefetch_workers,
+            thread_name_prefix="doclayout-prefetch",
+        )
+        lookahead = 2 * self.batch_size
+        page_iter = iter(pages)
+        pending = deque()
+
+        def fill():
+            while len(pending) < lookahead:
+                page = next(page_iter, None)
+                if page is None:
+                    return
+                pending.append((page, executor.submit(prepare, page)))
+
+        try:
+            fill()
+            while pending:
+                translate_config.raise_if_cancelled()
+                chunk = [
+                    pending.popleft() for _ in range(min(self.batch_size, len(pending)))
+                ]
+                fill()
+                prepared = [(page, *future.result()) for page, future in chunk]
+                results = self.predict_preprocessed(
+                    [pix for _, _, pix in prepared],
+                    [image.shape[:2] for _, image, _ in prepared],
+                )
+                for (page, image, _), predict_result in zip(
+                    prepared, results, strict=True
+                ):
+                    save_debug_image(
+                        image,
+                        predict_result,
+                        page.page_number + 1,
+                    )
+                    yield page, predict_result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,289 @@
+"""Persistent cache of layout and table detection results.
+
+Detection is by far the slowest step before translation and its result only
+depends on the page raster and the model. Results are stored in SQLite keyed
+by a hash of both, so re-running a document, or a revision sharing most of its
+pages, skips inference for unchanged pages. Least recently used entries are
+evicted once the cache grows beyond its size limit.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import msgpack
+import numpy as np
+from peewee import BlobField
+from peewee import CharField
+from peewee import FloatField
+from peewee import IntegerField
+from peewee import Model
+from peewee import SqliteDatabase
+from peewee import fn
+
+from babeldoc.const import CACHE_FOLDER
+from babeldoc.docvision.base_doclayout import YoloBox
+from babeldoc.docvision.base_doclayout import YoloResult
+
+logger = logging.getLogger(__name__)
+
+
+class _LayoutCacheEntry(Model):
+    # digest of model id, page raster and extra key data
+    key = CharField(max_length=32, primary_key=True)
+    # msgpack of class names and float32 boxes (x0, y0, x1, y1, conf, cls)
+    data = BlobField()
+    size = IntegerField()
+    last_used = FloatField(index=True)
+
+
+class LayoutResultCache:
+    # SQLite limits the number of variables per statement.
+    _chunk_size = 500
+
+    def __init__(self, path: Path, max_bytes: int = 64 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db: SqliteDatabase | None = None
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    @staticmethod
+    def make_key(model_id: str, image: np.ndarray, extra=None) -> str:
+        """Build the cache key of a page.
+
+        :param model_id: identifies the model and its settings
+        :param image: page raster the model works on
+        :param extra: any other input that affects the result
+        """
+        hash_ = hashlib.sha256()
+        hash_.update(repr((model_id, image.shape, extra)).encode("utf-8"))
+        hash_.update(np.ascontiguousarray(image).data)
+        return hash_.hexdigest()[:32]
+
+    @staticmethod
+    def encode(result: YoloResult) -> bytes:
+        boxes = np.array(
+            [[*box.xyxy, box.conf, box.cls] for box in result.boxes], np.float32
+        ).reshape(-1, 6)
+        names = result.names
+        if isinstance(names, dict):
+            names = list(names.items())
+        else:
+            names = list(enumerate(names))
+        return msgpack.packb({"names": names, "boxes": boxes.tobytes()})
+
+    @staticmethod
+    def decode(data: bytes) -> YoloResult:
+        value = msgpack.unpackb(data)
+        boxes = np.frombuffer(value["boxes"], np.float32).reshape(-1, 6)
+        return YoloResult(
+            names=dict(value["names"]),
+            boxes=[
+                YoloBox(xyxy=row[:4], conf=row[4], cls=int(row[5])) for row in boxes
+            ],
+        )
+
+    def _get_db(self) -> SqliteDatabase:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = SqliteDatabase(
+                self.path,
+                pragmas={
+                    "journal_mode": "wal",
+                    "busy_timeout": 1000,
+                },
+                check_same_thread=False,
+            )
+            with self._db.bind_ctx([_LayoutCacheEntry]):
+                self._db.create_tables([_LayoutCacheEntry], safe=True)
+        return self._db
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, YoloResult]:
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        try:
+            with self._lock:
+                db = self._get_db()
+                with db.bind_ctx([_LayoutCacheEntry]), db.atomic():
+                    for i in range(0, len(keys), self._chunk_size):
+                        chunk = keys[i : i + self._chunk_size]
+                        rows = _LayoutCacheEntry.select(
+                            _LayoutCacheEntry.key, _LayoutCacheEntry.data
+                        ).where(_LayoutCacheEntry.key.in_(chunk))
+                        for row in rows:
+                            result[row.key] = self.decode(row.data)
+                        _LayoutCacheEntry.update(last_used=time.time()).where(
+                            _LayoutCacheEntry.key.in_(chunk)
+                        ).execute()
+        except Exception as e:
+            logger.warning(f"read layout cache failed, ignore it: {e}")
+        return result
+
+    def put(self, key: str, result: YoloResult):
+        data = self.encode(result)
+        try:
+            with self._lock:
+                db = self._get_db()
+                with db.bind_ctx([_LayoutCacheEntry]), db.atomic():
+                    if self._total_bytes is None:
+                        self._total_bytes = (
+                            _LayoutCacheEntry.select(
+                                fn.COALESCE(fn.SUM(_LayoutCacheEntry.size), 0)
+                            ).scalar()
+                            or 0
+                        )
+                    old = _LayoutCacheEntry.get_or_none(_LayoutCacheEntry.key == key)
+                    if old is not None:
+                        self._total_bytes -= old.size
+                    _LayoutCacheEntry.replace(
+                        key=key, data=data, size=len(data), last_used=time.time()
+                    ).execute()
+                    self._total_bytes += len(data)
+                    if self._total_bytes > self.max_bytes:
+                        self._evict()
+        except Exception as e:
+            logger.warning(f"write layout cache failed, ignore it: {e}")
+
+    def _evict(self):
+        # Evict down to 90% of the limit so not every put has to evict.
+        target = self.max_bytes * 0.9
+        evicted = []
+        rows = _LayoutCacheEntry.select(
+            _LayoutCacheEntry.key, _LayoutCacheEntry.size
+        ).order_by(_LayoutCacheEntry.last_used)
+        for row in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append(row.key)
+            self._total_bytes -= row.size
+        for i in range(0, len(evicted), self._chunk_size):
+            chunk = evicted[i : i + self._chunk_size]
+            _LayoutCacheEntry.delete().where(_LayoutCacheEntry.key.in_(chunk)).execute()
+        logger.debug(f"Evicted {len(evicted)} layout cache entries")
+
+
+layout_cache = LayoutResultCache(CACHE_FOLDER / "layout_cache.v1.db")
+
+# Pages looked up at once by handle_document_cached for models without a
+# batch size, and how many such windows it looks up ahead of the model.
+LOOKUP_WINDOW = 8
+LOOKUP_WINDOWS_AHEAD = 2
+
+
+def handle_document_cached(
+    model,
+    pages,
+    mupdf_doc,
+    translation_config,
+    save_debug_image,
+    key_extra: Callable | None = None,
+) -> Generator:
+    """``model.handle_document`` that reuses results from :data:`layout_cache`.
+
+    Pages are looked up a window at a time on a background thread, a few
+    windows ahead of the model, and only the misses are fed to the model.
+    Rendering for the keys thus still overlaps inference, and each page is
+    rendered once since the model reads its raster shortly after. Pages are
+    yielded in their original order. Models without a ``cache_id``, e.g.
+    remote ones whose model may change, are never cached.
+
+    :param key_extra: returns the part of a page's input besides its raster
+        that affects the result, if any
+    """
+    model_id = getattr(model, "cache_id", None)
+    if not translation_config.layout_cache or model_id is None:
+        yield from model.handle_document(
+            pages, mupdf_doc, translation_config, save_debug_image
+        )
+        return
+
+    raster_cache = translation_config.get_page_raster_cache(mupdf_doc)
+    window_size = getattr(model, "batch_size", None) or LOOKUP_WINDOW
+
+    def lookup(window):
+        images = []
+        keys = []
+        for page in window:
+            translation_config.raise_if_cancelled()
+            images.append(raster_cache.get_image(page.page_number))
+            keys.append(
+                layout_cache.make_key(
+                    model_id, images[-1], key_extra(page) if key_extra else None
+                )
+            )
+        cached = layout_cache.get_many(keys)
+        # [page, key, result, image]; the model fills in the result of a miss,
+        # the image of a hit is kept for its debug image.
+        entries = []
+        for page, key, image in zip(window, keys, images, strict=True):
+            result = cached.get(key)
+            entries.append([page, key, result, None if result is None else image])
+        return entries
+
+    # Looked up pages not yielded yet, in page order.
+    pending = deque()
+    # Page number -> entry of the pending pages fed to the model.
+    misses = {}
+    hit_count = 0
+
+    def windows():
+        page_iter = iter(pages)
+        while window := list(islice(page_iter, window_size)):
+            yield window
+
+    def take(entries):
+        nonlocal hit_count
+        for entry in entries:
+            pending.append(entry)
+            if entry[2] is None:
+                misses[entry[0].page_number] = entry
+                yield entry[0]
+            else:
+                hit_count += 1
+
+    def missing_pages():
+        lookups = deque()
+        for window in windows():
+            lookups.append(executor.submit(lookup, window))
+            if len(lookups) > LOOKUP_WINDOWS_AHEAD:
+                yield from take(lookups.popleft().result())
+        while lookups:
+            yield from take(lookups.popleft().result())
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="layout-cache")
+    model_results = model.handle_document(
+        missing_pages(), mupdf_doc, translation_config, save_debug_image
+    )
+    model_done = False
+    try:
+        while True:
+            while pending and pending[0][2] is not None:
+                page, _, result, image = pending.popleft()
+                if misses.pop(page.page_number, None) is None:
+                    # The model saved debug images of its pages, numbered from 1.
+                    save_debug_image(image, result, page.page_number + 1)
+                yield page, result
+            if model_done:
+                break
+            try:
+                page, result = next(model_results)
+            except StopIteration:
+                model_done = True
+                continue
+            entry = misses[page.page_number]
+            layout_cache.put(entry[1], result)
+            entry[2] = result
+    finally:
+        model_results.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+    if hit_count:
+        logger.info(f"Layout cache hit for {hit_count} pages")
@@ -0,0 +1,149 @@
+"""Process-wide reuse of loaded vision models and their ONNX Runtime sessions.
+
+Loading the layout model means parsing and optimizing its graph, which takes
+seconds. Every translation in a process shares one instance per model and
+configuration through :data:`model_registry`, and the graph optimized by ONNX
+Runtime is saved to the cache folder so later processes can skip most of the
+optimization.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import platform
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+import onnxruntime
+
+from babeldoc.const import get_cache_file_path
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Loads each model once per process and hands out the shared instance.
+
+    ONNX Runtime sessions are safe to run from several threads, so one model
+    instance can serve concurrent translations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._models: dict[tuple, object] = {}
+
+    def get(self, key: tuple, factory: Callable[[], object]):
+        """Return the model registered under ``key``, loading it with ``factory`` once."""
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Different models load in parallel, the same model only once.
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+            model = factory()
+            with self._lock:
+                self._models[key] = model
+                self._key_locks.pop(key, None)
+            return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+model_registry = ModelRegistry()
+
+
+def make_session_options(
+    intra_op_num_threads: int | None = None,
+    inter_op_num_threads: int | None = None,
+) -> onnxruntime.SessionOptions:
+    """Session options used for all vision models.
+
+    Full graph optimization, the memory arena and memory pattern planning
+    are enabled explicitly; thread counts left as None use the ONNX Runtime
+    defaults.
+    """
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.graph_optimization_level = (
+        onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    )
+    sess_options.enable_cpu_mem_arena = True
+    sess_options.enable_mem_pattern = True
+    if intra_op_num_threads:
+        sess_options.intra_op_num_threads = intra_op_num_threads
+    if inter_op_num_threads:
+        sess_options.inter_op_num_threads = inter_op_num_threads
+        if inter_op_num_threads > 1:
+            sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    return sess_options
+
+
+def _optimized_model_path(model_path: str, providers: list[str]) -> Path:
+    model_path = Path(model_path)
+    st = model_path.stat()
+    key = "\0".join(
+        [
+            str(model_path.resolve()),
+            str(st.st_size),
+            str(st.st_mtime_ns),
+            onnxruntime.__version__,
+            platform.machine(),
+            *providers,
+        ]
+    )
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return get_cache_file_path(f"{model_path.stem}.{digest}.onnx", "onnx_optimized")
+
+
+def _save_optimized_model(model_path: str, path: Path, providers: list[str]):
+    # Only the extended level is saved, the layout optimizations of
+    # ORT_ENABLE_ALL are specific to the CPU they ran on.
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.graph_optimization_level = (
+        onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    )
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    sess_options.optimized_model_filepath = str(tmp_path)
+    try:
+        onnxruntime.InferenceSession(
+            model_path, sess_options=sess_options, providers=providers
+        )
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def create_inference_session(
+    model_path: str,
+    sess_options: onnxruntime.SessionOptions,
+    providers: list[str],
+) -> onnxruntime.InferenceSession:
+    """Create a session, reusing the optimized graph from an earlier process.
+
+    Falls back to the original model whenever the optimized one cannot be
+    written or loaded.
+    """
+    path = None
+    try:
+        path = _optimized_model_path(model_path, providers)
+        if not path.exists():
+            _save_optimized_model(model_path, path, providers)
+            logger.info(f"Saved optimized ONNX model to {path}")
+        return onnxruntime.InferenceSession(
+            str(path), sess_options=sess_options, providers=providers
+        )
+    except Exception as e:
+        logger.warning(f"Optimized ONNX model unavailable, load {model_path}: {e}")
+        if path is not None:
+            with contextlib.suppress(OSError):
+                path.unlink(missing_ok=True)
+    return onnxruntime.InferenceSession(
+        model_path, sess_options=sess_options, providers=providers
+    )
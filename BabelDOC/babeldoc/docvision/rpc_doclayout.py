@@ -1,272 +1,356 @@
+"""Layout detection through a remote layout service.
+
+One client serves every supported service. The wire format is described by a
+:class:`RpcLayoutProtocol`: the MOSEC DocLayout-YOLO service (``/inference``,
+msgpack, several pages per request), the PaddleX layout service
+(``/inference``, msgpack, one page per request) and the OCR matching service
+(``/analyze``, multipart upload, JSON). Requests share one keep-alive HTTP
+connection pool, run on a bounded number of worker threads and are retried
+with exponential backoff on connection errors, rate limiting and server
+errors.
+"""
+
+import json
 import logging
 import threading
+from collections import deque
+from collections.abc import Generator
 from concurrent.futures import ThreadPoolExecutor
-from pathlib import Path
+from itertools import islice
 
 import cv2
 import httpx
 import msgpack
 import numpy as np
 import pymupdf
-from tenacity import retry
-from tenacity import retry_if_exception_type
+from tenacity import Retrying
+from tenacity import retry_if_exception
 from tenacity import stop_after_attempt
 from tenacity import wait_exponential
 
-import babeldoc
+import babeldoc.format.pdf.document_il.il_version_1
 from babeldoc.docvision.base_doclayout import DocLayoutModel
 from babeldoc.docvision.base_doclayout import YoloBox
 from babeldoc.docvision.base_doclayout import YoloResult
-from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_HOST = "http://localhost:8000"
 
-def encode_image(image) -> bytes:
-    """Read and encode image to bytes
+IMAGE_FORMATS = {
+    "jpg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "png": (".png", "image/png", None),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+class RpcLayoutError(Exception):
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
 
-    Args:
-        image: Can be either a file path (str) or numpy array
-    """
-    if isinstance(image, str):
-        if not Path(image).exists():
-            raise FileNotFoundError(f"Image file not found: {image}")
-        img = cv2.imread(image)
-        if img is None:
-            raise ValueError(f"Failed to read image: {image}")
-    else:
-        img = image
-
-    # logger.debug(f"Image shape: {img.shape}")
-    encoded = cv2.imencode(".jpg", img)[1].tobytes()
-    # logger.debug(f"Encoded image size: {len(encoded)} bytes")
-    return encoded
-
-
-@retry(
-    stop=stop_after_attempt(3),  # 最多重试 3 次
-    wait=wait_exponential(
-        multiplier=1, min=1, max=10
-    ),  # 指数退避策略，初始 1 秒，最大 10 秒
-    retry=retry_if_exception_type((httpx.HTTPError, Exception)),  # 针对哪些异常重试
-    before_sleep=lambda retry_state: logger.warning(
-        f"Request failed, retrying in {retry_state.next_action.sleep} seconds... "
-        f"(Attempt {retry_state.attempt_number}/3)"
-    ),
-)
-def predict_layout(
-    image,
-    host: str = "http://localhost:8000",
-    imgsz: int = 1024,
-):
-    """
-    Predict document layout using the MOSEC service
 
-    Args:
-        image: Can be either a file path (str) or numpy array
-        host: Service host URL
-        imgsz: Image size for model input
+def encode_image(image: np.ndarray, image_format: str = "jpg", quality: int = 95):
+    """Encode a BGR image for upload.
 
-    Returns:
-        List of predictions containing bounding boxes and classes
+    ``quality`` applies to JPEG and WebP, PNG is always lossless.
     """
-    # Prepare request data
-    if not isinstance(image, list):
-        image = [image]
-    image_data = [encode_image(image) for image in image]
-    data = {
-        "image": image_data,
-        "imgsz": imgsz,
-    }
-
-    # Pack data using msgpack
-    packed_data = msgpack.packb(data, use_bin_type=True)
-    # logger.debug(f"Packed data size: {len(packed_data)} bytes")
-
-    # Send request
-    # logger.debug(f"Sending request to {host}/inference")
-    response = httpx.post(
-        f"{host}/inference",
-        data=packed_data,
-        headers={
-            "Content-Type": "application/msgpack",
-            "Accept": "application/msgpack",
-        },
-        timeout=300,
-        follow_redirects=True,
+    extension, _, quality_flag = IMAGE_FORMATS[image_format]
+    params = [quality_flag, quality] if quality_flag is not None else []
+    ok, encoded = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {image_format}")
+    return encoded.tobytes()
+
+
+def letterbox(image: np.ndarray, new_shape: tuple[int, int]) -> np.ndarray:
+    """Resize keeping the aspect ratio and pad to ``new_shape`` (height, width)."""
+    h, w = image.shape[:2]
+    new_h, new_w = new_shape
+    r = min(new_h / h, new_w / w)
+    resized_h, resized_w = int(round(h * r)), int(round(w * r))
+    image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+    pad_h = new_h - resized_h
+    pad_w = new_w - resized_w
+    top, bottom = pad_h // 2, pad_h - pad_h // 2
+    left, right = pad_w // 2, pad_w - pad_w // 2
+    return cv2.copyMakeBorder(
+        image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114)
     )
 
-    # logger.debug(f"Response status: {response.status_code}")
-    # logger.debug(f"Response headers: {response.headers}")
 
-    if response.status_code == 200:
-        try:
-            result = msgpack.unpackb(response.content, raw=False)
-            return result
-        except Exception as e:
-            logger.exception(f"Failed to unpack response: {e!s}")
-            raise
-    else:
-        logger.error(f"Request failed with status {response.status_code}")
-        logger.error(f"Response content: {response.content}")
-        raise Exception(
-            f"Request failed with status {response.status_code}: {response.text}",
-        )
+def scale_boxes(img1_shape, boxes, img0_shape):
+    """Map xyxy boxes on a letterboxed ``img1_shape`` image back to ``img0_shape``."""
+    gain = min(img1_shape[0] / img0_shape[0], img1_shape[1] / img0_shape[1])
+    pad_x = round((img1_shape[1] - img0_shape[1] * gain) / 2 - 0.1)
+    pad_y = round((img1_shape[0] - img0_shape[0] * gain) / 2 - 0.1)
+    return (boxes - [pad_x, pad_y, pad_x, pad_y]) / gain
 
 
-class ResultContainer:
-    def __init__(self):
-        self.result = YoloResult(boxes_data=np.array([]), names=[])
+def _labelled_boxes(boxes, coord_key: str, score_key: str, min_score: float):
+    """Convert boxes labelled by name to ``xyxy``/``conf``/``cls`` boxes.
 
+    Class ids are numbered from 1 in order of first appearance.
+    """
+    names = {}
+    ids = {}
+    result = []
+    for box in boxes:
+        if box[score_key] < min_score:
+            continue
+        cls = ids.setdefault(box["label"], len(ids) + 1)
+        names[cls] = box["label"]
+        result.append({"xyxy": box[coord_key], "conf": box[score_key], "cls": cls})
+    return {"boxes": result, "names": names}
+
+
+class RpcLayoutProtocol:
+    """Wire format of a layout service.
+
+    Pages are rendered at ``dpi``. With ``imgsz`` set they are letterboxed to
+    a square of that size before upload, otherwise sent as rendered.
+    """
 
-class RpcDocLayoutModel(DocLayoutModel):
-    """DocLayoutModel implementation that uses RPC service."""
+    dpi = 72
+    imgsz: int | None = None
+    # Pages per request the service accepts
+    max_batch_size = 1
 
-    def __init__(self, host: str = "http://localhost:8000"):
-        """Initialize RPC model with host address."""
-        self.host = host
-        self._stride = 32  # Default stride value
-        self._names = ["text", "title", "list", "table", "figure"]
-        self.lock = threading.Lock()
+    def build_request(self, images: list[bytes], image_format: str) -> dict:
+        """Return keyword arguments for ``httpx.Client.post``."""
+        raise NotImplementedError
 
-    @property
-    def stride(self) -> int:
-        """Stride of the model input."""
-        return self._stride
+    def parse_response(self, response: httpx.Response) -> list[dict]:
+        """Return one ``{"boxes": [...], "names": {...}}`` dict per page."""
+        raise NotImplementedError
 
-    def resize_and_pad_image(self, image, new_shape):
-        """
-        Resize and pad the image to the specified size,
-        ensuring dimensions are multiples of stride.
 
-        Parameters:
-        - image: Input image
-        - new_shape: Target size (integer or (height, width) tuple)
-        - stride: Padding alignment stride, default 32
+class MosecLayoutProtocol(RpcLayoutProtocol):
+    """DocLayout-YOLO served by MOSEC, takes several pages per request."""
 
-        Returns:
-        - Processed image
-        """
-        if isinstance(new_shape, int):
-            new_shape = (new_shape, new_shape)
+    imgsz = 800
+    max_batch_size = 8
 
-        h, w = image.shape[:2]
-        new_h, new_w = new_shape
+    def build_request(self, images, image_format):
+        return {
+            "url": "/inference",
+            "content": msgpack.packb(
+                {"image": images, "imgsz": self.imgsz}, use_bin_type=True
+            ),
+            "headers": {
+                "Content-Type": "application/msgpack",
+                "Accept": "application/msgpack",
+            },
+        }
 
-        # Calculate scaling ratio
-        r = min(new_h / h, new_w / w)
-        resized_h, resized_w = int(round(h * r)), int(round(w * r))
+    def parse_response(self, response):
+        return msgpack.unpackb(response.content, raw=False)
 
-        # Resize image
-        image = cv2.resize(
-            image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR
-        )
 
-        # Calculate padding size
-        pad_h = new_h - resized_h
-        pad_w = new_w - resized_w
-        top, bottom = pad_h // 2, pad_h - pad_h // 2
-        left, right = pad_w // 2, pad_w - pad_w // 2
+class PaddleLayoutProtocol(RpcLayoutProtocol):
+    """PaddleX layout detection service, one page per request."""
 
-        # Add padding
-        image = cv2.copyMakeBorder(
-            image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114)
-        )
+    dpi = 150
 
-        return image
+    def build_request(self, images, image_format):
+        return {
+            "url": "/inference",
+            "content": msgpack.packb({"image": images}, use_bin_type=True),
+            "headers": {
+                "Content-Type": "application/msgpack",
+                "Accept": "application/msgpack",
+            },
+        }
 
-    def scale_boxes(self, img1_shape, boxes, img0_shape):
-        """
-        Rescales bounding boxes (in the format of xyxy by default) from the shape of the image they were originally
-        specified in (img1_shape) to the shape of a different image (img0_shape).
+    def parse_response(self, response):
+        result = msgpack.unpackb(response.content, raw=False)
+        if not isinstance(result, dict):
+            return result
+        return [_labelled_boxes(result["boxes"], "coordinate", "score", 0.7)]
 
-        Args:
-            img1_shape (tuple): The shape of the image that the bounding boxes are for,
-                in the format of (height, width).
-            boxes (torch.Tensor): the bounding boxes of the objects in the image, in the format of (x1, y1, x2, y2)
-            img0_shape (tuple): the shape of the target image, in the format of (height, width).
 
-        Returns:
-            boxes (torch.Tensor): The scaled bounding boxes, in the format of (x1, y1, x2, y2)
-        """
+class AnalyzeLayoutProtocol(RpcLayoutProtocol):
+    """Layout service matching detected blocks against OCR, one page per request."""
+
+    dpi = 150
+
+    def build_request(self, images, image_format):
+        (image,) = images
+        extension, content_type, _ = IMAGE_FORMATS[image_format]
+        return {
+            "url": "/analyze",
+            "params": {"min_sim": 0.7, "early_stop": 0.99, "timeout": 480},
+            "files": {"file": (f"image{extension}", image, content_type)},
+            "headers": {"Accept": "application/json"},
+        }
+
+    def parse_response(self, response):
+        result = json.loads(response.text)
+        if not isinstance(result, dict):
+            return result
+        return [_labelled_boxes(result["boxes"], "coords", "ocr_match_score", 0.7)]
+
 
-        # Calculate scaling ratio
-        gain = min(img1_shape[0] / img0_shape[0], img1_shape[1] / img0_shape[1])
+def _is_retryable(exception: BaseException) -> bool:
+    if isinstance(exception, httpx.TransportError):
+        return True
+    if isinstance(exception, RpcLayoutError):
+        status_code = exception.status_code
+        return status_code is not None and (status_code == 429 or status_code >= 500)
+    return False
 
-        # Calculate padding size
-        pad_x = round((img1_shape[1] - img0_shape[1] * gain) / 2 - 0.1)
-        pad_y = round((img1_shape[0] - img0_shape[0] * gain) / 2 - 0.1)
 
-        # Remove padding and scale boxes
-        boxes = (boxes - [pad_x, pad_y, pad_x, pad_y]) / gain
-        return boxes
+class RpcDocLayoutModel(DocLayoutModel):
+    """DocLayoutModel implementation that uses a remote layout service."""
+
+    # Exponential backoff between attempts of a failed request
+    RETRY_MIN_WAIT_SECONDS = 1
+    RETRY_MAX_WAIT_SECONDS = 10
 
-    def predict_image(
+    def __init__(
         self,
-        image,
-        host: str = None,
-        result_container: ResultContainer | None = None,
-        imgsz: int = 1024,
-    ) -> ResultContainer:
-        """Predict the layout of document pages using RPC service."""
-        if result_container is None:
-            result_container = ResultContainer()
-        target_imgsz = (800, 800)
-        orig_h, orig_w = image.shape[:2]
-        if image.shape[0] != target_imgsz[0] or image.shape[1] != target_imgsz[1]:
-            image = self.resize_and_pad_image(image, new_shape=target_imgsz)
-        preds = predict_layout([image], host=self.host, imgsz=800)
-
-        if len(preds) > 0:
-            for pred in preds:
-                boxes = [
-                    YoloBox(
-                        None,
-                        self.scale_boxes(
-                            (800, 800), np.array(x["xyxy"]), (orig_h, orig_w)
-                        ),
-                        np.array(x["conf"]),
-                        x["cls"],
-                    )
-                    for x in pred["boxes"]
-                ]
-                result_container.result = YoloResult(
+        host: str = DEFAULT_HOST,
+        protocol: RpcLayoutProtocol | None = None,
+        concurrency: int = 16,
+        batch_size: int | None = None,
+        image_format: str = "jpg",
+        image_quality: int = 95,
+        timeout: float = 480,
+        max_attempts: int = 3,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        """
+        Args:
+            host: Base URL of the layout service.
+            protocol: Wire format of the service, MOSEC by default.
+            concurrency: Maximum number of requests in flight.
+            batch_size: Pages per request, capped by what the protocol allows.
+            image_format: Upload format, one of ``jpg``, ``png`` and ``webp``.
+            image_quality: JPEG or WebP quality from 1 to 100.
+            timeout: Seconds to wait for a response.
+            max_attempts: Attempts per request, including the first one.
+            transport: Custom httpx transport, mainly for tests.
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"image_format must be one of {', '.join(IMAGE_FORMATS)}, "
+                f"got {image_format!r}"
+            )
+        self.host = host
+        self.protocol = protocol or MosecLayoutProtocol()
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(
+            1,
+            min(
+                batch_size or self.protocol.max_batch_size, self.protocol.max_batch_size
+            ),
+        )
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_attempts = max_attempts
+        self._stride = 32
+        self._names = ["text", "title", "list", "table", "figure"]
+        self.lock = threading.Lock()
+        self.client = httpx.Client(
+            base_url=host,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=transport,
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="rpc-doclayout"
+        )
+
+    @property
+    def stride(self) -> int:
+        """Stride of the model input."""
+        return self._stride
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.client.close()
+
+    def _send(self, images: list[bytes]) -> list[dict]:
+        request = self.protocol.build_request(images, self.image_format)
+        response = self.client.post(**request)
+        if response.status_code != 200:
+            raise RpcLayoutError(
+                f"Layout request failed with status {response.status_code}: "
+                f"{response.text[:200]}",
+                response.status_code,
+            )
+        preds = self.protocol.parse_response(response)
+        if len(preds) != len(images):
+            raise RpcLayoutError(
+                f"Layout service returned {len(preds)} results for {len(images)} pages"
+            )
+        return preds
+
+    def predict_batch(self, images: list[np.ndarray]) -> list[YoloResult]:
+        """Detect the layouts of images rendered at the protocol's DPI in one request."""
+        imgsz = self.protocol.imgsz
+        sent_shapes = []
+        encoded = []
+        for image in images:
+            if imgsz is not None and image.shape[:2] != (imgsz, imgsz):
+                image = letterbox(image, (imgsz, imgsz))
+            sent_shapes.append(image.shape[:2])
+            encoded.append(encode_image(image, self.image_format, self.image_quality))
+
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(
+                multiplier=self.RETRY_MIN_WAIT_SECONDS,
+                min=self.RETRY_MIN_WAIT_SECONDS,
+                max=self.RETRY_MAX_WAIT_SECONDS,
+            ),
+            retry=retry_if_exception(_is_retryable),
+            before_sleep=lambda retry_state: logger.warning(
+                f"Layout request failed, retrying in "
+                f"{retry_state.next_action.sleep} seconds... "
+                f"(Attempt {retry_state.attempt_number}/{self.max_attempts})"
+            ),
+            reraise=True,
+        ):
+            with attempt:
+                preds = self._send(encoded)
+
+        # Boxes are reported on the 72 DPI page raster
+        scale = 72 / self.protocol.dpi
+        results = []
+        for image, sent_shape, pred in zip(images, sent_shapes, preds, strict=True):
+            orig_shape = (image.shape[0] * scale, image.shape[1] * scale)
+            boxes = [
+                YoloBox(
+                    None,
+                    scale_boxes(sent_shape, np.array(box["xyxy"]), orig_shape),
+                    np.array(box["conf"]),
+                    box["cls"],
+                )
+                for box in pred["boxes"]
+            ]
+            results.append(
+                YoloResult(
                     boxes=boxes,
                     names={int(k): v for k, v in pred["names"].items()},
                 )
-        return result_container.result
+            )
+        return results
 
     def predict(self, image, imgsz=1024, **kwargs) -> list[YoloResult]:
         """Predict the layout of document pages using RPC service."""
         # Handle single image input
         if isinstance(image, np.ndarray) and len(image.shape) == 3:
             image = [image]
-
-        result_containers = [ResultContainer() for _ in image]
-        predict_thread = ThreadPoolExecutor(max_workers=len(image))
-        for img, result_container in zip(image, result_containers, strict=True):
-            predict_thread.submit(
-                self.predict_image, img, self.host, result_container, 800
-            )
-        predict_thread.shutdown(wait=True)
-        result = [result_container.result for result_container in result_containers]
-        return result
-
-    def predict_page(
-        self, page, mupdf_doc: pymupdf.Document, translate_config, save_debug_image
-    ):
-        translate_config.raise_if_cancelled()
-        with self.lock:
-            # pix = mupdf_doc[page.page_number].get_pixmap(dpi=72)
-            pix = get_no_rotation_img(mupdf_doc[page.page_number])
-        image = np.frombuffer(pix.samples, np.uint8).reshape(
-            pix.height,
-            pix.width,
-            3,
-        )[:, :, ::-1]
-        predict_result = self.predict_image(image, self.host, None, 800)
-        save_debug_image(image, predict_result, page.page_number + 1)
-        return page, predict_result
+        futures = [
+            self.executor.submit(self.predict_batch, image[i : i + self.batch_size])
+            for i in range(0, len(image), self.batch_size)
+        ]
+        return [result for future in futures for result in future.result()]
 
     def handle_document(
         self,
@@ -274,36 +358,50 @@ class RpcDocLayoutModel(DocLayoutModel):
         mupdf_doc: pymupdf.Document,
         translate_config,
         save_debug_image,
-    ):
-        with ThreadPoolExecutor(max_workers=16) as executor:
-            yield from executor.map(
-                self.predict_page,
-                pages,
-                (mupdf_doc for _ in range(len(pages))),
-                (translate_config for _ in range(len(pages))),
-                (save_debug_image for _ in range(len(pages))),
-            )
+    ) -> Generator[
+        tuple[babeldoc.format.pdf.document_il.il_version_1.Page, YoloResult], None, None
+    ]:
+        """Detect layouts with up to ``concurrency`` batches of pages in flight.
+
+        Pages are yielded in their original order.
+        """
+        raster_cache = translate_config.get_page_raster_cache(mupdf_doc)
+
+        def predict_pages(batch):
+            translate_config.raise_if_cancelled()
+            images = [
+                raster_cache.get_image(page.page_number, dpi=self.protocol.dpi)
+                for page in batch
+            ]
+            return images, self.predict_batch(images)
+
+        page_iter = iter(pages)
+        pending = deque()
+
+        def fill():
+            while len(pending) < self.concurrency:
+                batch = list(islice(page_iter, self.batch_size))
+                if not batch:
+                    return
+                pending.append((batch, self.executor.submit(predict_pages, batch)))
+
+        try:
+            fill()
+            while pending:
+                translate_config.raise_if_cancelled()
+                batch, future = pending.popleft()
+                images, results = future.result()
+                fill()
+                for page, image, predict_result in zip(
+                    batch, images, results, strict=True
+                ):
+                    save_debug_image(image, predict_result, page.page_number + 1)
+                    yield page, predict_result
+        finally:
+            for _, future in pending:
+                future.cancel()
 
     @staticmethod
-    def from_host(host: str) -> "RpcDocLayoutModel":
+    def from_host(host: str, **kwargs) -> "RpcDocLayoutModel":
         """Create RpcDocLayoutModel from host address."""
-        return RpcDocLayoutModel(host=host)
-
-
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG)
-    # Test the service
-    try:
-        # Use a default test image if example/1.png doesn't exist
-        image_path = "example/1.png"
-        if not Path(image_path).exists():
-            print(f"Warning: {image_path} not found.")
-            print("Please provide the path to a test image:")
-            image_path = input("> ")
-
-        logger.info(f"Processing image: {image_path}")
-        result = predict_layout(image_path)
-        print("Prediction results:")
-        print(result)
-    except Exception as e:
-        print(f"Error: {e!s}")
+        return RpcDocLayoutModel(host=host, **kwargs)
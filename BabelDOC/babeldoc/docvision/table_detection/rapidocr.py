@@ -2,13 +2,14 @@ import logging
 import re
 import threading
 from collections.abc import Generator
+from pathlib import Path
 
 import cv2
 import numpy as np
 from babeldoc.assets.assets import get_table_detection_rapidocr_model_path
 from babeldoc.docvision.base_doclayout import YoloBox
 from babeldoc.docvision.base_doclayout import YoloResult
-from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
+from babeldoc.docvision.model_registry import model_registry
 from rapidocr_onnxruntime import RapidOCR
 
 try:
@@ -93,14 +94,27 @@ class RapidOCRModel:
             elif re.match(r"cuda", provider, re.IGNORECASE):
                 self.use_cuda = True
         self.use_dml = False  # force disable directml
+        det_model_path = get_table_detection_rapidocr_model_path()
+        self.cache_id = f"rapidocr:{Path(det_model_path).name}"
         self.model = RapidOCR(
-            det_model_path=get_table_detection_rapidocr_model_path(),
+            det_model_path=det_model_path,
             det_use_cuda=self.use_cuda,
             det_use_dml=False,
         )
         self.names = {0: "table_text"}
         self.lock = threading.Lock()
 
+    @staticmethod
+    def load() -> "RapidOCRModel":
+        """Return the table text model, loaded and warmed up once per process."""
+
+        def load():
+            model = RapidOCRModel()
+            model.predict(np.full((1024, 768, 3), 255, np.uint8))
+            return model
+
+        return model_registry.get(("table_detection_rapidocr",), load)
+
     @property
     def stride(self):
         return 32
@@ -236,14 +250,9 @@ class RapidOCRModel:
     ]:
         for page in pages:
             translate_config.raise_if_cancelled()
-            with self.lock:
-                # pix = mupdf_doc[page.page_number].get_pixmap(dpi=72)
-                pix = get_no_rotation_img(mupdf_doc[page.page_number])
-            image = np.frombuffer(pix.samples, np.uint8).reshape(
-                pix.height,
-                pix.width,
-                3,
-            )[:, :, ::-1]
+            image = translate_config.get_page_raster_cache(mupdf_doc).get_image(
+                page.page_number
+            )
 
             table_boxes = []
             for layout in page.page_layout:
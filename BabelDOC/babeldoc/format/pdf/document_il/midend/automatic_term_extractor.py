@@ -105,11 +105,15 @@ class AutomaticTermExtractor:
     stage_name = "Automatic Term Extraction"
 
     def __init__(
-        self, translate_engine: BaseTranslator, translation_config: TranslationConfig
+        self,
+        translate_engine: BaseTranslator,
+        translation_config: TranslationConfig,
+        tokenizer=None,
     ):
         self.translate_engine = translate_engine
         self.translation_config = translation_config
         self.shared_context = translation_config.shared_context_cross_split_part
+        self.tokenizer = tokenizer or translation_config.get_tokenizer()
 
         # Check if the translate_engine has llm_translate capability
         if not hasattr(self.translate_engine, "llm_translate") or not callable(
@@ -121,7 +125,7 @@ class AutomaticTermExtractor:
 
     def calc_token_count(self, text: str) -> int:
         try:
-            return self.translate_engine.count_tokens(text)
+            return self.tokenizer.count_tokens(text)
         except Exception:
             return 0
 
@@ -180,8 +184,7 @@ class AutomaticTermExtractor:
         tracker: PageTermExtractTracker = None,
     ):
         self.translation_config.raise_if_cancelled()
-        paragraphs = []
-        total_token_count = 0
+        candidates = []
         for paragraph in page.pdf_paragraph:
             if paragraph.debug_id is None or paragraph.unicode is None:
                 pbar.advance(1)
@@ -192,7 +195,17 @@ class AutomaticTermExtractor:
             # if len(paragraph.unicode) < self.translation_config.min_text_length:
             #     pbar.advance(1)
             #     continue
-            total_token_count += self.calc_token_count(paragraph.unicode)
+            candidates.append(paragraph)
+        token_counts = self.tokenizer.count_tokens_many(
+            [p.unicode for p in candidates]
+        )
+
+        paragraphs = []
+        total_token_count = 0
+        for paragraph, paragraph_token_count in zip(
+            candidates, token_counts, strict=True
+        ):
+            total_token_count += paragraph_token_count
             paragraphs.append(paragraph)
             if total_token_count > 600 or len(paragraphs) > 12:
                 executor.submit(
@@ -261,6 +274,10 @@ class AutomaticTermExtractor:
     def procress(self, doc_il: ILDocument):
         logger.info(f"{self.stage_name}: Starting term extraction for document.")
         tracker = DocumentTermExtractTracker()
+        if self.translation_config.calibrate_token_count:
+            self.tokenizer = self.translation_config.get_tokenizer(
+                p.unicode for page in doc_il.page for p in page.pdf_paragraph
+            )
         total = sum(len(page.pdf_paragraph) for page in doc_il.page)
         with self.translation_config.progress_monitor.stage_start(
             self.stage_name,
@@ -8,6 +8,7 @@ from skimage.metrics import structural_similarity
 
 from babeldoc.babeldoc_exception.BabelDOCException import ScannedPDFError
 from babeldoc.format.pdf.document_il import il_version_1
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
 from babeldoc.format.pdf.document_il.utils.style_helper import GREEN
 from babeldoc.format.pdf.document_il.utils.zstd_helper import zstd_decompress
 from babeldoc.format.pdf.translation_config import TranslationConfig
@@ -80,7 +81,9 @@ class DetectScannedFile:
             return bool(sum(hit_list) > len(doc) * 0.8)
         return False
 
-    def process(self, docs: il_version_1.Document):
+    def process(
+        self, docs: il_version_1.Document, mupdf_doc: pymupdf.Document | None = None
+    ):
         """Generate layouts for all pages that need to be translated."""
         # Get pages that need to be translated
         pages_to_translate = [
@@ -91,6 +94,10 @@ class DetectScannedFile:
         if not pages_to_translate:
             return
         mupdf = pymupdf.open(self.translation_config.get_working_file_path("input.pdf"))
+        # Renders of the unmodified pages are shared with the layout stages.
+        page_raster_cache = None
+        if mupdf_doc is not None:
+            page_raster_cache = self.translation_config.get_page_raster_cache(mupdf_doc)
         total = len(pages_to_translate)
         threshold = 0.8 * total
         threshold = max(threshold, 1)
@@ -104,7 +111,14 @@ class DetectScannedFile:
             for page in pages_to_translate:
                 if scanned < threshold and non_scanned < non_scanned_threshold:
                     # Only continue detection if both counts are below thresholds
-                    is_scanned = self.detect_page_is_scanned(page, mupdf)
+                    before_page_image = None
+                    if page_raster_cache is not None:
+                        before_page_image = page_raster_cache.get_image(
+                            page.page_number
+                        )
+                    is_scanned = self.detect_page_is_scanned(
+                        page, mupdf, before_page_image
+                    )
                     if is_scanned:
                         scanned += 1
                     else:
@@ -131,13 +145,20 @@ class DetectScannedFile:
                 raise ScannedPDFError("Scanned PDF detected.")
 
     @staticmethod
-    def detect_page_is_scanned(page: il_version_1.Page, pdf: pymupdf.Document) -> bool:
-        before_page_image = pdf[page.page_number].get_pixmap()
-        before_page_image = np.frombuffer(before_page_image.samples, np.uint8).reshape(
-            before_page_image.height,
-            before_page_image.width,
-            3,
-        )[:, :, ::-1]
+    def detect_page_is_scanned(
+        page: il_version_1.Page,
+        pdf: pymupdf.Document,
+        before_page_image: np.ndarray | None = None,
+    ) -> bool:
+        if before_page_image is None:
+            before_page_image = get_no_rotation_img(pdf[page.page_number])
+            before_page_image = np.frombuffer(
+                before_page_image.samples, np.uint8
+            ).reshape(
+                before_page_image.height,
+                before_page_image.width,
+                3,
+            )[:, :, ::-1]
         new_xref = pdf.get_new_xref()
         pdf.update_object(new_xref, "<<>>")
         baseop = page.base_operations.value
@@ -150,7 +171,7 @@ class DetectScannedFile:
             base_op = zstd_decompress(base_op)
             pdf.update_stream(xobj.xref_id, base_op.encode("utf-8"))
 
-        after_page_image = pdf[page.page_number].get_pixmap()
+        after_page_image = get_no_rotation_img(pdf[page.page_number])
         after_page_image = np.frombuffer(after_page_image.samples, np.uint8).reshape(
             after_page_image.height,
             after_page_image.width,
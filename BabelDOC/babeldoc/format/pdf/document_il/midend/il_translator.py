@@ -198,10 +198,7 @@ class ILTranslator:
         self.shared_context_cross_split_part = (
             translation_config.shared_context_cross_split_part
         )
-        if tokenizer is None:
-            pass
-        else:
-            self.tokenizer = tokenizer
+        self.tokenizer = tokenizer or translation_config.get_tokenizer()
 
         # Cache glossaries at initialization
         self._cached_glossaries = self.shared_context_cross_split_part.get_glossaries()
@@ -218,13 +215,18 @@ class ILTranslator:
 
     def calc_token_count(self, text: str) -> int:
         try:
-            return self.translate_engine.count_tokens(text)
+            return self.tokenizer.count_tokens(text)
         except Exception:
             return 0
 
     def translate(self, docs: Document):
         tracker = DocumentTranslateTracker()
 
+        if self.translation_config.calibrate_token_count:
+            self.tokenizer = self.translation_config.get_tokenizer(
+                p.unicode for page in docs.page for p in page.pdf_paragraph
+            )
+
         if not self.translation_config.shared_context_cross_split_part.first_paragraph:
             # Try to find the first title paragraph
             title_paragraph = self.find_title_paragraph(docs)
@@ -280,7 +282,12 @@ class ILTranslator:
         tracker: PageTranslateTracker = None,
     ):
         self.translation_config.raise_if_cancelled()
-        for paragraph in page.pdf_paragraph:
+        token_counts = self.tokenizer.count_tokens_many(
+            [p.unicode for p in page.pdf_paragraph]
+        )
+        for paragraph, paragraph_token_count in zip(
+            page.pdf_paragraph, token_counts, strict=True
+        ):
             page_font_map = {}
             for font in page.pdf_font:
                 page_font_map[font.font_id] = font
@@ -290,7 +297,6 @@ class ILTranslator:
                 for font in xobj.pdf_font:
                     page_xobj_font_map[xobj.xobj_id][font.font_id] = font
             # self.translate_paragraph(paragraph, pbar,tracker.new_paragraph(), page_font_map, page_xobj_font_map)
-            paragraph_token_count = self.calc_token_count(paragraph.unicode)
             if paragraph.layout_label == "title":
                 self.shared_context_cross_split_part.recent_title_paragraph = (
                     copy.deepcopy(paragraph)
@@ -1,12 +1,18 @@
+import asyncio
+import collections
+import concurrent.futures
 import copy
 import json
 import logging
 import re
+import statistics
+import threading
 from pathlib import Path
 
 import Levenshtein
 from tqdm import tqdm
 
+from babeldoc.asynchronize import BackgroundEventLoop
 from babeldoc.format.pdf.document_il import Document
 from babeldoc.format.pdf.document_il import Page
 from babeldoc.format.pdf.document_il import PdfFont
@@ -17,10 +23,17 @@ from babeldoc.format.pdf.document_il.midend.il_translator import (
 )
 from babeldoc.format.pdf.document_il.midend.il_translator import ILTranslator
 from babeldoc.format.pdf.document_il.midend.il_translator import PageTranslateTracker
+from babeldoc.format.pdf.document_il.midend.il_translator import (
+    ParagraphTranslateTracker,
+)
 from babeldoc.format.pdf.document_il.utils.fontmap import FontMapper
 from babeldoc.format.pdf.document_il.utils.paragraph_helper import is_cid_paragraph
 from babeldoc.format.pdf.translation_config import TranslationConfig
+from babeldoc.translator.cache import ParagraphTranslationCache
 from babeldoc.translator.translator import BaseTranslator
+from babeldoc.translator.translator import ContextCache
+from babeldoc.translator.translator import ContextCacheUnavailableError
+from babeldoc.translator.translator import LLMOutputTruncatedError
 from babeldoc.utils.priority_thread_pool_executor import PriorityThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
@@ -28,14 +41,508 @@ logger = logging.getLogger(__name__)
 
 class BatchParagraph:
     def __init__(
-        self, paragraphs: list[PdfParagraph], page_tracker: PageTranslateTracker
+        self,
+        paragraphs: list[PdfParagraph],
+        page_tracker: PageTranslateTracker,
+        trackers: list[ParagraphTranslateTracker] | None = None,
+        translate_inputs: list[tuple[str, ILTranslator.TranslateInput]] | None = None,
+        cache_keys: list[str | None] | None = None,
+        font_maps: list[tuple[dict[str, PdfFont], dict[int, dict[str, PdfFont]]]]
+        | None = None,
+        dedup_keys: list[tuple | None] | None = None,
     ):
         self.paragraphs = paragraphs
-        self.trackers = [page_tracker.new_paragraph() for _ in paragraphs]
+        if trackers is None:
+            trackers = [page_tracker.new_paragraph() for _ in paragraphs]
+        self.trackers = trackers
+        # Results of pre_translate_paragraph, if already computed while
+        # consulting the paragraph cache.
+        self.translate_inputs = translate_inputs
+        self.cache_keys = cache_keys
+        # (page_font_map, xobj_font_map) of each paragraph, set when the batch
+        # spans several pages.
+        self.font_maps = font_maps
+        # ParagraphDeduplicator keys, duplicates of these paragraphs wait for
+        # their translation.
+        self.dedup_keys = dedup_keys
+
+
+class ParagraphBatchPacker:
+    """Packs paragraphs into LLM batches across page boundaries.
+
+    Every LLM call repeats the whole instruction prompt, so sparse pages should
+    not each end up in their own small batch. Paragraphs are accumulated in
+    document order and a batch is submitted once it holds more than
+    ``max_tokens`` tokens or ``max_paragraphs`` paragraphs, or when
+    :meth:`flush` is called at the end of the document.
+    """
+
+    def __init__(
+        self,
+        submit,
+        max_tokens: int = 200,
+        max_paragraphs: int = 5,
+        batch_sizer: "AdaptiveBatchSizer | None" = None,
+    ):
+        self.submit = submit
+        self.max_tokens = max_tokens
+        self.max_paragraphs = max_paragraphs
+        self.batch_sizer = batch_sizer
+        self.batch_sizes: list[int] = []
+        self._reset()
+
+    def _reset(self):
+        self.paragraphs = []
+        self.trackers = []
+        self.translate_inputs = []
+        self.cache_keys = []
+        self.font_maps = []
+        self.dedup_keys = []
+        self.token_count = 0
+
+    def add(
+        self,
+        paragraph: PdfParagraph,
+        tracker: ParagraphTranslateTracker,
+        translate_input: tuple[str, ILTranslator.TranslateInput],
+        cache_key: str | None,
+        token_count: int,
+        page_font_map: dict[str, PdfFont],
+        xobj_font_map: dict[int, dict[str, PdfFont]],
+        dedup_key: tuple | None = None,
+    ):
+        self.paragraphs.append(paragraph)
+        self.trackers.append(tracker)
+        self.translate_inputs.append(translate_input)
+        self.cache_keys.append(cache_key)
+        self.font_maps.append((page_font_map, xobj_font_map))
+        self.dedup_keys.append(dedup_key)
+        self.token_count += token_count
+        if self.batch_sizer is not None:
+            max_tokens, max_paragraphs = self.batch_sizer.get_limits()
+        else:
+            max_tokens, max_paragraphs = self.max_tokens, self.max_paragraphs
+        if self.token_count > max_tokens or len(self.paragraphs) > max_paragraphs:
+            self.flush()
+
+    def flush(self):
+        if not self.paragraphs:
+            return
+        batch = BatchParagraph(
+            self.paragraphs,
+            None,
+            self.trackers,
+            self.translate_inputs,
+            self.cache_keys,
+            self.font_maps,
+            self.dedup_keys,
+        )
+        self.batch_sizes.append(len(self.paragraphs))
+        token_count = self.token_count
+        self._reset()
+        self.submit(batch, token_count)
+
+    def get_batch_size_summary(self) -> str:
+        if not self.batch_sizes:
+            return "no LLM batches"
+        histogram = collections.Counter(self.batch_sizes)
+        distribution = ", ".join(
+            f"{size}: {histogram[size]}" for size in sorted(histogram)
+        )
+        return (
+            f"{len(self.batch_sizes)} LLM batches, "
+            f"{sum(self.batch_sizes) / len(self.batch_sizes):.2f} paragraphs per batch "
+            f"(paragraphs: batches = {distribution})"
+        )
+
+
+class DuplicateParagraph:
+    """A paragraph waiting for the translation of an identical paragraph."""
+
+    def __init__(
+        self,
+        paragraph: PdfParagraph,
+        tracker: ParagraphTranslateTracker,
+        translate_input: ILTranslator.TranslateInput,
+        page_font_map: dict[str, PdfFont],
+        xobj_font_map: dict[int, dict[str, PdfFont]],
+    ):
+        self.paragraph = paragraph
+        self.tracker = tracker
+        self.translate_input = translate_input
+        self.page_font_map = page_font_map
+        self.xobj_font_map = xobj_font_map
+        # Restored before falling back to translating the paragraph alone.
+        self.unicode = paragraph.unicode
+
+
+class ParagraphDeduplicator:
+    """Single-flight translation of paragraphs that repeat within a document.
+
+    Running headers, footers and boilerplate repeat on every page. The first
+    occurrence of a key leads and is sent to the LLM, later occurrences follow:
+    they wait for the leader and reuse its translation, or get it right away
+    once it is known. If the leader fails, its followers are released and
+    translated on their own.
+    """
+
+    LEAD = object()
+    FOLLOW = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._followers: dict[tuple, list[DuplicateParagraph]] = {}
+        self._translations: dict[tuple, str] = {}
+        self.duplicate_count = 0
+
+    def join(self, key: tuple, duplicate: DuplicateParagraph):
+        """Return LEAD, FOLLOW or the known translation of ``key``."""
+        with self._lock:
+            if key in self._translations:
+                self.duplicate_count += 1
+                return self._translations[key]
+            if key in self._followers:
+                self.duplicate_count += 1
+                self._followers[key].append(duplicate)
+                return self.FOLLOW
+            self._followers[key] = []
+            return self.LEAD
+
+    def resolve(self, key: tuple, translation: str) -> list[DuplicateParagraph]:
+        """Record the leader's translation and return the waiting followers."""
+        with self._lock:
+            self._translations[key] = translation
+            return self._followers.pop(key, [])
+
+    def abandon(self, key: tuple) -> list[DuplicateParagraph]:
+        """Release the followers of a failed leader, the next occurrence leads."""
+        with self._lock:
+            return self._followers.pop(key, [])
+
+
+class AdaptiveBatchSizer:
+    """Adjusts the token limit of LLM batches to what the service sustains.
+
+    Larger batches amortize the instruction prompt, which only pays off while
+    requests are held back by the rate limiter rather than by the model. So
+    after every ``window`` successful batches the limit grows by
+    ``growth_factor`` if most of them waited for the rate limiter and the
+    request time per input token stayed within ``latency_tolerance`` of the
+    level measured at the current size, and shrinks back if it got worse.
+    Truncated responses and unparsable output halve the limit immediately.
+
+    The limit never exceeds what fits into the model's output budget, given
+    how many output tokens the target language needs per input token.
+    """
+
+    # Output tokens per input token, by target language prefix.
+    OUTPUT_EXPANSION_RATIO = {"ja": 2.0, "ko": 2.0, "zh": 2.0}
+    DEFAULT_OUTPUT_EXPANSION_RATIO = 1.5
+    # JSON wrapping of each translated paragraph in the response.
+    OUTPUT_TOKENS_PER_PARAGRAPH = 20
+    # Input tokens per paragraph slot, max_paragraphs follows max_tokens.
+    TOKENS_PER_PARAGRAPH = 40
+
+    def __init__(
+        self,
+        lang_out: str,
+        max_output_tokens: int,
+        initial_tokens: int = 200,
+        min_tokens: int = 50,
+        max_tokens: int = 4000,
+        window: int = 4,
+        growth_factor: float = 1.5,
+        latency_tolerance: float = 1.2,
+    ):
+        self.expansion_ratio = self.OUTPUT_EXPANSION_RATIO.get(
+            lang_out.lower()[:2], self.DEFAULT_OUTPUT_EXPANSION_RATIO
+        )
+        self.min_tokens = min_tokens
+        self.max_tokens = max(
+            min_tokens, min(max_tokens, self._output_budget_tokens(max_output_tokens))
+        )
+        self.window = window
+        self.growth_factor = growth_factor
+        self.latency_tolerance = latency_tolerance
+        self._lock = threading.Lock()
+        self.tokens = min(max(initial_tokens, min_tokens), self.max_tokens)
+        self._baseline_latency: float | None = None
+        self._reset_window()
+
+    def _output_budget_tokens(self, max_output_tokens: int) -> int:
+        # Keep 20% headroom, the token estimate is only approximate.
+        budget = max_output_tokens * 0.8
+        # Solve tokens * ratio + paragraphs * overhead <= budget with
+        # paragraphs = tokens / TOKENS_PER_PARAGRAPH.
+        per_token = (
+            self.expansion_ratio
+            + self.OUTPUT_TOKENS_PER_PARAGRAPH / self.TOKENS_PER_PARAGRAPH
+        )
+        return int(budget / per_token)
+
+    def _reset_window(self):
+        self._window_latencies: list[float] = []
+        self._window_rate_limited = 0
+
+    def get_limits(self) -> tuple[int, int]:
+        """Return ``(max_tokens, max_paragraphs)`` for the next batch."""
+        tokens = self.tokens
+        return tokens, max(5, tokens // self.TOKENS_PER_PARAGRAPH)
+
+    def _resize(self, tokens: float, reason: str):
+        tokens = int(min(max(tokens, self.min_tokens), self.max_tokens))
+        if tokens != self.tokens:
+            logger.debug(f"LLM batch token limit {self.tokens} -> {tokens} ({reason})")
+            self.tokens = tokens
+        self._baseline_latency = None
+        self._reset_window()
+
+    def on_batch_succeeded(self, token_count: int, rate_limit_params: dict):
+        """Record a batch that was translated, see BaseTranslator._record_call_timing."""
+        request_seconds = rate_limit_params.get("request_seconds")
+        if request_seconds is None or token_count <= 0:
+            # Served from the cache, says nothing about the service.
+            return
+        with self._lock:
+            self._window_latencies.append(request_seconds / token_count)
+            if rate_limit_params.get("rate_limit_wait_seconds", 0) > 0:
+                self._window_rate_limited += 1
+            if len(self._window_latencies) < self.window:
+                return
+            latency = statistics.median(self._window_latencies)
+            rate_limited = self._window_rate_limited * 2 >= self.window
+            if self._baseline_latency is None:
+                self._baseline_latency = latency
+            baseline = self._baseline_latency
+            if latency > baseline * self.latency_tolerance**2:
+                self._resize(self.tokens / self.growth_factor, "latency grew")
+            elif rate_limited and latency <= baseline * self.latency_tolerance:
+                self._resize(self.tokens * self.growth_factor, "rate limited")
+                # The latency measured so far stays the reference.
+                self._baseline_latency = baseline
+            else:
+                self._reset_window()
+
+    def on_batch_failed(self, error: Exception):
+        """Shrink after a truncated response or output that could not be parsed."""
+        with self._lock:
+            self._resize(self.tokens / 2, type(error).__name__)
+
+
+class BatchOutputMismatchError(Exception):
+    """The LLM returned a different number of translations than requested."""
+
+
+# Gemini response schema for structured output mode, one entry per input.
+LLM_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "output": {"type": "STRING"},
+        },
+        "required": ["id", "output"],
+        "propertyOrdering": ["id", "output"],
+    },
+}
+
+# Errors after which the batch is worth sending again in smaller pieces.
+RETRYABLE_BATCH_ERRORS = (
+    LLMOutputTruncatedError,
+    json.JSONDecodeError,
+    BatchOutputMismatchError,
+)
+
+
+class LLMBatchStats:
+    """Counts how well the LLM handles batches, kept per model for the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.salvaged_batches = 0
+        self.retried_items = 0
+        self.fallback_items = 0
+
+    def record(self, **counts: int):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def retry_rate(self) -> float:
+        return self.retried_items / self.items if self.items else 0.0
+
+    @property
+    def fallback_rate(self) -> float:
+        return self.fallback_items / self.items if self.items else 0.0
+
+    def get_summary(self) -> str:
+        return (
+            f"{self.batches} batches, {self.items} items, "
+            f"{self.salvaged_batches} salvaged batches, "
+            f"retry rate {self.retry_rate:.1%}, fallback rate {self.fallback_rate:.1%}"
+        )
+
+
+_llm_batch_stats: dict[str, LLMBatchStats] = {}
+_llm_batch_stats_lock = threading.Lock()
+
+
+def get_llm_batch_stats(model: str) -> LLMBatchStats:
+    with _llm_batch_stats_lock:
+        if model not in _llm_batch_stats:
+            _llm_batch_stats[model] = LLMBatchStats()
+        return _llm_batch_stats[model]
+
+
+class ContextCacheKeeper:
+    """Keeps the context cache of a document alive while it is translated.
+
+    A daemon thread extends the TTL every third of it. The cache is deleted on
+    close, or dropped as soon as a request reports it gone; batches then send
+    the full prompt again.
+    """
+
+    def __init__(
+        self,
+        translate_engine: BaseTranslator,
+        context_cache: ContextCache,
+        ttl_seconds: int,
+    ):
+        self.translate_engine = translate_engine
+        self.ttl_seconds = ttl_seconds
+        self._context_cache = context_cache
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name="context-cache-keeper", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def context_cache(self) -> ContextCache | None:
+        return self._context_cache
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.ttl_seconds / 3):
+            context_cache = self._context_cache
+            if context_cache is None:
+                return
+            try:
+                self.translate_engine.refresh_context_cache(
+                    context_cache, self.ttl_seconds
+                )
+            except Exception as e:
+                # Requests tell when the cache is really gone.
+                logger.warning(f"Failed to refresh context cache: {e}")
+
+    def invalidate(self):
+        self._context_cache = None
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        context_cache = self._context_cache
+        self._context_cache = None
+        if context_cache is not None:
+            try:
+                self.translate_engine.delete_context_cache(context_cache)
+            except Exception as e:
+                logger.warning(f"Failed to delete context cache: {e}")
+
+
+class BatchTranslateState:
+    """Per-call state shared by the steps of translating one batch."""
+
+    def __init__(
+        self,
+        batch_paragraph: BatchParagraph,
+        pbar: tqdm | None,
+        page_font_map: dict[str, PdfFont] | None,
+        xobj_font_map: dict[int, dict[str, PdfFont]] | None,
+        title_paragraph: PdfParagraph | None,
+        local_title_paragraph: PdfParagraph | None,
+        executor: PriorityThreadPoolExecutor | None,
+    ):
+        self.batch_paragraph = batch_paragraph
+        self.pbar = pbar
+        self.page_font_map = page_font_map
+        self.xobj_font_map = xobj_font_map
+        self.title_paragraph = title_paragraph
+        self.local_title_paragraph = local_title_paragraph
+        self.executor = executor
+        self.inputs = []
+        self.llm_translate_trackers = []
+        self.should_translate_paragraph = []
+        self.json_format_input = None
+        self.context_cache = None
+
+    def get_font_maps(
+        self, i: int
+    ) -> tuple[dict[str, PdfFont], dict[int, dict[str, PdfFont]]]:
+        """Return the font maps of the i-th paragraph of the batch."""
+        if self.batch_paragraph.font_maps is not None:
+            return self.batch_paragraph.font_maps[i]
+        return self.page_font_map, self.xobj_font_map
+
+
+class AsyncBatchExecutor:
+    """Runs batch coroutines on an event loop with a bounded number in flight.
+
+    Mirrors the ``submit(fn, *args, priority=..., **kwargs)`` shape of
+    PriorityThreadPoolExecutor, ``fn`` must be a coroutine function. Priority is
+    ignored, batches start in submission order.
+    """
+
+    def __init__(self, event_loop: BackgroundEventLoop, max_in_flight: int):
+        self.event_loop = event_loop
+        self.max_in_flight = max(1, max_in_flight)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._futures: list[concurrent.futures.Future] = []
+
+    async def _run(self, fn, args, kwargs):
+        # Created lazily so it is bound to the event loop thread.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            return await fn(*args, **kwargs)
+
+    def submit(self, fn, *args, priority: int = 0, **kwargs):
+        future = self.event_loop.submit(self._run(fn, args, kwargs))
+        self._futures.append(future)
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        if cancel_futures:
+            for future in self._futures:
+                future.cancel()
+        if not wait:
+            return
+        for future in concurrent.futures.as_completed(self._futures):
+            if future.cancelled():
+                continue
+            exc = future.exception()
+            if exc is not None:
+                logger.error(f"Async translate batch failed: {exc}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
 
 
 class ILTranslatorLLMOnly:
     stage_name = "Translate Paragraphs"
+    # How often the failed part of a batch is split and sent again.
+    MAX_RETRY_DEPTH = 3
+    # Models failing this often start with smaller batches.
+    HIGH_FAILURE_RATE = 0.2
+    # Lifetime of the context cache, refreshed while translating.
+    CONTEXT_CACHE_TTL_SECONDS = 600
 
     def __init__(
         self,
@@ -53,9 +560,12 @@ class ILTranslatorLLMOnly:
         # Cache glossaries at initialization
         self._cached_glossaries = self.shared_context_cross_split_part.get_glossaries()
 
+        self.tokenizer = tokenizer or translation_config.get_tokenizer()
+
         self.il_translator = ILTranslator(
             translate_engine=translate_engine,
             translation_config=translation_config,
+            tokenizer=self.tokenizer,
         )
         self.il_translator.use_as_fallback = True
         try:
@@ -63,13 +573,53 @@ class ILTranslatorLLMOnly:
         except NotImplementedError as e:
             raise ValueError("LLM translator not supported") from e
 
+        if self.translate_engine.ignore_cache:
+            self.paragraph_cache = None
+        else:
+            self.paragraph_cache = ParagraphTranslationCache(
+                self.translate_engine.cache,
+                {
+                    "custom_system_prompt": translation_config.custom_system_prompt,
+                    "add_formula_placehold_hint": translation_config.add_formula_placehold_hint,
+                },
+            )
+
+        self.deduplicator = ParagraphDeduplicator()
+
+        # Static prompt rules, only set when the response is schema constrained.
+        self.system_instruction = None
+        if translation_config.structured_output and getattr(
+            self.translate_engine, "supports_structured_output", False
+        ):
+            self.system_instruction = self._build_system_instruction()
+        self.context_cache_keeper: ContextCacheKeeper | None = None
+
+        self.batch_stats = get_llm_batch_stats(
+            getattr(self.translate_engine, "model", self.translate_engine.name)
+        )
+
+        self.batch_sizer = None
+        if translation_config.adaptive_batch_size:
+            initial_tokens = 200
+            if (
+                self.batch_stats.retry_rate + self.batch_stats.fallback_rate
+                > self.HIGH_FAILURE_RATE
+            ):
+                initial_tokens //= 2
+            self.batch_sizer = AdaptiveBatchSizer(
+                translation_config.lang_out,
+                self.translate_engine.max_output_tokens,
+                initial_tokens=initial_tokens,
+            )
+
         self.ok_count = 0
         self.fallback_count = 0
         self.total_count = 0
+        self.paragraph_cache_hit_count = 0
 
     def calc_token_count(self, text: str) -> int:
         try:
-            return self.translate_engine.count_tokens(text)
+            return self.tokenizer.count_tokens(text)
         except Exception:
             return 0
 
@@ -89,9 +639,48 @@ class ILTranslatorLLMOnly:
                     return paragraph
         return None
 
+    def _start_context_cache(self) -> ContextCacheKeeper | None:
+        """Store the static prompt prefix in the context cache if enabled.
+
+        Returns None if context caching is off, not supported, the prefix is
+        too short for the service or the cache could not be created.
+        """
+        if not (
+            self.translation_config.context_cache
+            and self.system_instruction is not None
+            and getattr(self.translate_engine, "supports_context_cache", False)
+        ):
+            return None
+        contents = self._build_context_cache_contents(
+            self.shared_context_cross_split_part.first_paragraph
+        )
+        token_count = self.calc_token_count(self.system_instruction + contents)
+        if token_count < self.translate_engine.min_context_cache_tokens:
+            logger.info(
+                f"Static prompt prefix has {token_count} tokens, context caching needs {self.translate_engine.min_context_cache_tokens}"
+            )
+            return None
+        try:
+            context_cache = self.translate_engine.create_context_cache(
+                self.system_instruction, contents, self.CONTEXT_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Context caching unavailable, sending full prompts: {e}")
+            return None
+        logger.info(f"Cached {token_count} prompt tokens as {context_cache.name}")
+        return ContextCacheKeeper(
+            self.translate_engine, context_cache, self.CONTEXT_CACHE_TTL_SECONDS
+        )
+
     def translate(self, docs: Document) -> None:
         tracker = DocumentTranslateTracker()
 
+        if self.translation_config.calibrate_token_count:
+            self.tokenizer = self.translation_config.get_tokenizer(
+                p.unicode for page in docs.page for p in page.pdf_paragraph
+            )
+            self.il_translator.tokenizer = self.tokenizer
+
         if not self.translation_config.shared_context_cross_split_part.first_paragraph:
             # Try to find the first title paragraph
             title_paragraph = self.find_title_paragraph(docs)
@@ -117,24 +706,45 @@ class ILTranslatorLLMOnly:
                 for page in docs.page
             ]
         )
-        with self.translation_config.progress_monitor.stage_start(
-            self.stage_name,
-            total,
-        ) as pbar:
-            with PriorityThreadPoolExecutor(
-                max_workers=self.translation_config.pool_max_workers,
-            ) as executor2:
+        self.context_cache_keeper = self._start_context_cache()
+        try:
+            with self.translation_config.progress_monitor.stage_start(
+                self.stage_name,
+                total,
+            ) as pbar:
                 with PriorityThreadPoolExecutor(
                     max_workers=self.translation_config.pool_max_workers,
-                ) as executor:
-                    for page in docs.page:
-                        self.process_page(
-                            page,
-                            executor,
-                            pbar,
-                            tracker.new_page(),
-                            executor2,
+                ) as executor2:
+                    if self.translate_engine.supports_async_llm_translate:
+                        # Batches are awaited on the translator event loop instead
+                        # of occupying one thread each; fallbacks still use executor2.
+                        executor = AsyncBatchExecutor(
+                            self.translate_engine.event_loop,
+                            self.translate_engine.max_concurrent_requests,
                         )
+                    else:
+                        executor = PriorityThreadPoolExecutor(
+                            max_workers=self.translation_config.pool_max_workers,
+                        )
+                    with executor:
+                        packer = self._new_batch_packer(executor, pbar, executor2)
+                        for page in docs.page:
+                            self.process_page(
+                                page,
+                                executor,
+                                pbar,
+                                tracker.new_page(),
+                                executor2,
+                                packer,
+                            )
+                        packer.flush()
+                    logger.info(f"Paragraph batches: {packer.get_batch_size_summary()}")
+        finally:
+            if self.context_cache_keeper is not None:
+                self.context_cache_keeper.close()
+                self.context_cache_keeper = None
+        logger.info(f"LLM batch results: {self.batch_stats.get_summary()}")
+        logger.info(f"Hedged requests: {self.translate_engine.hedger.get_summary()}")
 
         path = self.translation_config.get_working_file_path("translate_tracking.json")
 
@@ -143,17 +753,24 @@ class ILTranslatorLLMOnly:
             with Path(path).open("w", encoding="utf-8") as f:
                 f.write(tracker.to_json())
         logger.info(
-            f"Translation completed. Total: {self.total_count}, Successful: {self.ok_count}, Fallback: {self.fallback_count}"
+            f"Translation completed. Total: {self.total_count}, Successful: {self.ok_count}, Fallback: {self.fallback_count}, Paragraph cache hits: {self.paragraph_cache_hit_count}, Duplicates: {self.deduplicator.duplicate_count}"
         )
 
     def process_page(
         self,
         page: Page,
-        executor: PriorityThreadPoolExecutor,
+        executor: PriorityThreadPoolExecutor | AsyncBatchExecutor,
         pbar: tqdm | None = None,
         tracker: PageTranslateTracker = None,
         executor2: PriorityThreadPoolExecutor | None = None,
+        packer: ParagraphBatchPacker | None = None,
     ):
+        """Queue the paragraphs of a page for translation.
+
+        With a document-level ``packer`` the last batch of the page stays open
+        for paragraphs of the following pages, otherwise it is submitted before
+        returning.
+        """
         self.translation_config.raise_if_cancelled()
         page_font_map = {}
         for font in page.pdf_font:
@@ -164,9 +781,7 @@ class ILTranslatorLLMOnly:
             for font in xobj.pdf_font:
                 page_xobj_font_map[xobj.xobj_id][font.font_id] = font
 
-        paragraphs = []
-
-        total_token_count = 0
+        candidates = []
         for paragraph in page.pdf_paragraph:
             if paragraph.debug_id is None or paragraph.unicode is None:
                 continue
@@ -176,37 +791,114 @@ class ILTranslatorLLMOnly:
             if len(paragraph.unicode) < self.translation_config.min_text_length:
                 pbar.advance(1)
                 continue
-            # self.translate_paragraph(paragraph, pbar,tracker.new_paragraph(), page_font_map, page_xobj_font_map)
-            total_token_count += self.calc_token_count(paragraph.unicode)
-            paragraphs.append(paragraph)
+            candidates.append(paragraph)
+        token_counts = self.tokenizer.count_tokens_many([p.unicode for p in candidates])
+        page_packer = packer
+        if page_packer is None:
+            page_packer = self._new_batch_packer(executor, pbar, executor2)
+
+        prepared = []
+        for paragraph, paragraph_token_count in zip(
+            candidates, token_counts, strict=True
+        ):
+            paragraph_tracker = tracker.new_paragraph()
+            text, translate_input = self.il_translator.pre_translate_paragraph(
+                paragraph, paragraph_tracker, page_font_map, page_xobj_font_map
+            )
+            cache_key = None
+            if text is not None:
+                cache_key = self._paragraph_cache_key(paragraph, text, translate_input)
+            prepared.append(
+                (
+                    paragraph,
+                    paragraph_token_count,
+                    paragraph_tracker,
+                    text,
+                    translate_input,
+                    cache_key,
+                )
+            )
+        if self.paragraph_cache is not None:
+            # One query for the whole page instead of one per paragraph.
+            try:
+                self.paragraph_cache.prefetch(
+                    item[5] for item in prepared if item[5] is not None
+                )
+            except Exception as e:
+                logger.debug(f"try prefetch paragraph cache failed, ignore it: {e}")
+
+        for (
+            paragraph,
+            paragraph_token_count,
+            paragraph_tracker,
+            text,
+            translate_input,
+            cache_key,
+        ) in prepared:
             if paragraph.layout_label == "title":
                 self.shared_context_cross_split_part.recent_title_paragraph = (
                     copy.deepcopy(paragraph)
                 )
 
-            if total_token_count > 200 or len(paragraphs) > 5:
-                executor.submit(
-                    self.translate_paragraph,
-                    BatchParagraph(paragraphs, tracker),
-                    pbar,
-                    page_font_map,
-                    page_xobj_font_map,
-                    self.translation_config.shared_context_cross_split_part.first_paragraph,
-                    self.translation_config.shared_context_cross_split_part.recent_title_paragraph,
-                    executor2,
-                    priority=1048576 - total_token_count,
-                    paragraph_token_count=total_token_count,
-                )
-                paragraphs = []
-                total_token_count = 0
+            if text is None:
+                pbar.advance(1)
+                continue
 
-        if paragraphs:
-            executor.submit(
-                self.translate_paragraph,
-                BatchParagraph(paragraphs, tracker),
-                pbar,
+            # Paragraphs translated before are not sent to the LLM again,
+            # whatever batch they ended up in last time.
+            if cache_key is not None and self._apply_paragraph_cache(
+                paragraph, paragraph_tracker, translate_input, cache_key
+            ):
+                pbar.advance(1)
+                continue
+
+            dedup_key = self._dedup_key(paragraph, text, translate_input)
+            duplicate = DuplicateParagraph(
+                paragraph,
+                paragraph_tracker,
+                translate_input,
                 page_font_map,
                 page_xobj_font_map,
+            )
+            joined = self.deduplicator.join(dedup_key, duplicate)
+            if joined is ParagraphDeduplicator.FOLLOW:
+                continue
+            if joined is not ParagraphDeduplicator.LEAD:
+                self._apply_duplicates([duplicate], joined, pbar, executor2)
+                continue
+
+            page_packer.add(
+                paragraph,
+                paragraph_tracker,
+                (text, translate_input),
+                cache_key,
+                paragraph_token_count,
+                page_font_map,
+                page_xobj_font_map,
+                dedup_key,
+            )
+
+        if packer is None:
+            page_packer.flush()
+
+    def _new_batch_packer(
+        self,
+        executor: PriorityThreadPoolExecutor | AsyncBatchExecutor,
+        pbar: tqdm | None,
+        executor2: PriorityThreadPoolExecutor | None,
+    ) -> ParagraphBatchPacker:
+        if isinstance(executor, AsyncBatchExecutor):
+            translate_batch = self.translate_paragraph_async
+        else:
+            translate_batch = self.translate_paragraph
+
+        def submit_batch(batch_paragraph: BatchParagraph, total_token_count: int):
+            executor.submit(
+                translate_batch,
+                batch_paragraph,
+                pbar,
+                None,
+                None,
                 self.translation_config.shared_context_cross_split_part.first_paragraph,
                 self.translation_config.shared_context_cross_split_part.recent_title_paragraph,
                 executor2,
@@ -214,6 +906,139 @@ class ILTranslatorLLMOnly:
                 paragraph_token_count=total_token_count,
             )
 
+        return ParagraphBatchPacker(submit_batch, batch_sizer=self.batch_sizer)
+
+    def _paragraph_cache_key(
+        self,
+        paragraph: PdfParagraph,
+        text: str,
+        translate_input: ILTranslator.TranslateInput,
+    ) -> str | None:
+        if self.paragraph_cache is None:
+            return None
+        placeholder_signature = {"layout_label": paragraph.layout_label}
+        if self.translation_config.add_formula_placehold_hint:
+            placeholder_signature["formula_placeholders_hint"] = (
+                translate_input.get_placeholders_hint()
+            )
+        glossary_entries = [
+            (glossary.name, source, target)
+            for glossary in self._cached_glossaries or []
+            for source, target in glossary.get_active_entries_for_text(text)
+        ]
+        return self.paragraph_cache.make_key(
+            text, placeholder_signature, glossary_entries
+        )
+
+    def _apply_paragraph_cache(
+        self,
+        paragraph: PdfParagraph,
+        tracker: ParagraphTranslateTracker,
+        translate_input: ILTranslator.TranslateInput,
+        cache_key: str,
+    ) -> bool:
+        """Apply the cached translation of a paragraph, return False on a miss."""
+        try:
+            translation = self.paragraph_cache.get(cache_key)
+        except Exception as e:
+            logger.debug(f"try get paragraph cache failed, ignore it: {e}")
+            return False
+        if translation is None:
+            return False
+        original_unicode = paragraph.unicode
+        try:
+            self.il_translator.post_translate_paragraph(
+                paragraph, tracker, translate_input, translation
+            )
+        except Exception as e:
+            logger.warning(
+                f"Cached translation does not apply to paragraph {paragraph.debug_id}, translate again: {e}"
+            )
+            paragraph.unicode = original_unicode
+            return False
+        self.paragraph_cache_hit_count += 1
+        return True
+
+    def _store_paragraph_cache(
+        self, state: "BatchTranslateState", id_: int, translation: str
+    ):
+        cache_keys = state.batch_paragraph.cache_keys
+        if self.paragraph_cache is None or cache_keys is None:
+            return
+        cache_key = cache_keys[state.should_translate_paragraph[id_]]
+        if cache_key is None:
+            return
+        try:
+            self.paragraph_cache.set(cache_key, translation)
+        except Exception as e:
+            logger.debug(f"try set paragraph cache failed, ignore it: {e}")
+
+    def _dedup_key(
+        self,
+        paragraph: PdfParagraph,
+        text: str,
+        translate_input: ILTranslator.TranslateInput,
+    ) -> tuple:
+        """Paragraphs with equal keys get the same LLM input and translation."""
+        placeholders_hint = None
+        if self.translation_config.add_formula_placehold_hint:
+            placeholders_hint = json.dumps(
+                translate_input.get_placeholders_hint(),
+                ensure_ascii=False,
+                sort_keys=True,
+            )
+        return text, paragraph.layout_label, placeholders_hint
+
+    def _get_dedup_key(self, state: "BatchTranslateState", id_: int) -> tuple | None:
+        dedup_keys = state.batch_paragraph.dedup_keys
+        if dedup_keys is None:
+            return None
+        return dedup_keys[state.should_translate_paragraph[id_]]
+
+    def _apply_duplicates(
+        self,
+        duplicates: list[DuplicateParagraph],
+        translation: str | None,
+        pbar: tqdm | None,
+        executor: PriorityThreadPoolExecutor | None,
+    ):
+        """Apply the translation of the leading paragraph to its duplicates.
+
+        Without a translation, or if it does not fit a duplicate, the
+        duplicate is translated on its own by the fallback translator.
+        """
+        shared_context = self.translation_config.shared_context_cross_split_part
+        for duplicate in duplicates:
+            if translation is not None:
+                try:
+                    self.il_translator.post_translate_paragraph(
+                        duplicate.paragraph,
+                        duplicate.tracker,
+                        duplicate.translate_input,
+                        translation,
+                    )
+                    if pbar:
+                        pbar.advance(1)
+                    continue
+                except Exception as e:
+                    logger.warning(
+                        f"Translation of a duplicate does not apply to paragraph {duplicate.paragraph.debug_id}, translate it alone: {e}"
+                    )
+            duplicate.paragraph.unicode = duplicate.unicode
+            paragraph_token_count = self.calc_token_count(duplicate.paragraph.unicode)
+            executor.submit(
+                self.il_translator.translate_paragraph,
+                duplicate.paragraph,
+                pbar,
+                duplicate.tracker,
+                duplicate.page_font_map,
+                duplicate.xobj_font_map,
+                priority=1048576 - paragraph_token_count,
+                paragraph_token_count=paragraph_token_count,
+                title_paragraph=shared_context.first_paragraph,
+                local_title_paragraph=shared_context.recent_title_paragraph,
+            )
+
     def translate_paragraph(
         self,
         batch_paragraph: BatchParagraph,
@@ -224,368 +1049,820 @@ class ILTranslatorLLMOnly:
         local_title_paragraph: PdfParagraph | None = None,
         executor: PriorityThreadPoolExecutor | None = None,
         paragraph_token_count: int = 0,
+        retry_depth: int = 0,
     ):
         """Translate a paragraph using pre and post processing functions."""
         self.translation_config.raise_if_cancelled()
-        should_translate_paragraph = []
+        state = BatchTranslateState(
+            batch_paragraph,
+            pbar,
+            page_font_map,
+            xobj_font_map,
+            title_paragraph,
+            local_title_paragraph,
+            executor,
+        )
         try:
-            inputs = []
-            llm_translate_trackers = []
-            paragraph_unicodes = []
-            for i in range(len(batch_paragraph.paragraphs)):
-                paragraph = batch_paragraph.paragraphs[i]
-                tracker = batch_paragraph.trackers[i]
-                text, translate_input = self.il_translator.pre_translate_paragraph(
-                    paragraph, tracker, page_font_map, xobj_font_map
-                )
-                if text is None:
-                    pbar.advance(1)
-                    continue
-                llm_translate_tracker = tracker.new_llm_translate_tracker()
-                should_translate_paragraph.append(i)
-                llm_translate_trackers.append(llm_translate_tracker)
-                inputs.append(
-                    (
-                        text,
-                        translate_input,
-                        paragraph,
-                        tracker,
-                        llm_translate_tracker,
-                        paragraph_unicodes,
+            final_input = self._prepare_llm_input(state)
+            if final_input is None:
+                return
+            rate_limit_params = {"paragraph_token_count": paragraph_token_count}
+            if self.system_instruction is not None:
+                try:
+                    llm_output = self.translate_engine.llm_translate_structured(
+                        final_input,
+                        self.system_instruction,
+                        LLM_RESPONSE_SCHEMA,
+                        rate_limit_params=rate_limit_params,
+                        validate_output=self._check_llm_output,
+                        context_cache=state.context_cache,
+                    )
+                except ContextCacheUnavailableError as e:
+                    final_input = self._drop_context_cache(state, e)
+                    llm_output = self.translate_engine.llm_translate_structured(
+                        final_input,
+                        self.system_instruction,
+                        LLM_RESPONSE_SCHEMA,
+                        rate_limit_params=rate_limit_params,
+                        validate_output=self._check_llm_output,
                     )
+            else:
+                llm_output = self.translate_engine.llm_translate(
+                    final_input,
+                    rate_limit_params=rate_limit_params,
+                    validate_output=self._check_llm_output,
                 )
-                paragraph_unicodes.append(paragraph.unicode)
-            if not inputs:
-                return
-            json_format_input = []
-
-            for id_, input_text in enumerate(inputs):
-                ti: il_translator.ILTranslator.TranslateInput = input_text[1]
-                placeholders_hint = ti.get_placeholders_hint()
-                obj = {
-                    "id": id_,
-                    "input": input_text[0],
-                    "layout_label": input_text[2].layout_label,
-                }
-                if (
-                    placeholders_hint
-                    and self.translation_config.add_formula_placehold_hint
-                ):
-                    obj["formula_placeholders_hint"] = placeholders_hint
-                json_format_input.append(obj)
-
-            json_format_input_str = json.dumps(
-                json_format_input, ensure_ascii=False, indent=2
+            retry_batches = self._finish_batch(
+                state, retry_depth, llm_output, paragraph_token_count, rate_limit_params
+            )
+        except Exception as e:
+            retry_batches = self._finish_batch(state, retry_depth, error=e)
+        for retry_batch, retry_token_count in retry_batches:
+            self.translate_paragraph(
+                retry_batch,
+                pbar,
+                page_font_map,
+                xobj_font_map,
+                title_paragraph,
+                local_title_paragraph,
+                executor,
+                retry_token_count,
+                retry_depth + 1,
             )
 
-            # Start building the new prompt
-            llm_prompt_parts = []
+    async def translate_paragraph_async(
+        self,
+        batch_paragraph: BatchParagraph,
+        pbar: tqdm | None = None,
+        page_font_map: dict[str, PdfFont] = None,
+        xobj_font_map: dict[int, dict[str, PdfFont]] = None,
+        title_paragraph: PdfParagraph | None = None,
+        local_title_paragraph: PdfParagraph | None = None,
+        executor: PriorityThreadPoolExecutor | None = None,
+        paragraph_token_count: int = 0,
+        retry_depth: int = 0,
+    ):
+        """Asynchronous version of translate_paragraph, runs on the translator event loop.
 
-            # 1. #role
-            llm_prompt_parts.append("#role")
-            if self.translation_config.custom_system_prompt:
-                llm_prompt_parts.append(self.translation_config.custom_system_prompt)
+        Only the LLM requests run on the loop. Preparing the input and applying
+        the output touch the caches and may call the fallback translator, so
+        they run in worker threads to not stall other batches in flight.
+        """
+        self.translation_config.raise_if_cancelled()
+        state = BatchTranslateState(
+            batch_paragraph,
+            pbar,
+            page_font_map,
+            xobj_font_map,
+            title_paragraph,
+            local_title_paragraph,
+            executor,
+        )
+        try:
+            final_input = await asyncio.to_thread(self._prepare_llm_input, state)
+            if final_input is None:
+                return
+            rate_limit_params = {"paragraph_token_count": paragraph_token_count}
+            if self.system_instruction is not None:
+                try:
+                    llm_output = (
+                        await self.translate_engine.async_llm_translate_structured(
+                            final_input,
+                            self.system_instruction,
+                            LLM_RESPONSE_SCHEMA,
+                            rate_limit_params=rate_limit_params,
+                            validate_output=self._check_llm_output,
+                            context_cache=state.context_cache,
+                        )
+                    )
+                except ContextCacheUnavailableError as e:
+                    final_input = await asyncio.to_thread(
+                        self._drop_context_cache, state, e
+                    )
+                    llm_output = (
+                        await self.translate_engine.async_llm_translate_structured(
+                            final_input,
+                            self.system_instruction,
+                            LLM_RESPONSE_SCHEMA,
+                            rate_limit_params=rate_limit_params,
+                            validate_output=self._check_llm_output,
+                        )
+                    )
             else:
-                llm_prompt_parts.append(
-                    f"You are a professional and reliable machine translation engine responsible for translating the input text into {self.translation_config.lang_out}.\n"
-                    "When translating, strictly follow the instructions below to ensure translation quality and preserve all formatting, tags, and placeholders:\n"
+                llm_output = await self.translate_engine.async_llm_translate(
+                    final_input,
+                    rate_limit_params=rate_limit_params,
+                    validate_output=self._check_llm_output,
                 )
+            retry_batches = await asyncio.to_thread(
+                self._finish_batch,
+                state,
+                retry_depth,
+                llm_output,
+                paragraph_token_count,
+                rate_limit_params,
+            )
+        except Exception as e:
+            retry_batches = await asyncio.to_thread(
+                self._finish_batch, state, retry_depth, error=e
+            )
+        for retry_batch, retry_token_count in retry_batches:
+            await self.translate_paragraph_async(
+                retry_batch,
+                pbar,
+                page_font_map,
+                xobj_font_map,
+                title_paragraph,
+                local_title_paragraph,
+                executor,
+                retry_token_count,
+                retry_depth + 1,
+            )
 
-            # 2. ##Contextual Hints for Better Translation
-            contextual_hints_section: list[str] = []
-            hint_idx = 1
-            if title_paragraph:
-                contextual_hints_section.append(
-                    f"{hint_idx}. First title in full text: {title_paragraph.unicode}"
-                )
-                hint_idx += 1
+    def _drop_context_cache(
+        self, state: "BatchTranslateState", e: ContextCacheUnavailableError
+    ) -> str:
+        """Stop using the context cache and return the batch's full LLM input."""
+        logger.warning(f"Context cache lost, sending full prompts from now on: {e}")
+        self.context_cache_keeper.invalidate()
+        state.context_cache = None
+        final_input = self._build_structured_llm_input(
+            state.json_format_input, state.title_paragraph, state.local_title_paragraph
+        )
+        for llm_translate_tracker in state.llm_translate_trackers:
+            llm_translate_tracker.set_input(final_input)
+        return final_input
 
-            if local_title_paragraph:
-                is_different_from_global = True
-                if title_paragraph:
-                    if local_title_paragraph.debug_id == title_paragraph.debug_id:
-                        is_different_from_global = False
+    def _finish_batch(
+        self,
+        state: "BatchTranslateState",
+        retry_depth: int,
+        llm_output: str | None = None,
+        paragraph_token_count: int = 0,
+        rate_limit_params: dict | None = None,
+        error: Exception | None = None,
+    ) -> list[tuple[BatchParagraph, int]]:
+        """Apply the LLM output of a batch and decide what to send again.
 
-                if is_different_from_global:
-                    contextual_hints_section.append(
-                        f"{hint_idx}. Most similar section title: {local_title_paragraph.unicode}"
+        Translations that parsed and validated are kept. Paragraphs whose
+        output is missing or does not fit their placeholders are returned as a
+        smaller batch to retry. When the whole output is unusable, the batch is
+        bisected. Once ``MAX_RETRY_DEPTH`` is reached, or for any other error,
+        the remaining paragraphs go to the fallback translator.
+        """
+        retry_ids = []
+        bisect = False
+        if error is None or isinstance(error, RETRYABLE_BATCH_ERRORS):
+            self.batch_stats.record(batches=1, items=len(state.inputs))
+        if error is None:
+            try:
+                retry_ids = self._apply_llm_output(state, llm_output)
+            except Exception as e:
+                error = e
+        if error is not None:
+            if isinstance(error, RETRYABLE_BATCH_ERRORS):
+                if self.batch_sizer is not None:
+                    self.batch_sizer.on_batch_failed(error)
+                if len(state.inputs) > 1 and retry_depth < self.MAX_RETRY_DEPTH:
+                    logger.warning(
+                        f"Unusable output for a batch of {len(state.inputs)} paragraphs, bisect and retry: {error}"
                     )
-                    hint_idx += 1
-
-            # --- ADD GLOSSARY HINTS ---
-            batch_text_for_glossary_matching = "\n".join(
-                item.get("input", "") for item in json_format_input
-            )
-
-            active_glossary_markdown_blocks: list[str] = []
-            # Use cached glossaries
-            if self._cached_glossaries:
-                for glossary in self._cached_glossaries:
-                    # Get active entries for the current batch_text_for_glossary_matching
-                    active_entries = glossary.get_active_entries_for_text(
-                        batch_text_for_glossary_matching
+                    retry_ids = list(range(len(state.inputs)))
+                    bisect = True
+            if not bisect:
+                self._fallback_batch(state, error)
+                return []
+        elif self.batch_sizer is not None:
+            if len(retry_ids) * 2 > len(state.inputs):
+                self.batch_sizer.on_batch_failed(
+                    BatchOutputMismatchError(
+                        f"{len(retry_ids)} of {len(state.inputs)} translations unusable"
                     )
+                )
+            else:
+                self.batch_sizer.on_batch_succeeded(
+                    paragraph_token_count, rate_limit_params
+                )
+        if not retry_ids:
+            return []
+        if retry_depth >= self.MAX_RETRY_DEPTH:
+            for id_ in retry_ids:
+                self._fallback_input(state, id_)
+            return []
+        self.batch_stats.record(retried_items=len(retry_ids))
+        groups = [retry_ids]
+        if bisect:
+            half = len(retry_ids) // 2
+            groups = [retry_ids[:half], retry_ids[half:]]
+        return [self._make_retry_batch(state, ids) for ids in groups]
 
-                    if active_entries:
-                        current_glossary_md_entries: list[str] = []
-                        for original_source, target_text in sorted(active_entries):
-                            current_glossary_md_entries.append(
-                                f"| {original_source} | {target_text} |"
-                            )
+    def _make_retry_batch(
+        self, state: "BatchTranslateState", ids: list[int]
+    ) -> tuple[BatchParagraph, int]:
+        batch_paragraph = state.batch_paragraph
+        indexes = [state.should_translate_paragraph[id_] for id_ in ids]
+        for id_ in ids:
+            # Undo a partially applied translation.
+            state.inputs[id_][2].unicode = state.inputs[id_][5][id_]
+        retry_batch = BatchParagraph(
+            [batch_paragraph.paragraphs[i] for i in indexes],
+            None,
+            [batch_paragraph.trackers[i] for i in indexes],
+            [(state.inputs[id_][0], state.inputs[id_][1]) for id_ in ids],
+            [batch_paragraph.cache_keys[i] for i in indexes]
+            if batch_paragraph.cache_keys is not None
+            else None,
+            [state.get_font_maps(i) for i in indexes],
+            [batch_paragraph.dedup_keys[i] for i in indexes]
+            if batch_paragraph.dedup_keys is not None
+            else None,
+        )
+        token_count = sum(self.calc_token_count(state.inputs[id_][0]) for id_ in ids)
+        return retry_batch, token_count
 
-                        if current_glossary_md_entries:
-                            glossary_table_md = (
-                                f"### Glossary: {glossary.name}\n\n"
-                                "| Source Term | Target Term |\n"
-                                "|-------------|-------------|\n"
-                                + "\n".join(current_glossary_md_entries)
-                            )
-                            active_glossary_markdown_blocks.append(glossary_table_md)
+    def _prepare_llm_input(self, state: "BatchTranslateState") -> str | None:
+        """Pre-translate the paragraphs of the batch and build the LLM prompt.
 
-            if contextual_hints_section or active_glossary_markdown_blocks:
-                llm_prompt_parts.append("\n## Contextual Hints for Better Translation")
-                llm_prompt_parts.extend(contextual_hints_section)
+        Returns None if no paragraph of the batch needs translation.
+        """
+        batch_paragraph = state.batch_paragraph
+        inputs = state.inputs
+        paragraph_unicodes = []
+        for i in range(len(batch_paragraph.paragraphs)):
+            paragraph = batch_paragraph.paragraphs[i]
+            tracker = batch_paragraph.trackers[i]
+            if batch_paragraph.translate_inputs is not None:
+                text, translate_input = batch_paragraph.translate_inputs[i]
+            else:
+                text, translate_input = self.il_translator.pre_translate_paragraph(
+                    paragraph, tracker, *state.get_font_maps(i)
+                )
+            if text is None:
+                state.pbar.advance(1)
+                continue
+            llm_translate_tracker = tracker.new_llm_translate_tracker()
+            state.should_translate_paragraph.append(i)
+            state.llm_translate_trackers.append(llm_translate_tracker)
+            inputs.append(
+                (
+                    text,
+                    translate_input,
+                    paragraph,
+                    tracker,
+                    llm_translate_tracker,
+                    paragraph_unicodes,
+                )
+            )
+            paragraph_unicodes.append(paragraph.unicode)
+        if not inputs:
+            return None
+        json_format_input = []
 
-                if active_glossary_markdown_blocks:
-                    llm_prompt_parts.append(
-                        f"{hint_idx}. You MUST strictly adhere to the following glossaries. auto_extracted_glossary has a lower priority; please give preference to other glossaries. If a source term from a table appears in the text, use the corresponding target term in your translation:"
-                    )
-                    # hint_idx += 1 # No need to increment if tables are part of this point
-                    for md_block in active_glossary_markdown_blocks:
-                        llm_prompt_parts.append(f"\n{md_block}\n")
+        for id_, input_text in enumerate(inputs):
+            ti: il_translator.ILTranslator.TranslateInput = input_text[1]
+            placeholders_hint = ti.get_placeholders_hint()
+            obj = {
+                "id": id_,
+                "input": input_text[0],
+                "layout_label": input_text[2].layout_label,
+            }
+            if placeholders_hint and self.translation_config.add_formula_placehold_hint:
+                obj["formula_placeholders_hint"] = placeholders_hint
+            json_format_input.append(obj)
 
-            # 3. ## Strict Rules:
-            llm_prompt_parts.append("\n## Strict Rules:")
-            llm_prompt_parts.append(
-                "1. Do NOT translate or alter any of the following elements:"
+        if self.system_instruction is not None:
+            state.json_format_input = json_format_input
+            if self.context_cache_keeper is not None:
+                state.context_cache = self.context_cache_keeper.context_cache
+            final_input = self._build_structured_llm_input(
+                json_format_input,
+                state.title_paragraph,
+                state.local_title_paragraph,
+                state.context_cache,
             )
-            llm_prompt_parts.append(
-                "    Style or HTML-like tags: e.g., <style id='1'>...</style>, <b>...</b>, <i>...</i>, <code>...</code>, etc."
-            )
-            llm_prompt_parts.append(
-                "    Formula or variable placeholders enclosed in curly braces: e.g., {v3}, {equation_1}, {name}, etc."
-            )
-            llm_prompt_parts.append(
-                "    Any other placeholders like [[...]], %%...%%, %s, %d, etc."
-            )
-            llm_prompt_parts.append(
-                "2. Preserve the exact structure, position, and content of the above elements — do not modify spacing, punctuation, or formatting."
-            )
-            llm_prompt_parts.append(
-                "3. If the input contains:Proper nouns, code, or non-translatable technical terms, retain them in the original form."
+        else:
+            json_format_input_str = json.dumps(
+                json_format_input, ensure_ascii=False, indent=2
             )
 
-            # 4. ## Input/Output Format:
-            llm_prompt_parts.append("\n## Input/Output Format:")
-            llm_prompt_parts.append(
-                '1. You will receive a JSON object with entries containing "id" and "input" fields.'
-            )
-            llm_prompt_parts.append(
-                f'2. Your task is to translate the value of "input" into {self.translation_config.lang_out}, while applying the rules above.'
-            )
-            llm_prompt_parts.append(
-                '3. Return a new JSON object with the same "id" and the translated "output" field.'
+            main_prompt_content = self._build_llm_prompt(
+                json_format_input, state.title_paragraph, state.local_title_paragraph
             )
-            llm_prompt_parts.append(
-                "Please return the translated json directly without wrapping ```json``` tag or include any additional information."
-            )
-
-            # 5. ##example (Renumbered from 5 to 4)
-            llm_prompt_parts.append("\n## Example:")
-            llm_prompt_parts.append("Here is an example of the expected format:")
-            llm_prompt_parts.append("")  # Blank line
-            llm_prompt_parts.append("<example>")
-            llm_prompt_parts.append("```json")
-            llm_prompt_parts.append("Input:")
-            llm_prompt_parts.append("{")
-            llm_prompt_parts.append('    "id": 1,')
-            llm_prompt_parts.append('    "input": "Source",')
-            llm_prompt_parts.append('    "layout_label": "plain text",')
-            llm_prompt_parts.append("    // this is optional")
-            llm_prompt_parts.append('    "formula_placeholders_hint": {')
-            llm_prompt_parts.append('        "placeholder1": "hint1",')
-            llm_prompt_parts.append('        "placeholder2": "hint2"')
-            llm_prompt_parts.append("    }")
-            llm_prompt_parts.append("}")
-            llm_prompt_parts.append("```")
-            llm_prompt_parts.append("Output:")
-            llm_prompt_parts.append("```json")
-            llm_prompt_parts.append("{")
-            llm_prompt_parts.append('    "id": 1,')
-            llm_prompt_parts.append('    "output": "Translation"')
-            llm_prompt_parts.append("}")
-            llm_prompt_parts.append("```")
-            llm_prompt_parts.append("</example>")
-
-            # 6. ## Here is the input:
-            llm_prompt_parts.append("\n## Here is the input:")
-
-            # Combine all parts for the main prompt
-            main_prompt_content = "\n".join(llm_prompt_parts)
 
             # Append the actual JSON input string at the end, without markdown fence
             final_input = main_prompt_content + "\n\n" + json_format_input_str
 
-            for llm_translate_tracker in llm_translate_trackers:
-                llm_translate_tracker.set_input(final_input)
-            llm_output = self.translate_engine.llm_translate(
-                final_input,
-                rate_limit_params={"paragraph_token_count": paragraph_token_count},
+        for llm_translate_tracker in state.llm_translate_trackers:
+            llm_translate_tracker.set_input(final_input)
+        return final_input
+
+    def _build_llm_prompt(
+        self,
+        json_format_input: list[dict],
+        title_paragraph: PdfParagraph | None,
+        local_title_paragraph: PdfParagraph | None,
+    ) -> str:
+        # Start building the new prompt
+        llm_prompt_parts = self._get_role_prompt_parts()
+        llm_prompt_parts.extend(
+            self._get_hint_prompt_parts(
+                json_format_input, title_paragraph, local_title_paragraph
             )
-            for llm_translate_tracker in llm_translate_trackers:
-                llm_translate_tracker.set_output(llm_output)
-            llm_output = llm_output.strip()
+        )
+        llm_prompt_parts.extend(self._get_rule_prompt_parts())
 
-            llm_output = self._clean_json_output(llm_output)
+        # 4. ## Input/Output Format:
+        llm_prompt_parts.append("\n## Input/Output Format:")
+        llm_prompt_parts.append(
+            '1. You will receive a JSON object with entries containing "id" and "input" fields.'
+        )
+        llm_prompt_parts.append(
+            f'2. Your task is to translate the value of "input" into {self.translation_config.lang_out}, while applying the rules above.'
+        )
+        llm_prompt_parts.append(
+            '3. Return a new JSON object with the same "id" and the translated "output" field.'
+        )
+        llm_prompt_parts.append(
+            "Please return the translated json directly without wrapping ```json``` tag or include any additional information."
+        )
 
-            parsed_output = json.loads(llm_output)
+        # 5. ##example (Renumbered from 5 to 4)
+        llm_prompt_parts.append("\n## Example:")
+        llm_prompt_parts.append("Here is an example of the expected format:")
+        llm_prompt_parts.append("")  # Blank line
+        llm_prompt_parts.append("<example>")
+        llm_prompt_parts.append("```json")
+        llm_prompt_parts.append("Input:")
+        llm_prompt_parts.append("{")
+        llm_prompt_parts.append('    "id": 1,')
+        llm_prompt_parts.append('    "input": "Source",')
+        llm_prompt_parts.append('    "layout_label": "plain text",')
+        llm_prompt_parts.append("    // this is optional")
+        llm_prompt_parts.append('    "formula_placeholders_hint": {')
+        llm_prompt_parts.append('        "placeholder1": "hint1",')
+        llm_prompt_parts.append('        "placeholder2": "hint2"')
+        llm_prompt_parts.append("    }")
+        llm_prompt_parts.append("}")
+        llm_prompt_parts.append("```")
+        llm_prompt_parts.append("Output:")
+        llm_prompt_parts.append("```json")
+        llm_prompt_parts.append("{")
+        llm_prompt_parts.append('    "id": 1,')
+        llm_prompt_parts.append('    "output": "Translation"')
+        llm_prompt_parts.append("}")
+        llm_prompt_parts.append("```")
+        llm_prompt_parts.append("</example>")
 
-            if isinstance(parsed_output, dict) and parsed_output.get(
-                "output", parsed_output.get("input", False)
-            ):
-                parsed_output = [parsed_output]
+        # 6. ## Here is the input:
+        llm_prompt_parts.append("\n## Here is the input:")
 
-            translation_results = {
-                item["id"]: item.get("output", item.get("input"))
-                for item in parsed_output
-            }
+        # Combine all parts for the main prompt
+        return "\n".join(llm_prompt_parts)
 
-            if len(translation_results) != len(inputs):
-                raise Exception(
-                    f"Translation results length mismatch. Expected: {len(inputs)}, Got: {len(translation_results)}"
-                )
+    def _build_system_instruction(self) -> str:
+        """Static part of the prompt for structured output mode.
 
-            for id_, output in translation_results.items():
-                should_fallback = True
-                try:
-                    if not isinstance(output, str):
-                        logger.warning(
-                            f"Translation result is not a string. Output: {output}"
-                        )
-                        continue
+        The response format is enforced by LLM_RESPONSE_SCHEMA, so the format
+        section is short and there is no example.
+        """
+        llm_prompt_parts = self._get_role_prompt_parts()
+        llm_prompt_parts.extend(self._get_rule_prompt_parts())
+        llm_prompt_parts.append("\n## Input/Output Format:")
+        llm_prompt_parts.append(
+            '1. You will receive a JSON array of entries containing "id" and "input" fields, optionally with "layout_label" and "formula_placeholders_hint".'
+        )
+        llm_prompt_parts.append(
+            f'2. Your task is to translate the value of "input" into {self.translation_config.lang_out}, while applying the rules above.'
+        )
+        llm_prompt_parts.append(
+            '3. Return one entry per input with the same "id" and the translated "output".'
+        )
+        return "\n".join(llm_prompt_parts)
 
-                    id_ = int(id_)  # Ensure id is an integer
-                    if id_ >= len(inputs):
-                        logger.warning(f"Invalid id {id_}, skipping")
-                        continue
+    def _build_structured_llm_input(
+        self,
+        json_format_input: list[dict],
+        title_paragraph: PdfParagraph | None,
+        local_title_paragraph: PdfParagraph | None,
+        context_cache: ContextCache | None = None,
+    ) -> str:
+        """Per-batch part of the prompt for structured output mode.
 
-                    # Clean up any excessive punctuation in the translated text
-                    translated_text = re.sub(r"[. 。…，]{20,}", ".", output)
+        With a context cache, only what is not in the cache is included.
+        """
+        llm_prompt_parts = self._get_hint_prompt_parts(
+            json_format_input,
+            title_paragraph,
+            local_title_paragraph,
+            static_hints=context_cache is None,
+        )
+        llm_prompt_parts.append("\n## Here is the input:")
+        llm_prompt_parts.append(
+            json.dumps(json_format_input, ensure_ascii=False, separators=(",", ":"))
+        )
+        return "\n".join(llm_prompt_parts).lstrip()
 
-                    # Get the original input for this translation
-                    translate_input = inputs[id_][1]
-                    llm_translate_tracker = inputs[id_][4]
+    def _build_context_cache_contents(
+        self, title_paragraph: PdfParagraph | None
+    ) -> str:
+        """Hints shared by all batches of the document, for the context cache."""
+        return "\n".join(
+            self._get_hint_prompt_parts(None, title_paragraph, None)
+        ).lstrip()
 
-                    input_unicode = inputs[id_][0]
-                    output_unicode = translated_text
+    def _get_role_prompt_parts(self) -> list[str]:
+        llm_prompt_parts = []
 
-                    trimed_input = re.sub(r"[. 。…，]{20,}", ".", input_unicode)
+        # 1. #role
+        llm_prompt_parts.append("#role")
+        if self.translation_config.custom_system_prompt:
+            llm_prompt_parts.append(self.translation_config.custom_system_prompt)
+        else:
+            llm_prompt_parts.append(
+                f"You are a professional and reliable machine translation engine responsible for translating the input text into {self.translation_config.lang_out}.\n"
+                "When translating, strictly follow the instructions below to ensure translation quality and preserve all formatting, tags, and placeholders:\n"
+            )
 
-                    input_token_count = self.calc_token_count(trimed_input)
-                    output_token_count = self.calc_token_count(output_unicode)
+        return llm_prompt_parts
 
-                    if trimed_input == output_unicode and input_token_count > 10:
-                        llm_translate_tracker.set_error_message(
-                            "Translation result is the same as input, fallback."
-                        )
-                        logger.warning(
-                            "Translation result is the same as input, fallback."
-                        )
-                        continue
+    def _get_hint_prompt_parts(
+        self,
+        json_format_input: list[dict] | None,
+        title_paragraph: PdfParagraph | None,
+        local_title_paragraph: PdfParagraph | None,
+        static_hints: bool = True,
+    ) -> list[str]:
+        """Contextual hints of the prompt.
 
-                    if not (0.3 < output_token_count / input_token_count < 3):
-                        llm_translate_tracker.set_error_message(
-                            f"Translation result is too long or too short. Input: {input_token_count}, Output: {output_token_count}"
-                        )
-                        logger.warning(
-                            f"Translation result is too long or too short. Input: {input_token_count}, Output: {output_token_count}"
-                        )
-                        continue
+        Without ``json_format_input`` all glossary entries are listed instead of
+        those occurring in the batch. ``static_hints=False`` leaves out the
+        document title and the glossaries, which are in the context cache then.
+        """
+        llm_prompt_parts = []
 
-                    edit_distance = Levenshtein.distance(input_unicode, output_unicode)
-                    if edit_distance < 5 and input_token_count > 20:
-                        llm_translate_tracker.set_error_message(
-                            f"Translation result edit distance is too small. distance: {edit_distance}, input: {input_unicode}, output: {output_unicode}"
-                        )
-                        logger.warning(
-                            f"Translation result edit distance is too small. distance: {edit_distance}, input: {input_unicode}, output: {output_unicode}"
-                        )
-                        continue
-                    # Apply the translation to the paragraph
-                    self.il_translator.post_translate_paragraph(
-                        inputs[id_][2],
-                        inputs[id_][3],
-                        translate_input,
-                        translated_text,
+        # 2. ##Contextual Hints for Better Translation
+        contextual_hints_section: list[str] = []
+        hint_idx = 1
+        if title_paragraph and static_hints:
+            contextual_hints_section.append(
+                f"{hint_idx}. First title in full text: {title_paragraph.unicode}"
+            )
+            hint_idx += 1
+
+        if local_title_paragraph:
+            is_different_from_global = True
+            if title_paragraph:
+                if local_title_paragraph.debug_id == title_paragraph.debug_id:
+                    is_different_from_global = False
+
+            if is_different_from_global:
+                contextual_hints_section.append(
+                    f"{hint_idx}. Most similar section title: {local_title_paragraph.unicode}"
+                )
+                hint_idx += 1
+
+        active_glossary_markdown_blocks: list[str] = []
+        # Use cached glossaries
+        if self._cached_glossaries and static_hints:
+            # --- ADD GLOSSARY HINTS ---
+            batch_text_for_glossary_matching = None
+            if json_format_input is not None:
+                batch_text_for_glossary_matching = "\n".join(
+                    item.get("input", "") for item in json_format_input
+                )
+            for glossary in self._cached_glossaries:
+                # Get active entries for the current batch_text_for_glossary_matching
+                if batch_text_for_glossary_matching is None:
+                    active_entries = [
+                        (entry.source, entry.target) for entry in glossary.entries
+                    ]
+                else:
+                    active_entries = glossary.get_active_entries_for_text(
+                        batch_text_for_glossary_matching
                     )
-                    should_fallback = False
-                    if pbar:
-                        pbar.advance(1)
-                except Exception as e:
-                    error_message = f"Error translating paragraph. Error: {e}."
-                    logger.exception(error_message)
-                    # Ignore error and continue
-                    for llm_translate_tracker in llm_translate_trackers:
-                        llm_translate_tracker.set_error_message(error_message)
-                    continue
-                finally:
-                    self.total_count += 1
-                    if should_fallback:
-                        self.fallback_count += 1
-                        inputs[id_][4].set_fallback_to_translate()
-                        logger.warning(
-                            f"Fallback to simple translation. paragraph id: {inputs[id_][2].debug_id}"
-                        )
-                        paragraph_token_count = self.calc_token_count(
-                            inputs[id_][2].unicode
+
+                if active_entries:
+                    current_glossary_md_entries: list[str] = []
+                    for original_source, target_text in sorted(active_entries):
+                        current_glossary_md_entries.append(
+                            f"| {original_source} | {target_text} |"
                         )
-                        paragraph_unicodes = inputs[id_][5]
-                        inputs[id_][2].unicode = paragraph_unicodes[id_]
-                        executor.submit(
-                            self.il_translator.translate_paragraph,
-                            inputs[id_][2],
-                            pbar,
-                            inputs[id_][3],
-                            page_font_map,
-                            xobj_font_map,
-                            priority=1048576 - paragraph_token_count,
-                            paragraph_token_count=paragraph_token_count,
-                            title_paragraph=title_paragraph,
-                            local_title_paragraph=local_title_paragraph,
+
+                    if current_glossary_md_entries:
+                        glossary_table_md = (
+                            f"### Glossary: {glossary.name}\n\n"
+                            "| Source Term | Target Term |\n"
+                            "|-------------|-------------|\n"
+                            + "\n".join(current_glossary_md_entries)
                         )
-                    else:
-                        self.ok_count += 1
+                        active_glossary_markdown_blocks.append(glossary_table_md)
 
-        except Exception as e:
-            error_message = f"Error {e} during translation. try fallback"
-            logger.warning(error_message)
-            for llm_translate_tracker in llm_translate_trackers:
-                llm_translate_tracker.set_error_message(error_message)
-                llm_translate_tracker.set_fallback_to_translate()
-            for input_ in inputs:
-                input_[2].unicode = input_[5]
-            if not should_translate_paragraph:
-                should_translate_paragraph = list(
-                    range(len(batch_paragraph.paragraphs))
+        if contextual_hints_section or active_glossary_markdown_blocks:
+            llm_prompt_parts.append("\n## Contextual Hints for Better Translation")
+            llm_prompt_parts.extend(contextual_hints_section)
+
+            if active_glossary_markdown_blocks:
+                llm_prompt_parts.append(
+                    f"{hint_idx}. You MUST strictly adhere to the following glossaries. auto_extracted_glossary has a lower priority; please give preference to other glossaries. If a source term from a table appears in the text, use the corresponding target term in your translation:"
                 )
-            for i in should_translate_paragraph:
-                paragraph = batch_paragraph.paragraphs[i]
-                tracker = batch_paragraph.trackers[i]
-                if paragraph.debug_id is None:
+                # hint_idx += 1 # No need to increment if tables are part of this point
+                for md_block in active_glossary_markdown_blocks:
+                    llm_prompt_parts.append(f"\n{md_block}\n")
+
+        return llm_prompt_parts
+
+    def _get_rule_prompt_parts(self) -> list[str]:
+        llm_prompt_parts = []
+
+        # 3. ## Strict Rules:
+        llm_prompt_parts.append("\n## Strict Rules:")
+        llm_prompt_parts.append(
+            "1. Do NOT translate or alter any of the following elements:"
+        )
+        llm_prompt_parts.append(
+            "    Style or HTML-like tags: e.g., <style id='1'>...</style>, <b>...</b>, <i>...</i>, <code>...</code>, etc."
+        )
+        llm_prompt_parts.append(
+            "    Formula or variable placeholders enclosed in curly braces: e.g., {v3}, {equation_1}, {name}, etc."
+        )
+        llm_prompt_parts.append(
+            "    Any other placeholders like [[...]], %%...%%, %s, %d, etc."
+        )
+        llm_prompt_parts.append(
+            "2. Preserve the exact structure, position, and content of the above elements — do not modify spacing, punctuation, or formatting."
+        )
+        llm_prompt_parts.append(
+            "3. If the input contains:Proper nouns, code, or non-translatable technical terms, retain them in the original form."
+        )
+        return llm_prompt_parts
+
+    def _check_llm_output(self, llm_output: str):
+        """Raise if the LLM output is not valid JSON as a whole.
+
+        Picks between the responses of a hedged request. A response that only
+        parses by salvaging its items is still used if the other one fails.
+        """
+        json.loads(self._clean_json_output(llm_output.strip()))
+
+    def _parse_llm_output(self, llm_output: str) -> dict[int, str]:
+        """Return the translations of the LLM output by input id.
+
+        If the output is not valid JSON as a whole, every well-formed item in it
+        is salvaged. Items without a usable id or string output are dropped.
+        """
+        llm_output = self._clean_json_output(llm_output.strip())
+        try:
+            parsed_output = json.loads(llm_output)
+        except json.JSONDecodeError:
+            parsed_output = self._salvage_json_items(llm_output)
+            if not parsed_output:
+                raise
+            self.batch_stats.record(salvaged_batches=1)
+            logger.warning(
+                f"LLM output is not valid JSON, salvaged {len(parsed_output)} items"
+            )
+
+        if isinstance(parsed_output, dict) and parsed_output.get(
+            "output", parsed_output.get("input", False)
+        ):
+            parsed_output = [parsed_output]
+        if not isinstance(parsed_output, list):
+            raise BatchOutputMismatchError(
+                f"Unexpected LLM output type: {type(parsed_output)}"
+            )
+
+        translation_results = {}
+        for item in parsed_output:
+            if not isinstance(item, dict):
+                continue
+            output = item.get("output", item.get("input"))
+            if not isinstance(output, str):
+                logger.warning(f"Translation result is not a string. Output: {output}")
+                continue
+            try:
+                translation_results[int(item["id"])] = output
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Invalid id in translation result: {item}")
+        return translation_results
+
+    @staticmethod
+    def _salvage_json_items(text: str) -> list[dict]:
+        """Decode every JSON object with an id found in a broken JSON document."""
+        decoder = json.JSONDecoder()
+        items = []
+        pos = 0
+        while (start := text.find("{", pos)) != -1:
+            try:
+                obj, end = decoder.raw_decode(text, start)
+            except json.JSONDecodeError:
+                pos = start + 1
+                continue
+            if isinstance(obj, dict) and "id" in obj:
+                items.append(obj)
+            pos = end
+        return items
+
+    def _apply_llm_output(
+        self, state: "BatchTranslateState", llm_output: str
+    ) -> list[int]:
+        """Parse the LLM output and post-translate every paragraph of the batch.
+
+        Paragraphs whose translation does not pass the sanity checks are handed
+        to the fallback translator. Returns the ids of the inputs without a
+        usable translation, either missing from the output or not fitting the
+        paragraph's placeholders, so that they can be sent again.
+        """
+        inputs = state.inputs
+        llm_translate_trackers = state.llm_translate_trackers
+        pbar = state.pbar
+        executor = state.executor
+
+        for llm_translate_tracker in llm_translate_trackers:
+            llm_translate_tracker.set_output(llm_output)
+
+        translation_results = {
+            id_: output
+            for id_, output in self._parse_llm_output(llm_output).items()
+            if 0 <= id_ < len(inputs)
+        }
+        if not translation_results:
+            raise BatchOutputMismatchError(
+                f"No usable translation results. Expected: {len(inputs)}"
+            )
+        retry_ids = [
+            id_ for id_ in range(len(inputs)) if id_ not in translation_results
+        ]
+
+        for id_, output in translation_results.items():
+            should_fallback = True
+            try:
+                # Clean up any excessive punctuation in the translated text
+                translated_text = re.sub(r"[. 。…，]{20,}", ".", output)
+
+                # Get the original input for this translation
+                translate_input = inputs[id_][1]
+                llm_translate_tracker = inputs[id_][4]
+
+                input_unicode = inputs[id_][0]
+                output_unicode = translated_text
+
+                trimed_input = re.sub(r"[. 。…，]{20,}", ".", input_unicode)
+
+                input_token_count = self.calc_token_count(trimed_input)
+                output_token_count = self.calc_token_count(output_unicode)
+
+                if trimed_input == output_unicode and input_token_count > 10:
+                    llm_translate_tracker.set_error_message(
+                        "Translation result is the same as input, fallback."
+                    )
+                    logger.warning("Translation result is the same as input, fallback.")
                     continue
-                paragraph_token_count = self.calc_token_count(paragraph.unicode)
-                executor.submit(
-                    self.il_translator.translate_paragraph,
-                    paragraph,
-                    pbar,
-                    tracker,
-                    page_font_map,
-                    xobj_font_map,
-                    priority=1048576 - paragraph_token_count,
-                    paragraph_token_count=paragraph_token_count,
-                    title_paragraph=title_paragraph,
-                    local_title_paragraph=local_title_paragraph,
+
+                if not (0.3 < output_token_count / input_token_count < 3):
+                    llm_translate_tracker.set_error_message(
+                        f"Translation result is too long or too short. Input: {input_token_count}, Output: {output_token_count}"
+                    )
+                    logger.warning(
+                        f"Translation result is too long or too short. Input: {input_token_count}, Output: {output_token_count}"
+                    )
+                    continue
+
+                edit_distance = Levenshtein.distance(input_unicode, output_unicode)
+                if edit_distance < 5 and input_token_count > 20:
+                    llm_translate_tracker.set_error_message(
+                        f"Translation result edit distance is too small. distance: {edit_distance}, input: {input_unicode}, output: {output_unicode}"
+                    )
+                    logger.warning(
+                        f"Translation result edit distance is too small. distance: {edit_distance}, input: {input_unicode}, output: {output_unicode}"
+                    )
+                    continue
+                # Apply the translation to the paragraph
+                self.il_translator.post_translate_paragraph(
+                    inputs[id_][2],
+                    inputs[id_][3],
+                    translate_input,
+                    translated_text,
                 )
+                self._store_paragraph_cache(state, id_, translated_text)
+                should_fallback = False
+                if (dedup_key := self._get_dedup_key(state, id_)) is not None:
+                    self._apply_duplicates(
+                        self.deduplicator.resolve(dedup_key, translated_text),
+                        translated_text,
+                        pbar,
+                        executor,
+                    )
+                if pbar:
+                    pbar.advance(1)
+            except Exception as e:
+                # Most likely placeholders the LLM broke, worth another try.
+                error_message = f"Error translating paragraph. Error: {e}."
+                logger.warning(error_message)
+                inputs[id_][4].set_error_message(error_message)
+                retry_ids.append(id_)
+                should_fallback = False
+                continue
+            finally:
+                if should_fallback:
+                    self._fallback_input(state, id_)
+                elif id_ not in retry_ids:
+                    self.total_count += 1
+                    self.ok_count += 1
+        return sorted(retry_ids)
+
+    def _fallback_input(self, state: "BatchTranslateState", id_: int):
+        """Translate one paragraph of the batch with the fallback translator."""
+        inputs = state.inputs
+        self.total_count += 1
+        self.fallback_count += 1
+        self.batch_stats.record(fallback_items=1)
+        inputs[id_][4].set_fallback_to_translate()
+        if (dedup_key := self._get_dedup_key(state, id_)) is not None:
+            self._apply_duplicates(
+                self.deduplicator.abandon(dedup_key), None, state.pbar, state.executor
+            )
+        logger.warning(
+            f"Fallback to simple translation. paragraph id: {inputs[id_][2].debug_id}"
+        )
+        paragraph_token_count = self.calc_token_count(inputs[id_][2].unicode)
+        paragraph_unicodes = inputs[id_][5]
+        inputs[id_][2].unicode = paragraph_unicodes[id_]
+        page_font_map, xobj_font_map = state.get_font_maps(
+            state.should_translate_paragraph[id_]
+        )
+        state.executor.submit(
+            self.il_translator.translate_paragraph,
+            inputs[id_][2],
+            state.pbar,
+            inputs[id_][3],
+            page_font_map,
+            xobj_font_map,
+            priority=1048576 - paragraph_token_count,
+            paragraph_token_count=paragraph_token_count,
+            title_paragraph=state.title_paragraph,
+            local_title_paragraph=state.local_title_paragraph,
+        )
+
+    def _fallback_batch(self, state: "BatchTranslateState", e: Exception):
+        """Translate every paragraph of a failed batch with the fallback translator."""
+        batch_paragraph = state.batch_paragraph
+        error_message = f"Error {e} during translation. try fallback"
+        logger.warning(error_message)
+        for llm_translate_tracker in state.llm_translate_trackers:
+            llm_translate_tracker.set_error_message(error_message)
+            llm_translate_tracker.set_fallback_to_translate()
+        for id_, input_ in enumerate(state.inputs):
+            input_[2].unicode = input_[5][id_]
+        should_translate_paragraph = state.should_translate_paragraph
+        if not should_translate_paragraph:
+            should_translate_paragraph = list(range(len(batch_paragraph.paragraphs)))
+        self.batch_stats.record(fallback_items=len(should_translate_paragraph))
+        for i in should_translate_paragraph:
+            paragraph = batch_paragraph.paragraphs[i]
+            tracker = batch_paragraph.trackers[i]
+            if batch_paragraph.dedup_keys is not None and (
+                dedup_key := batch_paragraph.dedup_keys[i]
+            ):
+                self._apply_duplicates(
+                    self.deduplicator.abandon(dedup_key),
+                    None,
+                    state.pbar,
+                    state.executor,
+                )
+            if paragraph.debug_id is None:
+                continue
+            paragraph_token_count = self.calc_token_count(paragraph.unicode)
+            state.executor.submit(
+                self.il_translator.translate_paragraph,
+                paragraph,
+                state.pbar,
+                tracker,
+                *state.get_font_maps(i),
+                priority=1048576 - paragraph_token_count,
+                paragraph_token_count=paragraph_token_count,
+                title_paragraph=state.title_paragraph,
+                local_title_paragraph=state.local_title_paragraph,
+            )
 
     def _clean_json_output(self, llm_output: str) -> str:
         # Clean up JSON output by removing common wrapper tags
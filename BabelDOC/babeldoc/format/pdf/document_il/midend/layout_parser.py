@@ -5,8 +5,8 @@ import cv2
 import numpy as np
 from pymupdf import Document
 
+from babeldoc.docvision.layout_cache import handle_document_cached
 from babeldoc.format.pdf.document_il import il_version_1
-from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
 from babeldoc.format.pdf.document_il.utils.style_helper import GREEN
 from babeldoc.format.pdf.translation_config import TranslationConfig
 
@@ -16,9 +16,105 @@ logger = logging.getLogger(__name__)
 class LayoutParser:
     stage_name = "Parse Page Layout"
 
+    # Page classes decided before inference
+    PAGE_EMPTY = "empty"
+    PAGE_SIMPLE = "simple"
+    PAGE_MODEL = "model"
+
+    # Simple pages: characters leave no vertical gap wider than this share of
+    # the page width, figures cover at most this share of the page, no
+    # character is more than 15% larger than the median font size (headings)
+    # and at most this share is more than 15% smaller (footnotes, indices)
+    COLUMN_GAP_RATIO = 0.02
+    MAX_FIGURE_COVERAGE = 0.05
+    MAX_SMALL_FONT_RATIO = 0.05
+
     def __init__(self, translation_config: TranslationConfig):
         self.translation_config = translation_config
         self.model = translation_config.doc_layout_model
+        self.empty_page_count = 0
+        self.simple_page_count = 0
+
+    def classify_page(self, page: il_version_1.Page) -> str:
+        """Decide from the IL whether a page needs the layout model.
+
+        Pages without visible characters have nothing to translate. With
+        ``simple_page_layout`` enabled, single-column pages of uniform text
+        without notable figures get one synthetic text layout.
+        """
+        chars = [
+            char
+            for char in page.pdf_character
+            if char.box is not None
+            and char.char_unicode is not None
+            and not char.char_unicode.isspace()
+        ]
+        if not chars:
+            return self.PAGE_EMPTY
+        if not self.translation_config.simple_page_layout or page.cropbox is None:
+            return self.PAGE_MODEL
+
+        page_box = page.cropbox.box
+        page_width = page_box.x2 - page_box.x
+        page_area = page_width * (page_box.y2 - page_box.y)
+        if page_area <= 0:
+            return self.PAGE_MODEL
+
+        figure_area = sum(
+            max(0.0, min(f.box.x2, page_box.x2) - max(f.box.x, page_box.x))
+            * max(0.0, min(f.box.y2, page_box.y2) - max(f.box.y, page_box.y))
+            for f in page.pdf_figure
+            if f.box is not None
+        )
+        if figure_area > page_area * self.MAX_FIGURE_COVERAGE:
+            return self.PAGE_MODEL
+
+        font_sizes = np.array(
+            [
+                char.pdf_style.font_size
+                if char.pdf_style and char.pdf_style.font_size
+                else 0.0
+                for char in chars
+            ]
+        )
+        median_size = np.median(font_sizes)
+        if (
+            median_size <= 0
+            or (font_sizes > median_size * 1.15).any()
+            or (font_sizes < median_size * 0.85).mean() > self.MAX_SMALL_FONT_RATIO
+        ):
+            return self.PAGE_MODEL
+
+        # A column gutter shows up as a gap in the horizontal projection.
+        covered_until = None
+        for x, x2 in sorted((char.box.x, char.box.x2) for char in chars):
+            if covered_until is not None and (
+                x - covered_until > page_width * self.COLUMN_GAP_RATIO
+            ):
+                return self.PAGE_MODEL
+            covered_until = x2 if covered_until is None else max(covered_until, x2)
+        return self.PAGE_SIMPLE
+
+    @staticmethod
+    def _simple_page_layout(page: il_version_1.Page) -> il_version_1.PageLayout:
+        boxes = [
+            char.box
+            for char in page.pdf_character
+            if char.box is not None
+            and char.char_unicode is not None
+            and not char.char_unicode.isspace()
+        ]
+        return il_version_1.PageLayout(
+            id=1,
+            box=il_version_1.Box(
+                min(box.x for box in boxes) - 1,
+                min(box.y for box in boxes) - 1,
+                max(box.x2 for box in boxes) + 1,
+                max(box.y2 for box in boxes) + 1,
+            ),
+            conf=1.0,
+            class_name="plain text",
+        )
 
     def _save_debug_image(self, image: np.ndarray, layout, page_number: int):
         """Save debug image with drawn boxes if debug mode is enabled."""
@@ -116,18 +212,44 @@ class LayoutParser:
             self.stage_name,
             total,
         ) as progress:
+            model_pages = []
+            for page in docs.page:
+                page_class = self.classify_page(page)
+                if page_class == self.PAGE_MODEL:
+                    model_pages.append(page)
+                    continue
+                if page_class == self.PAGE_EMPTY:
+                    self.empty_page_count += 1
+                    page.page_layout = []
+                else:
+                    self.simple_page_count += 1
+                    page.page_layout = [self._simple_page_layout(page)]
+                    self._save_debug_box_to_page(page)
+                progress.advance(1)
+            if self.empty_page_count or self.simple_page_count:
+                logger.info(
+                    f"Skipped layout inference for {self.empty_page_count} pages "
+                    f"without text and {self.simple_page_count} simple text "
+                    f"pages of {total}"
+                )
+
+            page_raster_cache = self.translation_config.get_page_raster_cache(mupdf_doc)
             # Process predictions for each page
-            for page, layouts in self.model.handle_document(
-                docs.page, mupdf_doc, self.translation_config, self._save_debug_image
+            for page, layouts in handle_document_cached(
+                self.model,
+                model_pages,
+                mupdf_doc,
+                self.translation_config,
+                self._save_debug_image,
             ):
                 page_layouts = []
+                if layouts.boxes:
+                    # The model rendered this page already, reuse its raster size.
+                    w, h = page_raster_cache.get_size(page.page_number)
                 for layout in layouts.boxes:
                     # Convert coordinate system from picture to il
                     # system to the il coordinate system
                     x0, y0, x1, y1 = layout.xyxy
-                    pix = get_no_rotation_img(mupdf_doc[page.page_number])
-                    # pix = mupdf_doc[page.page_number].get_pixmap()
-                    h, w = pix.height, pix.width
                     x0, y0, x1, y1 = (
                         np.clip(int(x0 - 1), 0, w - 1),
                         np.clip(int(h - y1 - 1), 0, h - 1),
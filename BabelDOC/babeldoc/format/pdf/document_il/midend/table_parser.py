@@ -5,8 +5,8 @@ import cv2
 import numpy as np
 from pymupdf import Document
 
+from babeldoc.docvision.layout_cache import handle_document_cached
 from babeldoc.format.pdf.document_il import il_version_1
-from babeldoc.format.pdf.document_il.utils.mupdf_helper import get_no_rotation_img
 from babeldoc.format.pdf.document_il.utils.style_helper import GREEN
 from babeldoc.format.pdf.translation_config import TranslationConfig
 
@@ -113,6 +113,14 @@ class TableParser:
                 ),
             )
 
+    @staticmethod
+    def _table_boxes(page: il_version_1.Page) -> list[tuple[float, ...]]:
+        return [
+            (layout.box.x, layout.box.y, layout.box.x2, layout.box.y2)
+            for layout in page.page_layout
+            if layout.class_name == "table"
+        ]
+
     def process(self, docs: il_version_1.Document, mupdf_doc: Document):
         """Generate layouts for all pages that need to be translated."""
         # Get pages that need to be translated
@@ -125,21 +133,25 @@ class TableParser:
             self.stage_name,
             len(have_table_pages),
         ) as progress:
+            page_raster_cache = self.translation_config.get_page_raster_cache(mupdf_doc)
             # Process predictions for each page
-            for page, layouts in self.model.handle_document(
+            for page, layouts in handle_document_cached(
+                self.model,
                 have_table_pages.values(),
                 mupdf_doc,
                 self.translation_config,
                 self._save_debug_image,
+                # Table text boxes are filtered by the detected tables.
+                key_extra=self._table_boxes,
             ):
                 page_layouts = []
+                if layouts.boxes:
+                    # The model rendered this page already, reuse its raster size.
+                    w, h = page_raster_cache.get_size(page.page_number)
                 for layout in layouts.boxes:
                     # Convert coordinate system from picture to il
                     # system to the il coordinate system
                     x0, y0, x1, y1 = layout.xyxy
-                    # pix = mupdf_doc[page.page_number].get_pixmap()
-                    pix = get_no_rotation_img(mupdf_doc[page.page_number])
-                    h, w = pix.height, pix.width
                     x0, y0, x1, y1 = (
                         np.clip(int(x0 - 1), 0, w - 1),
                         np.clip(int(h - y1 - 1), 0, h - 1),
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import contextlib
 import copy
 import logging
+import multiprocessing
+import os
 import re
 import statistics
 import unicodedata
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
 from functools import cache
+from functools import lru_cache
 
 import pymupdf
 import regex
@@ -18,6 +26,7 @@ from babeldoc.format.pdf.document_il import PdfFormula
 from babeldoc.format.pdf.document_il import PdfParagraphComposition
 from babeldoc.format.pdf.document_il import PdfStyle
 from babeldoc.format.pdf.document_il import il_version_1
+from babeldoc.format.pdf.document_il.utils import il_codec
 from babeldoc.format.pdf.document_il.utils.fontmap import FontMapper
 from babeldoc.format.pdf.document_il.utils.formular_helper import update_formula_data
 from babeldoc.format.pdf.document_il.utils.layout_helper import box_to_tuple
@@ -26,6 +35,9 @@ from babeldoc.format.pdf.translation_config import WatermarkOutputMode
 
 logger = logging.getLogger(__name__)
 
+# Documents shorter than this are typeset in the current process
+PARALLEL_TYPESETTING_MIN_PAGES = 32
+
 LINE_BREAK_REGEX = regex.compile(
     r"^["
     r"a-z"
@@ -85,6 +97,12 @@ LINE_BREAK_REGEX = regex.compile(
 )
 
 
+@lru_cache(maxsize=65536)
+def _char_width(font: pymupdf.Font, unicode: str, font_size: float) -> float:
+    """字符宽度。每次排版尝试都会以相同的几个字号重新测量，因此缓存结果"""
+    return font.char_lengths(unicode, font_size)[0]
+
+
 class TypesettingUnit:
     def __str__(self):
         return self.try_get_unicode() or ""
@@ -445,7 +463,7 @@ class TypesettingUnit:
             # formular_box.x2 += self.formular.x_advance
             # return formular_box
         elif self.unicode:
-            char_width = self.font.char_lengths(self.unicode, self.font_size)[0]
+            char_width = _char_width(self.font, self.unicode, self.font_size)
             if self.x is None or self.y is None or self.scale is None:
                 return Box(0, 0, char_width, self.font_size)
             return Box(self.x, self.y, self.x + char_width, self.y + self.font_size)
@@ -677,6 +695,8 @@ class Typesetting:
     def __init__(self, translation_config: TranslationConfig):
         self.font_mapper = FontMapper(translation_config)
         self.translation_config = translation_config
+        # 段落在给定缩放因子和边界框下是否放得下，预处理与渲染阶段共用
+        self._scale_fit_cache: dict[tuple, bool] = {}
         self.lang_code = self.translation_config.lang_out.upper()
         self.is_cjk = (
             # Why zh-CN/zh-HK/zh-TW here but not zh-Hans and so on?
@@ -692,52 +712,64 @@ class Typesetting:
 
     def preprocess_document(self, document: il_version_1.Document, pbar):
         """预处理文档，获取每个段落的最优缩放因子，不执行实际排版"""
-        all_scales: list[float] = []
-        all_paragraphs: list[il_version_1.PdfParagraph] = []
-
         for page in document.page:
             pbar.advance()
-            # 准备字体信息（复制自 render_page 的逻辑）
-            fonts: dict[
-                str | int,
-                il_version_1.PdfFont | dict[str, il_version_1.PdfFont],
-            ] = {f.font_id: f for f in page.pdf_font if f.font_id}
-            page_fonts = {f.font_id: f for f in page.pdf_font if f.font_id}
-            for k, v in self.font_mapper.fontid2font.items():
-                fonts[k] = v
-            for xobj in page.pdf_xobject:
-                if xobj.xobj_id is not None:
-                    fonts[xobj.xobj_id] = page_fonts.copy()
-                    for font in xobj.pdf_font:
-                        if (
-                            xobj.xobj_id in fonts
-                            and isinstance(fonts[xobj.xobj_id], dict)
-                            and font.font_id
-                        ):
-                            fonts[xobj.xobj_id][font.font_id] = font
-
-            # 处理每个段落
-            for paragraph in page.pdf_paragraph:
-                all_paragraphs.append(paragraph)
-                try:
-                    typesetting_units = self.create_typesetting_units(paragraph, fonts)
-
-                    # 如果所有单元都可以直接传递，则 scale = 1.0
-                    if all(unit.can_passthrough for unit in typesetting_units):
-                        paragraph.optimal_scale = 1.0
-                    else:
-                        # 获取最优缩放因子
-                        optimal_scale = self._get_optimal_scale(
-                            paragraph, page, typesetting_units
-                        )
-                        paragraph.optimal_scale = optimal_scale
-                except Exception as e:
-                    # 如果预处理出错，默认使用 1.0 缩放因子
-                    logger.warning(f"预处理段落时出错：{e}")
-                    paragraph.optimal_scale = 1.0
+            self.preprocess_page(page)
+        self._clamp_to_mode_scale(document)
+
+    def _get_page_fonts(
+        self, page: il_version_1.Page
+    ) -> dict[str | int, il_version_1.PdfFont | dict[str, il_version_1.PdfFont]]:
+        fonts: dict[
+            str | int,
+            il_version_1.PdfFont | dict[str, il_version_1.PdfFont],
+        ] = {f.font_id: f for f in page.pdf_font if f.font_id}
+        page_fonts = {f.font_id: f for f in page.pdf_font if f.font_id}
+        for k, v in self.font_mapper.fontid2font.items():
+            fonts[k] = v
+        for xobj in page.pdf_xobject:
+            if xobj.xobj_id is not None:
+                fonts[xobj.xobj_id] = page_fonts.copy()
+                for font in xobj.pdf_font:
+                    if font.font_id:
+                        fonts[xobj.xobj_id][font.font_id] = font
+        return fonts
 
-                if paragraph.optimal_scale is not None:
-                    all_scales.append(paragraph.optimal_scale)
+    def preprocess_page(self, page: il_version_1.Page) -> list[float | None]:
+        """获取页面中每个段落的最优缩放因子，返回按段落顺序排列的缩放因子"""
+        fonts = self._get_page_fonts(page)
+
+        # 处理每个段落
+        for paragraph in page.pdf_paragraph:
+            try:
+                typesetting_units = self.create_typesetting_units(paragraph, fonts)
+
+                # 如果所有单元都可以直接传递，则 scale = 1.0
+                if all(unit.can_passthrough for unit in typesetting_units):
+                    paragraph.optimal_scale = 1.0
+                else:
+                    # 获取最优缩放因子
+                    optimal_scale = self._get_optimal_scale(
+                        paragraph, page, typesetting_units
+                    )
+                    paragraph.optimal_scale = optimal_scale
+            except Exception as e:
+                # 如果预处理出错，默认使用 1.0 缩放因子
+                logger.warning(f"预处理段落时出错：{e}")
+                paragraph.optimal_scale = 1.0
+        return [paragraph.optimal_scale for paragraph in page.pdf_paragraph]
+
+    @staticmethod
+    def _clamp_to_mode_scale(document: il_version_1.Document):
+        """将所有大于全文众数的缩放因子修改为众数"""
+        all_paragraphs = [
+            paragraph for page in document.page for paragraph in page.pdf_paragraph
+        ]
+        all_scales = [
+            paragraph.optimal_scale
+            for paragraph in all_paragraphs
+            if paragraph.optimal_scale is not None
+        ]
 
         # 获取缩放因子的众数
         if all_scales:
@@ -761,70 +793,37 @@ class Typesetting:
                 "document_scales is empty, there seems no paragraph in this PDF"
             )
 
-    def _find_optimal_scale_and_layout(
+    def _scale_candidates(
         self,
         paragraph: il_version_1.PdfParagraph,
         page: il_version_1.Page,
-        typesetting_units: list[TypesettingUnit],
-        initial_scale: float = 1.0,
-        use_english_line_break: bool = True,
-        apply_layout: bool = False,
-    ) -> tuple[float, list[TypesettingUnit] | None]:
-        """查找最优缩放因子并可选择性地执行布局
+        box: Box,
+        initial_scale: float,
+    ) -> tuple[list[tuple[float, Box]], Box]:
+        """按原有的逐步缩小顺序列出所有候选 (scale, box)，不执行排版
 
-        Args:
-            paragraph: 段落对象
-            page: 页面对象
-            typesetting_units: 排版单元列表
-            initial_scale: 初始缩放因子
-            use_english_line_break: 是否使用英文换行规则
-            apply_layout: 是否应用布局到 paragraph（True 时执行实际排版）
+        缩放因子每次减小 0.05（低于 0.6 后每次 0.1）。低于 0.7 时先尝试向下扩展，
+        再尝试向右扩展，扩展失败时从 1.0 重新开始。重复的候选会被去掉，
+        因为第一次放不下的组合第二次也放不下。
 
         Returns:
-            tuple[float, list[TypesettingUnit] | None]: (最终缩放因子，排版后的单元列表或 None)
+            tuple[list[tuple[float, Box]], Box]: (按尝试顺序排列的候选，所有扩展后的边界框)
         """
-        if not paragraph.box:
-            return initial_scale, None
-
-        box = paragraph.box
+        candidates = []
+        seen = set()
         scale = initial_scale
-        line_skip = 1.50 if self.is_cjk else 1.3
         min_scale = 0.1
         expand_space_flag = 0
-        final_typeset_units = None
 
         while scale >= min_scale:
-            try:
-                # 尝试布局排版单元
-                typeset_units, all_units_fit = self._layout_typesetting_units(
-                    typesetting_units,
-                    box,
-                    scale,
-                    line_skip,
-                    paragraph,
-                    use_english_line_break,
-                )
-
-                # 如果所有单元都放得下
-                if all_units_fit:
-                    if apply_layout:
-                        # 实际应用排版结果
-                        paragraph.scale = scale
-                        paragraph.pdf_paragraph_composition = []
-                        for unit in typeset_units:
-                            for char in unit.render():
-                                paragraph.pdf_paragraph_composition.append(
-                                    PdfParagraphComposition(pdf_character=char),
-                                )
-                        final_typeset_units = typeset_units
-                    return scale, final_typeset_units
-            except Exception:
-                # 如果布局检查出错，继续尝试下一个缩放因子
-                pass
+            key = (scale, box.x, box.y, box.x2, box.y2)
+            if key not in seen:
+                seen.add(key)
+                candidates.append((scale, box))
 
             # 添加与原 retypeset 一致的逻辑检查
             if not hasattr(paragraph, "debug_id") or not paragraph.debug_id:
-                return scale, final_typeset_units
+                break
 
             # 减小缩放因子
             if scale > 0.6:
@@ -840,11 +839,7 @@ class Typesetting:
                     try:
                         min_y = self.get_max_bottom_space(box, page) + 2
                         if min_y < box.y:
-                            expanded_box = Box(x=box.x, y=min_y, x2=box.x2, y2=box.y2)
-                            box = expanded_box
-                            if apply_layout:
-                                # 更新段落的边界框
-                                paragraph.box = expanded_box
+                            box = Box(x=box.x, y=min_y, x2=box.x2, y2=box.y2)
                             space_expanded = True
                     except Exception:
                         pass
@@ -859,11 +854,7 @@ class Typesetting:
                     try:
                         max_x = self.get_max_right_space(box, page) - 5
                         if max_x > box.x2:
-                            expanded_box = Box(x=box.x, y=box.y, x2=max_x, y2=box.y2)
-                            box = expanded_box
-                            if apply_layout:
-                                # 更新段落的边界框
-                                paragraph.box = expanded_box
+                            box = Box(x=box.x, y=box.y, x2=max_x, y2=box.y2)
                             space_expanded = True
                     except Exception:
                         pass
@@ -874,11 +865,190 @@ class Typesetting:
                         continue
 
                 # 只有在扩展尝试阶段 (expand_space_flag < 2) 且扩展失败时才重置 scale
-                # 当 expand_space_flag >= 2 时，说明已经尝试过所有扩展，应该继续正常的 scale 减小
                 if expand_space_flag < 2:
-                    # 如果无法扩展空间，重置 scale 并继续循环
                     scale = 1.0
 
+        return candidates, box
+
+    def _estimate_scale(
+        self,
+        typesetting_units: list[TypesettingUnit],
+        box: Box,
+        line_skip: float,
+    ) -> float:
+        """根据字形总面积与边界框面积估算最大缩放因子
+
+        字形面积随缩放因子的平方变化，因此在 1.0 时需要 ``area * line_skip``
+        的文字大约在 ``sqrt(box_area / (area * line_skip))`` 时放得下。
+        行尾会浪费一些空间，实际结果通常略小。
+        """
+        area = sum(unit.width * unit.height for unit in typesetting_units)
+        box_area = (box.x2 - box.x) * (box.y2 - box.y)
+        if area <= 0 or box_area <= 0:
+            return 1.0
+        return (box_area / (area * line_skip)) ** 0.5
+
+    @staticmethod
+    def _first_fit(
+        lo: int,
+        hi: int,
+        probe: int,
+        fits,
+    ) -> int | None:
+        """二分查找 ``[lo, hi]`` 中第一个放得下的候选
+
+        候选按缩放因子递减排列，一旦某个放得下，之后的也都放得下。
+        首先尝试 ``probe``。
+        """
+        if fits(probe):
+            hi = probe
+        elif probe == hi or not fits(hi):
+            return None
+        else:
+            lo = probe + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return hi
+
+    def _search_candidates(
+        self,
+        candidates: list[tuple[float, Box]],
+        typesetting_units: list[TypesettingUnit],
+        line_skip: float,
+        fits,
+    ) -> int | None:
+        """返回第一个放得下的候选的下标，都放不下时返回 None"""
+        start = 0
+        while start < len(candidates):
+            # 边界框相同的连续候选构成一段，段内缩放因子递减
+            box = candidates[start][1]
+            end = start
+            while end + 1 < len(candidates) and candidates[end + 1][1] is box:
+                end += 1
+            estimate = self._estimate_scale(typesetting_units, box, line_skip)
+            probe = start
+            while probe < end and candidates[probe][0] > estimate:
+                probe += 1
+            found = self._first_fit(start, end, probe, fits)
+            if found is not None:
+                return found
+            start = end + 1
+        return None
+
+    def _find_optimal_scale_and_layout(
+        self,
+        paragraph: il_version_1.PdfParagraph,
+        page: il_version_1.Page,
+        typesetting_units: list[TypesettingUnit],
+        initial_scale: float = 1.0,
+        use_english_line_break: bool = True,
+        apply_layout: bool = False,
+    ) -> tuple[float, list[TypesettingUnit] | None]:
+        """查找最优缩放因子并可选择性地执行布局
+
+        候选缩放因子与逐步减小的线性搜索相同，但在每个边界框内用二分查找，
+        首次尝试的位置由字形面积与边界框面积估算。
+
+        Args:
+            paragraph: 段落对象
+            page: 页面对象
+            typesetting_units: 排版单元列表
+            initial_scale: 初始缩放因子
+            use_english_line_break: 是否使用英文换行规则
+            apply_layout: 是否应用布局到 paragraph（True 时执行实际排版）
+
+        Returns:
+            tuple[float, list[TypesettingUnit] | None]: (最终缩放因子，排版后的单元列表或 None)
+        """
+        if not paragraph.box:
+            return initial_scale, None
+
+        line_skip = 1.50 if self.is_cjk else 1.3
+        min_scale = 0.1
+        candidates, final_box = self._scale_candidates(
+            paragraph, page, paragraph.box, initial_scale
+        )
+        break_widths = self._get_break_widths(typesetting_units)
+        layouts: dict[int, tuple[list[TypesettingUnit], bool] | None] = {}
+
+        def scale_fit_key(i: int):
+            scale, box = candidates[i]
+            return (
+                id(paragraph),
+                len(typesetting_units),
+                scale,
+                (box.x, box.y, box.x2, box.y2),
+                use_english_line_break,
+            )
+
+        def layout(i: int):
+            if i not in layouts:
+                scale, box = candidates[i]
+                try:
+                    layouts[i] = self._layout_typesetting_units(
+                        typesetting_units,
+                        box,
+                        scale,
+                        line_skip,
+                        paragraph,
+                        use_english_line_break,
+                        break_widths,
+                    )
+                except Exception:
+                    # 如果布局检查出错，视为放不下
+                    layouts[i] = None
+                self._scale_fit_cache[scale_fit_key(i)] = (
+                    layouts[i] is not None and layouts[i][1]
+                )
+            return layouts[i]
+
+        def fits(i: int, use_cache: bool = True) -> bool:
+            if use_cache:
+                cached = self._scale_fit_cache.get(scale_fit_key(i))
+                if cached is not None:
+                    return cached
+            result = layout(i)
+            return result is not None and result[1]
+
+        found = self._search_candidates(candidates, typesetting_units, line_skip, fits)
+        if found is not None and apply_layout:
+            result = layout(found)
+            if result is None or not result[1]:
+                # 预处理阶段的缓存结果与本次排版不一致，不使用缓存重新查找
+                found = self._search_candidates(
+                    candidates,
+                    typesetting_units,
+                    line_skip,
+                    lambda i: fits(i, use_cache=False),
+                )
+
+        if found is not None:
+            scale, box = candidates[found]
+            if not apply_layout:
+                return scale, None
+            # 实际应用排版结果
+            typeset_units = layout(found)[0]
+            paragraph.box = box
+            paragraph.scale = scale
+            paragraph.pdf_paragraph_composition = []
+            for unit in typeset_units:
+                for char in unit.render():
+                    paragraph.pdf_paragraph_composition.append(
+                        PdfParagraphComposition(pdf_character=char),
+                    )
+            return scale, typeset_units
+
+        if not hasattr(paragraph, "debug_id") or not paragraph.debug_id:
+            return initial_scale, None
+
+        if apply_layout:
+            # 更新段落的边界框
+            paragraph.box = final_box
+
         # 如果仍然放不下，尝试去除英文换行限制
         if use_english_line_break:
             return self._find_optimal_scale_and_layout(
@@ -891,7 +1061,7 @@ class Typesetting:
             )
 
         # 最后返回最小缩放因子
-        return min_scale, final_typeset_units
+        return min_scale, None
 
     def _get_optimal_scale(
         self,
@@ -934,12 +1104,33 @@ class Typesetting:
         )
 
     def typesetting_document(self, document: il_version_1.Document):
+        self._scale_fit_cache.clear()
+        try:
+            self._typesetting_document(document)
+        finally:
+            self._scale_fit_cache.clear()
+
+    def _get_worker_count(self, document: il_version_1.Document) -> int:
+        workers = self.translation_config.typesetting_workers
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8)
+        if len(document.page) < PARALLEL_TYPESETTING_MIN_PAGES:
+            return 1
+        # 每个进程至少处理若干页，否则启动进程与加载字体的开销得不偿失
+        return max(1, min(workers, len(document.page) // 8))
+
+    def _typesetting_document(self, document: il_version_1.Document):
         # 原有的排版逻辑
         if self.translation_config.progress_monitor:
             with self.translation_config.progress_monitor.stage_start(
                 self.stage_name,
                 len(document.page) * 2,
             ) as pbar:
+                workers = self._get_worker_count(document)
+                if workers > 1:
+                    self._typesetting_document_parallel(document, pbar, workers)
+                    return
+
                 # 预处理：获取所有段落的最优缩放因子
                 self.preprocess_document(document, pbar)
 
@@ -952,20 +1143,67 @@ class Typesetting:
                 self.translation_config.raise_if_cancelled()
                 self.render_page(page)
 
+    def _wait_for(self, future: Future):
+        while True:
+            done, _ = wait([future], timeout=0.5)
+            if done:
+                return future.result()
+            self.translation_config.raise_if_cancelled()
+
+    def _typesetting_document_parallel(
+        self, document: il_version_1.Document, pbar, workers: int
+    ):
+        """两阶段并行排版
+
+        阶段一在进程池中计算每个段落的最优缩放因子，在主进程中求众数后，
+        阶段二在进程池中渲染各页面。页面以 il_codec 的紧凑格式传递，
+        阶段二复用阶段一的编码结果，只额外传递最终的缩放因子。
+        """
+        logger.info(f"Typesetting {len(document.page)} pages with {workers} processes")
+        encoded_pages = [il_codec.dumps(page) for page in document.page]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_typesetting_worker,
+            initargs=(
+                TypesettingWorkerConfig.from_translation_config(
+                    self.translation_config
+                ),
+            ),
+        ) as pool:
+            try:
+                futures = [
+                    pool.submit(_preprocess_page_in_worker, data)
+                    for data in encoded_pages
+                ]
+                for page, future in zip(document.page, futures, strict=True):
+                    scales = self._wait_for(future)
+                    for paragraph, scale in zip(
+                        page.pdf_paragraph, scales, strict=True
+                    ):
+                        paragraph.optimal_scale = scale
+                    pbar.advance()
+                self._clamp_to_mode_scale(document)
+
+                futures = [
+                    pool.submit(
+                        _render_page_in_worker,
+                        data,
+                        [paragraph.optimal_scale for paragraph in page.pdf_paragraph],
+                    )
+                    for page, data in zip(document.page, encoded_pages, strict=True)
+                ]
+                for i, future in enumerate(futures):
+                    document.page[i] = il_codec.loads(
+                        il_version_1.Page, self._wait_for(future)
+                    )
+                    pbar.advance()
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
     def render_page(self, page: il_version_1.Page):
-        fonts: dict[
-            str | int,
-            il_version_1.PdfFont | dict[str, il_version_1.PdfFont],
-        ] = {f.font_id: f for f in page.pdf_font if f.font_id}
-        page_fonts = {f.font_id: f for f in page.pdf_font if f.font_id}
-        for k, v in self.font_mapper.fontid2font.items():
-            fonts[k] = v
-        for xobj in page.pdf_xobject:
-            if xobj.xobj_id is not None:
-                fonts[xobj.xobj_id] = page_fonts.copy()
-                for font in xobj.pdf_font:
-                    if font.font_id:
-                        fonts[xobj.xobj_id][font.font_id] = font
+        fonts = self._get_page_fonts(page)
         if (
             page.page_number == 0
             and self.translation_config.watermark_output_mode
@@ -1094,20 +1332,24 @@ class Typesetting:
                 paragraph, page, typesetting_units, precomputed_scale
             )
 
-    def _get_width_before_next_break_point(
-        self, typesetting_units: list[TypesettingUnit], scale: float
-    ) -> float:
-        if not typesetting_units:
-            return 0
-        if typesetting_units[0].can_break_line:
-            return 0
+    def _get_break_widths(
+        self, typesetting_units: list[TypesettingUnit]
+    ) -> list[float]:
+        """计算每个单元到下一个可换行位置之前的宽度（未缩放）
 
-        total_width = 0
-        for unit in typesetting_units:
+        本身可以换行的单元宽度为 0。每个段落只计算一次，
+        从后往前累加后缀宽度，整个段落只扫描一遍。
+        """
+        widths = [0.0] * len(typesetting_units)
+        run_width = 0.0
+        for i in range(len(typesetting_units) - 1, -1, -1):
+            unit = typesetting_units[i]
             if unit.can_break_line:
-                return total_width * scale
-            total_width += unit.width
-        return total_width * scale
+                run_width = 0.0
+            else:
+                run_width += unit.width
+                widths[i] = run_width
+        return widths
 
     def _layout_typesetting_units(
         self,
@@ -1117,6 +1359,7 @@ class Typesetting:
         line_skip: float,
         paragraph: il_version_1.PdfParagraph,
         use_english_line_break: bool = True,
+        break_widths: list[float] | None = None,
     ) -> tuple[list[TypesettingUnit], bool]:
         """布局排版单元。
 
@@ -1124,10 +1367,14 @@ class Typesetting:
             typesetting_units: 要布局的排版单元列表
             box: 布局边界框
             scale: 缩放因子
+            break_widths: ``_get_break_widths`` 的结果，为 None 时重新计算
 
         Returns:
             tuple[list[TypesettingUnit], bool]: (已布局的排版单元列表，是否所有单元都放得下)
         """
+        if use_english_line_break and break_widths is None:
+            break_widths = self._get_break_widths(typesetting_units)
+
         # 计算字号众数
         font_sizes = []
         for unit in typesetting_units:
@@ -1209,9 +1456,7 @@ class Typesetting:
             ):
                 current_x += space_width * 0.5
             if use_english_line_break:
-                width_before_next_break_point = self._get_width_before_next_break_point(
-                    typesetting_units[i:], scale
-                )
+                width_before_next_break_point = break_widths[i] * scale
             else:
                 width_before_next_break_point = 0
 
@@ -1327,14 +1572,16 @@ class Typesetting:
                     continue
                 font = get_font(font_id, paragraph.xobj_id)
                 if composition.pdf_same_style_unicode_characters.unicode:
+                    chars = [
+                        char_unicode
+                        for char_unicode in composition.pdf_same_style_unicode_characters.unicode
+                        if char_unicode not in ("\n",)
+                    ]
                     result.extend(
                         [
                             TypesettingUnit(
                                 unicode=char_unicode,
-                                font=self.font_mapper.map(
-                                    font,
-                                    char_unicode,
-                                ),
+                                font=mapped_font,
                                 original_font=font,
                                 font_size=style.font_size,
                                 style=style,
@@ -1342,8 +1589,11 @@ class Typesetting:
                                 debug_info=composition.pdf_same_style_unicode_characters.debug_info
                                 or False,
                             )
-                            for char_unicode in composition.pdf_same_style_unicode_characters.unicode
-                            if char_unicode not in ("\n",)
+                            for char_unicode, mapped_font in zip(
+                                chars,
+                                self.font_mapper.map_many(chars, font),
+                                strict=True,
+                            )
                         ],
                     )
             elif composition.pdf_formula:
@@ -1459,3 +1709,63 @@ class Typesetting:
                 min_y = max(min_y, figure.box.y2)
 
         return min_y
+
+
+@dataclass
+class TypesettingWorkerConfig:
+    """The part of TranslationConfig that typesetting worker processes use."""
+
+    lang_out: str
+    primary_font_family: str | None
+    watermark_output_mode: WatermarkOutputMode
+    debug: bool
+
+    progress_monitor = None
+
+    @classmethod
+    def from_translation_config(
+        cls, translation_config: TranslationConfig
+    ) -> TypesettingWorkerConfig:
+        return cls(
+            lang_out=translation_config.lang_out,
+            primary_font_family=translation_config.primary_font_family,
+            watermark_output_mode=translation_config.watermark_output_mode,
+            debug=translation_config.debug,
+        )
+
+    def raise_if_cancelled(self):
+        pass
+
+
+_worker_typesetting: Typesetting | None = None
+
+
+def _init_typesetting_worker(config: TypesettingWorkerConfig):
+    global _worker_typesetting
+    _worker_typesetting = Typesetting(config)
+
+
+@contextlib.contextmanager
+def _worker_task():
+    # 缓存键包含段落的 id()，而段落在每个任务中重新解码、任务结束后释放，
+    # 其 id 可能被之后的段落复用，因此缓存只在单个任务内有效
+    _worker_typesetting._scale_fit_cache.clear()
+    try:
+        yield _worker_typesetting
+    finally:
+        _worker_typesetting._scale_fit_cache.clear()
+
+
+def _preprocess_page_in_worker(data: bytes) -> list[float | None]:
+    page = il_codec.loads(il_version_1.Page, data)
+    with _worker_task() as typesetting:
+        return typesetting.preprocess_page(page)
+
+
+def _render_page_in_worker(data: bytes, scales: list[float | None]) -> bytes:
+    page = il_codec.loads(il_version_1.Page, data)
+    for paragraph, scale in zip(page.pdf_paragraph, scales, strict=True):
+        paragraph.optimal_scale = scale
+    with _worker_task() as typesetting:
+        typesetting.render_page(page)
+    return il_codec.dumps(page)
@@ -1,9 +1,13 @@
 import enum
 import functools
 import logging
+import operator
 import re
+import threading
+import zlib
 from pathlib import Path
 
+import numpy as np
 import pymupdf
 
 from babeldoc.assets import assets
@@ -32,22 +36,74 @@ class PrimaryFontFamily(enum.IntEnum):
             return cls.NONE
 
 
-class FontMapper:
-    stage_name = "Add Fonts"
+class GlyphCoverage:
+    """Codepoints mapped by a font's cmap, stored as a bitset over Unicode.
 
-    def __init__(self, translation_config: TranslationConfig):
-        self.translation_config = translation_config
-        assert translation_config.primary_font_family in [
-            None,
-            "serif",
-            "sans-serif",
-            "script",
-        ]
-        self.primary_font_family = PrimaryFontFamily.from_str(
-            translation_config.primary_font_family,
+    Membership checks are a byte lookup and never call into MuPDF. The bitset
+    is persisted next to the font file, so it is read from the cmap only once.
+    """
+
+    _MAX_CODEPOINT = 0x110000
+
+    def __init__(self, bits: np.ndarray):
+        self._bits = bits
+        self._bytes = bits.tobytes()
+
+    @classmethod
+    def from_codepoints(cls, codepoints) -> "GlyphCoverage":
+        mask = np.zeros(cls._MAX_CODEPOINT, dtype=bool)
+        mask[np.asarray(list(codepoints), dtype=np.int64)] = True
+        return cls(np.packbits(mask, bitorder="little"))
+
+    @classmethod
+    def for_font(
+        cls, font: pymupdf.Font, cache_path: Path | None = None
+    ) -> "GlyphCoverage":
+        if cache_path is not None:
+            try:
+                bits = np.frombuffer(
+                    zlib.decompress(cache_path.read_bytes()), dtype=np.uint8
+                )
+                if bits.size == cls._MAX_CODEPOINT // 8:
+                    return cls(bits)
+            except (OSError, zlib.error):
+                pass
+        coverage = cls.from_codepoints(font.valid_codepoints())
+        if cache_path is not None:
+            try:
+                cache_path.write_bytes(zlib.compress(coverage._bytes))
+            except OSError as e:
+                logger.debug(f"Failed to save glyph coverage {cache_path}: {e}")
+        return coverage
+
+    def __contains__(self, codepoint: int) -> bool:
+        return (
+            0 <= codepoint < self._MAX_CODEPOINT
+            and (self._bytes[codepoint >> 3] >> (codepoint & 7)) & 1 == 1
+        )
+
+    def __or__(self, other: "GlyphCoverage") -> "GlyphCoverage":
+        return GlyphCoverage(self._bits | other._bits)
+
+    def contains_many(self, codepoints: np.ndarray) -> np.ndarray:
+        codepoints = np.asarray(codepoints, dtype=np.int64)
+        valid = (codepoints >= 0) & (codepoints < self._MAX_CODEPOINT)
+        clipped = np.where(valid, codepoints, 0)
+        return valid & (
+            (self._bits[clipped >> 3] >> (clipped & 7).astype(np.uint8)) & 1 == 1
         )
 
-        font_family = assets.get_font_family(translation_config.lang_out)
+
+class FontFamilyFonts:
+    """Loaded fonts of one target-language font family.
+
+    Glyph lookups only depend on the family, so the lookup caches live here and
+    are shared by every :class:`FontMapper` of the family.
+    """
+
+    def __init__(
+        self, font_family: dict[str, list[str]], fonts: dict[str, pymupdf.Font]
+    ):
         self.font_file_names = []
         for k in (
             "normal",
@@ -62,23 +118,8 @@ class FontMapper:
         for font_file_name in self.font_file_names:
             if font_file_name in self.fontid2fontpath:
                 continue
-            font_path, font_metadata = assets.get_font_and_metadata(font_file_name)
-            pymupdf_font = pymupdf.Font(fontfile=str(font_path))
-            pymupdf_font.has_glyph = functools.lru_cache(maxsize=10240, typed=True)(
-                pymupdf_font.has_glyph,
-            )
-            pymupdf_font.char_lengths = functools.lru_cache(maxsize=10240, typed=True)(
-                pymupdf_font.char_lengths,
-            )
-            self.fonts[font_file_name] = pymupdf_font
-            self.fontid2fontpath[font_file_name] = font_path
-            self.fonts[font_file_name].font_id = font_file_name
-            self.fonts[font_file_name].font_path = font_path
-            self.fonts[font_file_name].ascent_fontmap = font_metadata["ascent"]
-            self.fonts[font_file_name].descent_fontmap = font_metadata["descent"]
-            self.fonts[font_file_name].encoding_length = font_metadata[
-                "encoding_length"
-            ]
+            self.fonts[font_file_name] = fonts[font_file_name]
+            self.fontid2fontpath[font_file_name] = fonts[font_file_name].font_path
 
         self.normal_font_ids: list[str] = font_family["normal"]
         self.script_font_ids: list[str] = font_family["script"]
@@ -111,19 +152,19 @@ class FontMapper:
             "base": [self.base_font],
         }
 
-        self.has_char = functools.lru_cache(maxsize=10240, typed=True)(self.has_char)
+        self.coverage = functools.reduce(
+            operator.or_, (f.coverage for f in self.fonts.values())
+        )
+
         self.map_in_type = functools.lru_cache(maxsize=10240, typed=True)(
             self.map_in_type
         )
+        self.font_chain = functools.lru_cache(maxsize=None)(self.font_chain)
 
     def has_char(self, char_unicode: str):
         if len(char_unicode) != 1:
             return False
-        current_char = ord(char_unicode)
-        for font in self.fonts.values():
-            if font.has_glyph(current_char):
-                return True
-        return False
+        return ord(char_unicode) in self.coverage
 
     def map_in_type(
         self,
@@ -138,21 +179,148 @@ class FontMapper:
             return None
         current_char = ord(char_unicode)
         for font in self.type2font[font_type]:
-            if not font.has_glyph(current_char):
-                continue
-            if bool(bold) != bool(font.is_bold):
-                continue
-            # 不知道什么原因，思源黑体的 serif 属性为 1，先 workaround
-            if bool(serif) and "serif" not in font.font_id.lower():
+            if current_char not in font.coverage:
                 continue
-            if not bool(serif) and "serif" in font.font_id.lower():
+            if not self._style_matches(bold, serif, font):
                 continue
             return font
 
         return None
 
-    def map(self, original_font: PdfFont, char_unicode: str):
-        current_char = ord(char_unicode)
+    def _style_matches(self, bold: bool, serif: bool, font: pymupdf.Font) -> bool:
+        if bool(bold) != bool(font.is_bold):
+            return False
+        # 不知道什么原因，思源黑体的 serif 属性为 1，先 workaround
+        return bool(serif) == ("serif" in font.font_id.lower())
+
+    def font_chain(
+        self, bold: bool, italic: bool, monospaced: bool, serif: bool
+    ) -> tuple[pymupdf.Font, ...]:
+        """Fonts to try for a character of the given style, in order.
+
+        A character maps to the first font of the chain that covers it, the
+        same result as trying :meth:`map_in_type` for script, normal and
+        fallback fonts followed by any script (if italic) or fallback font.
+        """
+        chain = []
+        if italic:
+            chain.extend(
+                f for f in self.script_fonts if self._style_matches(bold, serif, f)
+            )
+            chain.extend(self.script_fonts)
+        for font_type in ("normal", "fallback"):
+            chain.extend(
+                f
+                for f in self.type2font[font_type]
+                if self._style_matches(bold, serif, f)
+            )
+        chain.extend(self.fallback_fonts)
+        return tuple(dict.fromkeys(chain))
+
+
+class FontRegistry:
+    """Process-wide store of target-language fonts.
+
+    Parsing a CJK font file takes hundreds of milliseconds and a lot of memory,
+    so every font file is loaded once per process and shared by all stages,
+    split parts and documents. Families are keyed by their font file lists.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fonts: dict[str, pymupdf.Font] = {}
+        self._families: dict[tuple, FontFamilyFonts] = {}
+
+    def get_font(self, font_file_name: str) -> pymupdf.Font:
+        with self._lock:
+            return self._get_font(font_file_name)
+
+    def get_family(self, lang_code: str) -> FontFamilyFonts:
+        font_family = assets.get_font_family(lang_code)
+        key = tuple(
+            (k, tuple(font_family[k])) for k in ("normal", "script", "fallback", "base")
+        )
+        with self._lock:
+            family = self._families.get(key)
+            if family is None:
+                fonts = {
+                    font_file_name: self._get_font(font_file_name)
+                    for _, font_file_names in key
+                    for font_file_name in font_file_names
+                }
+                family = FontFamilyFonts(font_family, fonts)
+                self._families[key] = family
+            return family
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._families.clear()
+
+    def _get_font(self, font_file_name: str) -> pymupdf.Font:
+        font = self._fonts.get(font_file_name)
+        if font is not None:
+            return font
+        font_path, font_metadata = assets.get_font_and_metadata(font_file_name)
+        font = pymupdf.Font(fontfile=str(font_path))
+        font.has_glyph = functools.lru_cache(maxsize=10240, typed=True)(
+            font.has_glyph,
+        )
+        font.char_lengths = functools.lru_cache(maxsize=10240, typed=True)(
+            font.char_lengths,
+        )
+        font.font_id = font_file_name
+        font.font_path = font_path
+        font.ascent_fontmap = font_metadata["ascent"]
+        font.descent_fontmap = font_metadata["descent"]
+        font.encoding_length = font_metadata["encoding_length"]
+        coverage_path = None
+        if sha3_256 := font_metadata.get("sha3_256"):
+            coverage_path = font_path.with_name(
+                f"{font_file_name}.{sha3_256[:16]}.coverage"
+            )
+        font.coverage = GlyphCoverage.for_font(font, coverage_path)
+        self._fonts[font_file_name] = font
+        return font
+
+
+font_registry = FontRegistry()
+
+
+class FontMapper:
+    stage_name = "Add Fonts"
+
+    def __init__(self, translation_config: TranslationConfig):
+        self.translation_config = translation_config
+        assert translation_config.primary_font_family in [
+            None,
+            "serif",
+            "sans-serif",
+            "script",
+        ]
+        self.primary_font_family = PrimaryFontFamily.from_str(
+            translation_config.primary_font_family,
+        )
+
+        family = font_registry.get_family(translation_config.lang_out)
+        self.font_file_names = family.font_file_names
+        self.fonts = family.fonts
+        self.fontid2fontpath = family.fontid2fontpath
+        self.normal_font_ids = family.normal_font_ids
+        self.script_font_ids = family.script_font_ids
+        self.fallback_font_ids = family.fallback_font_ids
+        self.base_font_ids = family.base_font_ids
+        self.fontid2font = family.fontid2font
+        self.normal_fonts = family.normal_fonts
+        self.script_fonts = family.script_fonts
+        self.fallback_fonts = family.fallback_fonts
+        self.base_font = family.base_font
+        self.type2font = family.type2font
+        self.has_char = family.has_char
+        self.map_in_type = family.map_in_type
+        self.font_chain = family.font_chain
+
+    def _get_style_flags(self, original_font: PdfFont | pymupdf.Font):
         if isinstance(original_font, pymupdf.Font):
             bold = original_font.is_bold
             italic = original_font.is_italic
@@ -164,11 +332,6 @@ class FontMapper:
             monospaced = original_font.monospace
             serif = original_font.serif
         else:
-            logger.error(
-                f"Unknown font type: {type(original_font)}. "
-                f"Original font: {original_font}. "
-                f"Char unicode: {char_unicode}. ",
-            )
             return None
 
         if self.primary_font_family == PrimaryFontFamily.SERIF:
@@ -178,39 +341,51 @@ class FontMapper:
         elif self.primary_font_family == PrimaryFontFamily.SCRIPT:
             serif = False
             italic = True
+        return bold, italic, monospaced, serif
 
-        script_font_map_result = self.map_in_type(
-            bold, italic, monospaced, serif, char_unicode, "script"
-        )
-        if script_font_map_result:
-            return script_font_map_result
-
-        for script_font in self.script_fonts:
-            if italic and script_font.has_glyph(current_char):
-                return script_font
-
-        normal_font_map_result = self.map_in_type(
-            bold, italic, monospaced, serif, char_unicode, "normal"
-        )
-        if normal_font_map_result is not None:
-            return normal_font_map_result
-
-        fallback_font_map_result = self.map_in_type(
-            bold, italic, monospaced, serif, char_unicode, "fallback"
-        )
-        if fallback_font_map_result is not None:
-            return fallback_font_map_result
-
-        for font in self.fallback_fonts:
-            if font.has_glyph(current_char):
-                return font
-
-        logger.warning(
-            f"Can't find font for {char_unicode}({current_char}). "
-            f"Original font: {original_font.name}[{original_font.font_id}]. "
-            f"Char unicode: {char_unicode}. ",
-        )
-        return None
+    def map(self, original_font: PdfFont, char_unicode: str):
+        return self.map_many(char_unicode, original_font)[0]
+
+    def map_many(
+        self, chars: str | list[str], original_font: PdfFont
+    ) -> list[pymupdf.Font | None]:
+        """Map every character of ``chars`` to a target font.
+
+        The style of ``original_font`` is resolved once and each distinct
+        character is mapped once.
+        """
+        flags = self._get_style_flags(original_font)
+        if flags is None:
+            logger.error(
+                f"Unknown font type: {type(original_font)}. "
+                f"Original font: {original_font}. "
+                f"Char unicode: {''.join(chars)}. ",
+            )
+            return [None] * len(chars)
+        if not chars:
+            return []
+        unique_chars = list(dict.fromkeys(chars))
+        codepoints = np.fromiter(map(ord, unique_chars), np.int64, len(unique_chars))
+        # Check the whole run against one font at a time, in chain order.
+        font_index = np.full(len(unique_chars), -1)
+        chain = self.font_chain(*flags)
+        for i, font in enumerate(chain):
+            unmapped = font_index < 0
+            if not unmapped.any():
+                break
+            font_index[unmapped & font.coverage.contains_many(codepoints)] = i
+        mapped = {}
+        for char_unicode, index in zip(unique_chars, font_index.tolist(), strict=True):
+            if index < 0:
+                logger.warning(
+                    f"Can't find font for {char_unicode}({ord(char_unicode)}). "
+                    f"Original font: {original_font.name}[{original_font.font_id}]. "
+                    f"Char unicode: {char_unicode}. ",
+                )
+                mapped[char_unicode] = None
+            else:
+                mapped[char_unicode] = chain[index]
+        return [mapped[char_unicode] for char_unicode in chars]
 
     def get_used_font_ids(self, il: il_version_1.Document) -> set[str]:
         result = set()
@@ -0,0 +1,85 @@
+"""Compact binary encoding of IL objects for handing them to worker processes.
+
+Pickling IL pages stores the class and field name of every one of the tens of
+thousands of objects on a page. The IL classes form a fixed schema, so objects
+are encoded positionally instead: each dataclass becomes a msgpack array of its
+field values in declaration order, and the field types tell the decoder which
+class to rebuild.
+
+Object identity is not preserved; an object referenced twice is decoded as two
+equal copies.
+"""
+
+import dataclasses
+import functools
+import typing
+from types import UnionType
+
+import msgpack
+
+_SCALAR = 0
+_OBJECT = 1
+_OBJECT_LIST = 2
+
+
+@functools.cache
+def _schema(cls: type) -> tuple[tuple[str, int, type | None], ...]:
+    """Return ``(field name, kind, dataclass)`` for every field of ``cls``."""
+    hints = typing.get_type_hints(cls)
+    schema = []
+    for f in dataclasses.fields(cls):
+        hint = hints[f.name]
+        kind = _SCALAR
+        item_cls = None
+        if typing.get_origin(hint) is list:
+            (arg,) = typing.get_args(hint)
+            if dataclasses.is_dataclass(arg):
+                kind = _OBJECT_LIST
+                item_cls = arg
+        else:
+            args = (
+                typing.get_args(hint)
+                if isinstance(hint, UnionType) or typing.get_origin(hint) is not None
+                else (hint,)
+            )
+            for arg in args:
+                if dataclasses.is_dataclass(arg):
+                    kind = _OBJECT
+                    item_cls = arg
+        schema.append((f.name, kind, item_cls))
+    return tuple(schema)
+
+
+def _to_raw(obj) -> list:
+    raw = []
+    for name, kind, _ in _schema(type(obj)):
+        value = getattr(obj, name)
+        if value is None or kind == _SCALAR:
+            raw.append(value)
+        elif kind == _OBJECT:
+            raw.append(_to_raw(value))
+        else:
+            raw.append([_to_raw(item) for item in value])
+    return raw
+
+
+def _from_raw(cls: type, raw: list):
+    kwargs = {}
+    for (name, kind, item_cls), value in zip(_schema(cls), raw, strict=True):
+        if value is None or kind == _SCALAR:
+            kwargs[name] = value
+        elif kind == _OBJECT:
+            kwargs[name] = _from_raw(item_cls, value)
+        else:
+            kwargs[name] = [_from_raw(item_cls, item) for item in value]
+    return cls(**kwargs)
+
+
+def dumps(obj) -> bytes:
+    """Encode an IL dataclass instance."""
+    return msgpack.packb(_to_raw(obj), use_bin_type=True)
+
+
+def loads(cls: type, data: bytes):
+    """Decode bytes produced by :func:`dumps` back into an instance of ``cls``."""
+    return _from_raw(cls, msgpack.unpackb(data, raw=False, use_list=True))
@@ -1,5 +1,13 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pymupdf
 
+# PyMuPDF is not thread-safe. Split parts translated on concurrent threads
+# hold this lock for all their MuPDF work, see high_level._do_translate_single.
+mupdf_lock = threading.RLock()
+
 
 def get_no_rotation_img(page: pymupdf.Page, dpi: int = 72) -> pymupdf.Pixmap:
     # return page.get_pixmap(dpi=72)
@@ -8,3 +16,55 @@ def get_no_rotation_img(page: pymupdf.Page, dpi: int = 72) -> pymupdf.Pixmap:
     pix = page.get_pixmap(dpi=dpi)
     page.set_rotation(original_rotation)
     return pix
+
+
+class PageRasterCache:
+    """Unrotated page renders of one document, keyed by page number and DPI.
+
+    Layout detection, table detection and scanned file detection all need the
+    same rasters, so each page is rendered once per resolution and kept until
+    ``max_bytes`` is exceeded, least recently used first. Rendering is
+    serialized because MuPDF documents are not thread-safe.
+    """
+
+    def __init__(self, mupdf_doc: pymupdf.Document, max_bytes: int = 512 << 20):
+        self.mupdf_doc = mupdf_doc
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.render_count = 0
+        self.hit_count = 0
+
+    def get_image(self, page_number: int, dpi: int = 72) -> np.ndarray:
+        """Return the page as a read-only ``(height, width, 3)`` BGR array."""
+        key = (page_number, dpi)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hit_count += 1
+                return image
+            pix = get_no_rotation_img(self.mupdf_doc[page_number], dpi=dpi)
+            self.render_count += 1
+            image = np.frombuffer(pix.samples, np.uint8).reshape(
+                pix.height,
+                pix.width,
+                3,
+            )[:, :, ::-1]
+            self._images[key] = image
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.nbytes
+            return image
+
+    def get_size(self, page_number: int, dpi: int = 72) -> tuple[int, int]:
+        """Return ``(width, height)`` of the page render."""
+        height, width = self.get_image(page_number, dpi).shape[:2]
+        return width, height
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
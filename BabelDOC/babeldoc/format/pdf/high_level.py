@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import copy
 import hashlib
 import io
@@ -45,10 +46,13 @@ from babeldoc.format.pdf.document_il.midend.styles_and_formulas import StylesAnd
 from babeldoc.format.pdf.document_il.midend.table_parser import TableParser
 from babeldoc.format.pdf.document_il.midend.typesetting import Typesetting
 from babeldoc.format.pdf.document_il.utils.fontmap import FontMapper
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import mupdf_lock
 from babeldoc.format.pdf.document_il.xml_converter import XMLConverter
 from babeldoc.format.pdf.pdfinterp import PDFPageInterpreterEx
 from babeldoc.format.pdf.result_merger import ResultMerger
 from babeldoc.format.pdf.split_manager import SplitManager
+from babeldoc.format.pdf.split_manager import SplitPartAbortedError
+from babeldoc.format.pdf.split_manager import SplitPartScheduler
 from babeldoc.format.pdf.translation_config import TranslateResult
 from babeldoc.format.pdf.translation_config import TranslationConfig
 from babeldoc.format.pdf.translation_config import WatermarkOutputMode
@@ -490,13 +494,24 @@ def do_translate(
                     else:
                         pm.total_parts = len(split_points)
 
-                        # Process parts serially
+                        # Parts overlap, see SplitPartScheduler for what stays ordered
                         results: dict[int, TranslateResult | None] = {}
                         original_watermark_mode = (
                             translation_config.watermark_output_mode
                         )
                         original_doc = Document(original_pdf_path)
-                        for i, split_point in enumerate(split_points):
+                        scheduler = SplitPartScheduler(
+                            len(split_points),
+                            translation_config.max_parts_in_flight,
+                        )
+                        if translation_config.skip_scanned_detection or (
+                            not translation_config.auto_enable_ocr_workaround
+                        ):
+                            # Part 0 cannot turn on the OCR workaround, no need to wait
+                            scheduler.scanned_detection_done()
+
+                        def translate_part(i: int) -> TranslateResult | None:
+                            split_point = split_points[i]
                             try:
                                 # Create a copy of config for this part
                                 part_config = copy.copy(translation_config)
@@ -519,8 +534,8 @@ def do_translate(
                                     translation_config.only_include_translated_page
                                     and not should_translate_pages
                                 ):
-                                    results[i] = None
-                                    continue
+                                    pm.part_finished(i)
+                                    return None
 
                                 # Only first part should do scanned detection if enabled
                                 if i > 0:
@@ -546,24 +561,26 @@ def do_translate(
                                 )
                                 part_config.input_file = part_temp_input_path
 
-                                temp_doc = Document()
-                                for x in range(
-                                    split_point.start_page, split_point.end_page + 1
-                                ):
-                                    xref = original_doc[x].xref
-                                    if (
-                                        original_doc.xref_get_key(xref, "Annots")[0]
-                                        != "null"
+                                with mupdf_lock:
+                                    temp_doc = Document()
+                                    for x in range(
+                                        split_point.start_page,
+                                        split_point.end_page + 1,
                                     ):
-                                        original_doc.xref_set_key(
-                                            xref, "Annots", "null"
-                                        )
-                                temp_doc.insert_pdf(
-                                    original_doc,
-                                    from_page=split_point.start_page,
-                                    to_page=split_point.end_page,
-                                )
-                                temp_doc.save(part_temp_input_path)
+                                        xref = original_doc[x].xref
+                                        if (
+                                            original_doc.xref_get_key(xref, "Annots")[0]
+                                            != "null"
+                                        ):
+                                            original_doc.xref_set_key(
+                                                xref, "Annots", "null"
+                                            )
+                                    temp_doc.insert_pdf(
+                                        original_doc,
+                                        from_page=split_point.start_page,
+                                        to_page=split_point.end_page,
+                                    )
+                                    temp_doc.save(part_temp_input_path)
                                 assert (
                                     temp_doc.page_count
                                     == split_point.end_page - split_point.start_page + 1
@@ -584,9 +601,14 @@ def do_translate(
                                 result = _do_translate_single(
                                     part_monitor,
                                     part_config,
+                                    part_scheduler=scheduler,
+                                    part_index=i,
                                 )
-                                results[i] = result
+                                pm.part_finished(i)
+                                return result
 
+                            except SplitPartAbortedError:
+                                raise
                             except Exception as e:
                                 logger.error(f"Error in part {i}: {e}")
                                 pm.translate_error(e)
@@ -595,6 +617,12 @@ def do_translate(
                                 # Clean up part working directory
                                 translation_config.cleanup_part_working_dir(i)
 
+                        results.update(
+                            scheduler.run(
+                                list(range(len(split_points))), translate_part
+                            )
+                        )
+
                         # Restore original watermark mode
                         translation_config.watermark_output_mode = (
                             original_watermark_mode
@@ -732,10 +760,42 @@ def check_cid_char(il: il_version_1.Document):
 def _do_translate_single(
     pm: ProgressMonitor,
     translation_config: TranslationConfig,
+    part_scheduler: SplitPartScheduler | None = None,
+    part_index: int = 0,
 ) -> TranslateResult:
     """Original translation logic for a single document or part"""
     translation_config.progress_monitor = pm
 
+    if part_scheduler is None:
+        return _translate_document(translation_config)
+    part_scheduler.wait_scanned_detection(part_index)
+    # Parts run on concurrent threads but MuPDF is not thread-safe, so a part
+    # holds the MuPDF lock except during its translation turn. Only the
+    # translation of one part, which waits on the translator, overlaps with
+    # the parsing, layout and typesetting of others.
+    with mupdf_lock:
+        return _translate_document(translation_config, part_scheduler, part_index)
+
+
+@contextlib.contextmanager
+def _translation_turn(part_scheduler: SplitPartScheduler | None, part_index: int):
+    """Translation turn of a part, with the MuPDF lock released meanwhile."""
+    if part_scheduler is None:
+        yield
+        return
+    mupdf_lock.release()
+    try:
+        with part_scheduler.translation_turn(part_index):
+            yield
+    finally:
+        mupdf_lock.acquire()
+
+
+def _translate_document(
+    translation_config: TranslationConfig,
+    part_scheduler: SplitPartScheduler | None = None,
+    part_index: int = 0,
+) -> TranslateResult:
     if translation_config.shared_context_cross_split_part.auto_enabled_ocr_workaround:
         translation_config.ocr_workaround = True
         translation_config.skip_scanned_detection = True
@@ -831,8 +891,10 @@ def _do_translate_single(
         logger.debug("skipping scanned file detection")
     else:
         logger.debug("start detect scanned file")
-        DetectScannedFile(translation_config).process(docs)
+        DetectScannedFile(translation_config).process(docs, doc_pdf2zh)
         logger.debug("finish detect scanned file")
+        if part_scheduler:
+            part_scheduler.scanned_detection_done()
         if translation_config.debug:
             xml_converter.write_json(
                 docs,
@@ -857,6 +919,8 @@ def _do_translate_single(
                 docs,
                 translation_config.get_working_file_path("table_parser.json"),
             )
+    # Page rasters are only needed by the vision stages above.
+    translation_config.release_page_raster_cache()
     ParagraphFinder(translation_config).process(docs)
     logger.debug(f"finish paragraph finder from {temp_pdf_path}")
     if translation_config.debug:
@@ -882,16 +946,19 @@ def _do_translate_single(
     except NotImplementedError:
         support_llm_translate = False
 
-    if support_llm_translate and translation_config.auto_extract_glossary:
-        AutomaticTermExtractor(translate_engine, translation_config).procress(docs)
+    # Glossary extraction and translation read and update the context shared
+    # across split parts, so parts take turns here in part order.
+    with _translation_turn(part_scheduler, part_index):
+        if support_llm_translate and translation_config.auto_extract_glossary:
+            AutomaticTermExtractor(translate_engine, translation_config).procress(docs)
 
-    if support_llm_translate:
-        il_translator = ILTranslatorLLMOnly(translate_engine, translation_config)
-    else:
-        il_translator = ILTranslator(translate_engine, translation_config)
+        if support_llm_translate:
+            il_translator = ILTranslatorLLMOnly(translate_engine, translation_config)
+        else:
+            il_translator = ILTranslator(translate_engine, translation_config)
 
-    il_translator.translate(docs)
-    del il_translator
+        il_translator.translate(docs)
+        del il_translator
     logger.debug(f"finish ILTranslator from {temp_pdf_path}")
     if translation_config.debug:
         xml_converter.write_json(
@@ -1,5 +1,11 @@
 import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import CancelledError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Any
 
 logger = logging.getLogger(__name__)
 
@@ -65,3 +71,117 @@ class SplitManager:
         return (
             split_point.end_page - split_point.start_page + 1
         ) * split_point.estimated_complexity
+
+
+class SplitPartAbortedError(Exception):
+    """Raised in a split part that stopped because another part failed."""
+
+
+class SplitPartScheduler:
+    """Runs split parts concurrently while keeping cross-part state ordered.
+
+    The translation of one part overlaps with the parsing, layout and
+    typesetting of others, which hold the process-wide MuPDF lock since
+    MuPDF is not thread-safe. Two steps stay serialized in part order:
+
+    * Parts after the first wait until part 0 has finished scanned file
+      detection, because it may switch on the OCR workaround for all parts.
+    * Term extraction and translation run one part at a time in part order,
+      so the auto extracted glossary and the title context seen by part N
+      are exactly what parts 0..N-1 left behind.
+    """
+
+    def __init__(self, total_parts: int, max_parts_in_flight: int = 2):
+        self.total_parts = total_parts
+        self.max_parts_in_flight = max(1, max_parts_in_flight)
+        self._cond = threading.Condition()
+        self._translated: set[int] = set()
+        self._scanned_detection_done = threading.Event()
+        self._aborted = False
+
+    def _check_aborted(self):
+        if self._aborted:
+            raise SplitPartAbortedError("another split part failed")
+
+    def wait_scanned_detection(self, part_index: int):
+        """Block part ``part_index`` until part 0 has finished scanned detection."""
+        if part_index == 0:
+            return
+        while not self._scanned_detection_done.wait(0.5):
+            self._check_aborted()
+        self._check_aborted()
+
+    def scanned_detection_done(self):
+        self._scanned_detection_done.set()
+
+    @contextmanager
+    def translation_turn(self, part_index: int):
+        """Hold the translation turn of ``part_index``.
+
+        Entered once all earlier parts have left their own turn.
+        """
+        with self._cond:
+            while not all(i in self._translated for i in range(part_index)):
+                self._check_aborted()
+                self._cond.wait(0.5)
+            self._check_aborted()
+        try:
+            yield
+        finally:
+            self.part_done(part_index)
+
+    def part_done(self, part_index: int):
+        """Release every gate later parts could be waiting on for ``part_index``."""
+        if part_index == 0:
+            self._scanned_detection_done.set()
+        with self._cond:
+            self._translated.add(part_index)
+            self._cond.notify_all()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+        self._scanned_detection_done.set()
+
+    def run(self, parts: list[int], fn: Callable[[int], Any]) -> dict[int, Any]:
+        """Run ``fn(part_index)`` for all parts, at most ``max_parts_in_flight`` at once.
+
+        Returns the results keyed by part index. If a part fails, parts not
+        started yet are cancelled, running parts are aborted at their next
+        gate, and the first failure in part order is raised.
+        """
+
+        def run_part(part_index: int):
+            try:
+                return fn(part_index)
+            except BaseException:
+                self.abort()
+                raise
+            finally:
+                self.part_done(part_index)
+
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(
+            max_workers=self.max_parts_in_flight,
+            thread_name_prefix="split-part",
+        ) as executor:
+            futures = {i: executor.submit(run_part, i) for i in parts}
+            for i, future in futures.items():
+                try:
+                    results[i] = future.result()
+                except BaseException as e:
+                    errors[i] = e
+                    for pending in futures.values():
+                        pending.cancel()
+        if errors:
+            # Parts aborted or cancelled because of another failure are not
+            # the root cause.
+            root_causes = {
+                i: e
+                for i, e in errors.items()
+                if not isinstance(e, SplitPartAbortedError | CancelledError)
+            }
+            raise (root_causes or errors)[min(root_causes or errors)]
+        return results
@@ -1,17 +1,22 @@
 import enum
+import itertools
 import logging
 import shutil
 import tempfile
 import threading
 from collections import Counter
+from collections.abc import Iterable
 from pathlib import Path
 
 from babeldoc.const import CACHE_FOLDER
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import PageRasterCache
 from babeldoc.format.pdf.split_manager import BaseSplitStrategy
 from babeldoc.format.pdf.split_manager import PageCountStrategy
 from babeldoc.glossary import Glossary
 from babeldoc.glossary import GlossaryEntry
 from babeldoc.progress_monitor import ProgressMonitor
+from babeldoc.translator.tokenizer import LocalTokenizer
+from babeldoc.translator.tokenizer import get_tokenizer
 from babeldoc.translator.translator import BaseTranslator
 
 logger = logging.getLogger(__name__)
@@ -155,6 +160,14 @@ class TranslationConfig:
         primary_font_family: str | None = None,
         only_include_translated_page: bool | None = False,
         save_auto_extracted_glossary: bool = True,
+        calibrate_token_count: bool = False,
+        max_parts_in_flight: int = 2,
+        typesetting_workers: int | None = None,
+        adaptive_batch_size: bool = False,
+        structured_output: bool = False,
+        context_cache: bool = False,
+        layout_cache: bool = True,
+        simple_page_layout: bool = False,
     ):
         self.translator = translator
         initial_user_glossaries = list(glossaries) if glossaries else []
@@ -246,6 +259,8 @@ class TranslationConfig:
 
         # Initialize split-related attributes
         self.split_strategy = split_strategy
+        # How many split parts may be processed at the same time
+        self.max_parts_in_flight = max_parts_in_flight
 
         # Create a unique working directory for each part
         self._part_working_dirs: dict[int, Path] = {}
@@ -277,6 +292,86 @@ class TranslationConfig:
 
         self.save_auto_extracted_glossary = save_auto_extracted_glossary
 
+        # Token counts for batch sizing come from a local tokenizer. When
+        # calibrate_token_count is set, a few samples are also counted by the
+        # translator's remote counter to scale the local counts.
+        self.calibrate_token_count = calibrate_token_count
+        self._tokenizer: LocalTokenizer | None = None
+        self._tokenizer_lock = threading.Lock()
+
+        self._page_raster_cache: PageRasterCache | None = None
+        self._page_raster_cache_lock = threading.Lock()
+
+        # Number of processes used to typeset long documents, None means one
+        # per CPU core up to 8, 1 disables parallel typesetting
+        self.typesetting_workers = typesetting_workers
+
+        # Let the LLM translator resize paragraph batches from observed
+        # latency, rate limiting and truncated responses instead of using the
+        # fixed 200 token / 5 paragraph limits
+        self.adaptive_batch_size = adaptive_batch_size
+
+        # Constrain LLM responses with a JSON schema and send the static rules
+        # as system instruction, for translators that support it
+        self.structured_output = structured_output
+
+        # Keep the static prompt prefix in the translator's context cache
+        # instead of sending it with every batch, needs structured_output
+        self.context_cache = context_cache
+
+        # Reuse layout and table detection results of pages seen in earlier
+        # runs, see babeldoc.docvision.layout_cache
+        self.layout_cache = layout_cache
+
+        # Give single-column pages of uniform text one synthetic text layout
+        # instead of running the layout model on them
+        self.simple_page_layout = simple_page_layout
+
+    def get_tokenizer(self, samples: Iterable[str | None] = ()) -> LocalTokenizer:
+        """Get the tokenizer used for batch sizing.
+
+        Args:
+            samples: Texts used for calibration. Only consumed while
+                calibrate_token_count is enabled and no calibration has been done.
+
+        Returns:
+            The shared local tokenizer, calibrated if requested.
+        """
+        with self._tokenizer_lock:
+            if self._tokenizer is not None:
+                return self._tokenizer
+            tokenizer = get_tokenizer()
+            remote_count_tokens = getattr(self.translator, "count_tokens_remote", None)
+            if not (self.calibrate_token_count and remote_count_tokens):
+                self._tokenizer = tokenizer
+                return tokenizer
+            samples = list(itertools.islice((x for x in samples if x), 64))
+            if not samples:
+                # calibrate later, once a caller can provide document text
+                return tokenizer
+            self._tokenizer = tokenizer.calibrate(remote_count_tokens, samples)
+            return self._tokenizer
+
+    def get_page_raster_cache(self, mupdf_doc) -> PageRasterCache:
+        """Get the page raster cache shared by the vision stages for ``mupdf_doc``."""
+        with self._page_raster_cache_lock:
+            if (
+                self._page_raster_cache is None
+                or self._page_raster_cache.mupdf_doc is not mupdf_doc
+            ):
+                self._page_raster_cache = PageRasterCache(mupdf_doc)
+            return self._page_raster_cache
+
+    def release_page_raster_cache(self):
+        with self._page_raster_cache_lock:
+            if self._page_raster_cache is not None:
+                cache = self._page_raster_cache
+                logger.debug(
+                    f"page raster cache: {cache.render_count} renders, {cache.hit_count} hits"
+                )
+                cache.clear()
+            self._page_raster_cache = None
+
     def parse_pages(self, pages_str: str | None) -> list[tuple[int, int]] | None:
         """解析页码字符串，返回页码范围列表
 
@@ -1,6 +1,5 @@
 import asyncio
 import sys
-from .translator.gemini_bridge import start_gemini_bridge # 브릿지 시작 함수를 import 합니다.
 import logging
 import queue
 from pathlib import Path
@@ -20,6 +19,7 @@ import babeldoc.format.pdf.high_level
 from babeldoc.format.pdf.translation_config import TranslationConfig
 from babeldoc.format.pdf.translation_config import WatermarkOutputMode
 from babeldoc.glossary import Glossary
+from babeldoc.translator.translator import GeminiTranslator
 from babeldoc.translator.translator import OpenAITranslator
 from babeldoc.translator.translator import set_translate_rate_limiter
 
@@ -31,13 +31,13 @@ def add_gemini_arguments(parser):
     """Gemini API 관련 명령줄 인수를 ArgumentParser에 추가합니다."""
     gemini_group = parser.add_argument_group(
         'Gemini API Options',
-        'Use Google Gemini API via a local OpenAI-compatible bridge.'
+        'Use Google Gemini API directly (native async client).'
     )
     
     gemini_group.add_argument(
         '--gemini',
         action='store_true',
-        help='[추천] Google Gemini API를 사용하여 번역합니다. 이 옵션을 사용하면 OpenAI 관련 옵션들이 자동으로 설정됩니다.'
+        help='[추천] Google Gemini API를 사용하여 번역합니다. 로컬 브릿지 없이 Gemini API와 직접 통신합니다.'
     )
     
     gemini_group.add_argument(
@@ -88,6 +88,11 @@ def create_parser():
         action="store_true",
         help="Only download and verify required assets then exit.",
     )
+    parser.add_argument(
+        "--reverify-assets",
+        action="store_true",
+        help="Re-hash all cached fonts and models in a background thread instead of trusting previously verified files.",
+    )
     parser.add_argument(
         "--rpc-doclayout",
         help="RPC service host address for document layout analysis",
@@ -104,6 +109,54 @@ def create_parser():
         "--rpc-doclayout4",
         help="RPC service host address for document layout analysis",
     )
+    parser.add_argument(
+        "--rpc-doclayout-image-format",
+        choices=["jpg", "png", "webp"],
+        default="jpg",
+        help="Image format used to upload pages to the RPC layout service.",
+    )
+    parser.add_argument(
+        "--rpc-doclayout-image-quality",
+        type=int,
+        default=95,
+        help="JPEG or WebP quality (1-100) of pages uploaded to the RPC layout service.",
+    )
+    parser.add_argument(
+        "--layout-batch-size",
+        type=int,
+        default=8,
+        help="Number of pages per ONNX layout inference batch. Only used by the local layout model.",
+    )
+    parser.add_argument(
+        "--layout-intra-op-threads",
+        type=int,
+        default=None,
+        help="Threads used inside each ONNX layout operator. Defaults to onnxruntime's choice (all physical cores).",
+    )
+    parser.add_argument(
+        "--layout-inter-op-threads",
+        type=int,
+        default=None,
+        help="Threads used to run independent ONNX layout operators in parallel.",
+    )
+    parser.add_argument(
+        "--layout-int8",
+        action="store_true",
+        help="Use the INT8 quantized layout model. Its speed depends on the CPU and it can be slower than the default model, boxes may differ slightly. Compare both with python -m babeldoc.tools.benchmark_doclayout before enabling it.",
+    )
+    parser.add_argument(
+        "--no-layout-cache",
+        action="store_false",
+        dest="layout_cache",
+        default=True,
+        help="Always run layout and table detection instead of reusing results cached for identical pages in earlier runs.",
+    )
+    parser.add_argument(
+        "--simple-page-layout",
+        action="store_true",
+        default=False,
+        help="Skip the layout model on single-column pages of uniform text and treat each as one text block. Faster, but headings and formulas on those pages are not detected as such.",
+    )
     parser.add_argument(
         "--generate-offline-assets",
         default=None,
@@ -159,6 +212,30 @@ def create_parser():
         default=4,
         help="QPS limit of translation service",
     )
+    translation_group.add_argument(
+        "--rpm",
+        type=float,
+        default=None,
+        help="Requests per minute limit of translation service. Overrides --qps when set.",
+    )
+    translation_group.add_argument(
+        "--tpm",
+        type=float,
+        default=None,
+        help="Tokens per minute limit of translation service.",
+    )
+    translation_group.add_argument(
+        "--hedge-ratio",
+        type=float,
+        default=0.05,
+        help="Send a second copy of LLM requests that run longer than 95%% of recent ones, for at most this share of all requests. 0 disables hedging.",
+    )
+    translation_group.add_argument(
+        "--rate-limit-burst",
+        type=int,
+        default=None,
+        help="Number of requests that may start at once after an idle period. Default: one second worth of requests.",
+    )
     translation_group.add_argument(
         "--ignore-cache",
         action="store_true",
@@ -230,6 +307,18 @@ def create_parser():
         type=int,
         help="Maximum number of pages per part for split translation. If not set, no splitting will be performed.",
     )
+    translation_group.add_argument(
+        "--max-parts-in-flight",
+        type=int,
+        default=2,
+        help="Maximum number of split parts processed at the same time. Parsing and typesetting of one part overlap with translation of another.",
+    )
+    translation_group.add_argument(
+        "--typesetting-workers",
+        type=int,
+        default=None,
+        help="Number of processes used to typeset long documents. Defaults to one per CPU core (at most 8); 1 disables parallel typesetting.",
+    )
     translation_group.add_argument(
         "--no-watermark",
         action="store_true",
@@ -319,6 +408,30 @@ def create_parser():
         default=False,
         help="Save automatically extracted glossary terms to a CSV file in the output directory.",
     )
+    translation_group.add_argument(
+        "--calibrate-token-count",
+        action="store_true",
+        default=False,
+        help="Calibrate the local tokenizer used for batch sizing against the translation service's remote token counter. Sends a few extra count requests per document.",
+    )
+    translation_group.add_argument(
+        "--adaptive-batch-size",
+        action="store_true",
+        default=False,
+        help="Adapt the size of the paragraph batches sent to the LLM to latency, rate limits and truncated responses instead of always using batches of about 200 tokens or 5 paragraphs.",
+    )
+    translation_group.add_argument(
+        "--structured-output",
+        action="store_true",
+        default=False,
+        help="Constrain the LLM response with a JSON schema instead of only asking for JSON in the prompt. Ignored if the translation service does not support it.",
+    )
+    translation_group.add_argument(
+        "--context-cache",
+        action="store_true",
+        default=False,
+        help="Store the static part of the translation prompt (rules, glossaries, document title) in the translation service's context cache once per document instead of sending it with every batch. Gemini only, needs --structured-output. Falls back to full prompts if the prompt is too short to cache or caching fails.",
+    )
     # service option argument group
     service_group = translation_group.add_mutually_exclusive_group()
     service_group.add_argument(
@@ -354,37 +467,13 @@ async def main():
     parser = create_parser()
     args: Any = parser.parse_args()
 
-    # --- Gemini 브릿지 실행 로직 ---
-    # 사용자가 --gemini 옵션을 주었을 경우에만 이 블록이 실행됩니다.
+    # --- Gemini 설정 ---
+    # 사용자가 --gemini 옵션을 주었을 경우 GeminiTranslator가 Gemini API와 직접 통신합니다.
     if args.gemini:
-        print("Gemini 모드가 활성화되었습니다. 로컬 브릿지 서버를 시작합니다...")
-        
         if not args.gemini_api_key:
             print("❌ 오류: --gemini 옵션을 사용하려면 --gemini-api-key를 반드시 제공해야 합니다.", file=sys.stderr)
             sys.exit(1)
-        
-        try:
-            # 백그라운드에서 브릿지 서버를 시작하고, 통신에 사용할 주소와 포트를 받아옵니다.
-            base_url, port = start_gemini_bridge(
-                api_key=args.gemini_api_key, 
-                model=args.gemini_model, 
-                qps=args.gemini_qps
-            )
-            
-            # BabelDOC의 OpenAI 관련 설정을 브릿지 서버에 맞게 동적으로 덮어씁니다.
-            # 이로써 BabelDOC은 자신이 Gemini가 아닌 OpenAI와 통신한다고 '착각'하게 됩니다.
-            args.openai = True
-            args.openai_base_url = base_url
-            args.openai_api_key = "DUMMY_KEY_FOR_BRIDGE" # 브릿지는 이 키를 검증하지 않으므로 아무 값이나 상관없습니다.
-            args.openai_model = args.gemini_model # 모델 이름은 그대로 전달하여 일관성을 유지합니다.
-            args.qps = args.gemini_qps # QPS 설정도 동기화합니다.
-            
-            print(f"✅ Gemini 브릿지 서버가 {base_url} 에서 성공적으로 시작되었습니다.")
-            print("BabelDOC이 이 로컬 서버를 통해 번역을 진행합니다.")
-
-        except Exception as e:
-            print(f"❌ Gemini 브릿지 서버 시작에 실패했습니다: {e}", file=sys.stderr)
-            sys.exit(1)
+        args.qps = args.gemini_qps # QPS 설정을 동기화합니다.
 
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -403,21 +492,32 @@ async def main():
         logger.info("Offline assets package restored, exiting...")
         return
 
+    if args.reverify_assets:
+        babeldoc.assets.assets.start_background_reverify()
+
     if args.warmup:
         babeldoc.assets.assets.warmup()
         logger.info("Warmup completed, exiting...")
         return
 
     # 验证翻译服务选择
-    if not args.openai:
-        parser.error("必须选择一个翻译服务：--openai")
+    if not (args.openai or args.gemini):
+        parser.error("必须选择一个翻译服务：--openai 或 --gemini")
 
     # 验证 OpenAI 参数
     if args.openai and not args.openai_api_key:
         parser.error("使用 OpenAI 服务时必须提供 API key")
 
     # 实例化翻译器
-    if args.openai:
+    if args.gemini:
+        translator = GeminiTranslator(
+            lang_in=args.lang_in,
+            lang_out=args.lang_out,
+            model=args.gemini_model,
+            api_key=args.gemini_api_key,
+            ignore_cache=args.ignore_cache,
+        )
+    elif args.openai:
         translator = OpenAITranslator(
             lang_in=args.lang_in,
             lang_out=args.lang_out,
@@ -430,33 +530,56 @@ async def main():
         raise ValueError("Invalid translator type")
 
     # 设置翻译速率限制
-    set_translate_rate_limiter(args.qps)
+    set_translate_rate_limiter(
+        max_qps=None if args.rpm else args.qps,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        burst=args.rate_limit_burst,
+    )
+    translator.hedger.max_ratio = args.hedge_ratio
     # 初始化文档布局模型
+    rpc_image_options = {
+        "image_format": args.rpc_doclayout_image_format,
+        "image_quality": args.rpc_doclayout_image_quality,
+    }
     if args.rpc_doclayout:
         from babeldoc.docvision.rpc_doclayout import RpcDocLayoutModel
 
-        doc_layout_model = RpcDocLayoutModel(host=args.rpc_doclayout)
+        doc_layout_model = RpcDocLayoutModel(
+            host=args.rpc_doclayout, **rpc_image_options
+        )
     elif args.rpc_doclayout2:
         from babeldoc.docvision.rpc_doclayout2 import RpcDocLayoutModel
 
-        doc_layout_model = RpcDocLayoutModel(host=args.rpc_doclayout2)
+        doc_layout_model = RpcDocLayoutModel(
+            host=args.rpc_doclayout2, **rpc_image_options
+        )
     elif args.rpc_doclayout3:
         from babeldoc.docvision.rpc_doclayout3 import RpcDocLayoutModel
 
-        doc_layout_model = RpcDocLayoutModel(host=args.rpc_doclayout3)
+        doc_layout_model = RpcDocLayoutModel(
+            host=args.rpc_doclayout3, **rpc_image_options
+        )
     elif args.rpc_doclayout4:
         from babeldoc.docvision.rpc_doclayout4 import RpcDocLayoutModel
 
-        doc_layout_model = RpcDocLayoutModel(host=args.rpc_doclayout4)
+        doc_layout_model = RpcDocLayoutModel(
+            host=args.rpc_doclayout4, **rpc_image_options
+        )
     else:
         from babeldoc.docvision.doclayout import DocLayoutModel
 
-        doc_layout_model = DocLayoutModel.load_onnx()
+        doc_layout_model = DocLayoutModel.load_onnx(
+            batch_size=args.layout_batch_size,
+            intra_op_num_threads=args.layout_intra_op_threads,
+            inter_op_num_threads=args.layout_inter_op_threads,
+            quantized=args.layout_int8,
+        )
 
     if args.translate_table_text:
         from babeldoc.docvision.table_detection.rapidocr import RapidOCRModel
 
-        table_model = RapidOCRModel()
+        table_model = RapidOCRModel.load()
     else:
         table_model = None
 
@@ -589,6 +712,14 @@ async def main():
             primary_font_family=args.primary_font_family,
             only_include_translated_page=args.only_include_translated_page,
             save_auto_extracted_glossary=args.save_auto_extracted_glossary,
+            calibrate_token_count=args.calibrate_token_count,
+            max_parts_in_flight=args.max_parts_in_flight,
+            typesetting_workers=args.typesetting_workers,
+            adaptive_batch_size=args.adaptive_batch_size,
+            structured_output=args.structured_output,
+            context_cache=args.context_cache,
+            layout_cache=args.layout_cache,
+            simple_page_layout=args.simple_page_layout,
         )
 
         # Create progress handler
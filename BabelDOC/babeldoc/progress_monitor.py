@@ -29,6 +29,8 @@ class ProgressMonitor:
         self.total_parts = total_parts
         self.raw_stages = stages
         self.part_results = {}
+        # Latest progress (0-100) of each part, parts may run concurrently
+        self.part_progress: dict[int, float] = {}
 
         # Convert stages list to dict with name and weight
         self.stage = {}
@@ -93,6 +95,18 @@ class ProgressMonitor:
             kwargs["total_parts"] = kwargs.get("total_parts")
             self.progress_change_callback(**kwargs)
 
+    def part_finished(self, part_index: int):
+        """Count a finished or skipped part as complete in the overall progress."""
+        self._update_part_progress(part_index, 100)
+
+    def _update_part_progress(self, part_index: int, progress: float) -> float:
+        """Record the progress of one part and return the overall progress."""
+        with self.lock:
+            self.part_progress[part_index] = max(
+                progress, self.part_progress.get(part_index, 0)
+            )
+            return sum(self.part_progress.values()) / self.total_parts
+
     def _handle_part_finish(self, **kwargs):
         """Handle completion of a part translation"""
         if kwargs["type"] == "error":
@@ -175,12 +189,12 @@ class ProgressMonitor:
     def calculate_current_progress(self, stage=None):
         if self.disable or self.parent_monitor and self.parent_monitor.disable:
             return 100
-        part_weight = 1 / self.total_parts
         if self.parent_monitor:
-            part_offset = self.part_index * part_weight
-        else:
-            part_offset = len(self.part_results) * part_weight
-        part_offset *= 100
+            return self.parent_monitor._update_part_progress(
+                self.part_index, self._calculate_current_progress(stage)
+            )
+        part_weight = 1 / self.total_parts
+        part_offset = len(self.part_results) * part_weight * 100
         progress = self._calculate_current_progress(stage) * part_weight + part_offset
         return progress
 
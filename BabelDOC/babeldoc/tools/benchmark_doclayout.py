@@ -0,0 +1,165 @@
+# Compare the INT8 quantized layout model with the FP32 model on a set of PDFs.
+#
+# Reports pages per second for both models and how well the INT8 boxes agree
+# with the FP32 boxes (same class, IoU above a threshold).
+#
+#   python -m babeldoc.tools.benchmark_doclayout papers/ --max-pages 200
+
+import argparse
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pymupdf
+from babeldoc.assets.assets import get_doclayout_int8_onnx_model_path
+from babeldoc.assets.assets import get_doclayout_onnx_model_path
+from babeldoc.docvision.base_doclayout import YoloResult
+from babeldoc.docvision.doclayout import OnnxModel
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import PageRasterCache
+from rich.console import Console
+from rich.logging import RichHandler
+from rich.table import Table
+
+logger = logging.getLogger(__name__)
+
+
+def load_pages(paths: list[Path], max_pages: int) -> list[np.ndarray]:
+    pdf_files = []
+    for path in paths:
+        pdf_files.extend(sorted(path.rglob("*.pdf")) if path.is_dir() else [path])
+    images = []
+    for pdf_file in pdf_files:
+        with pymupdf.open(pdf_file) as doc:
+            raster_cache = PageRasterCache(doc)
+            for page_number in range(doc.page_count):
+                if len(images) >= max_pages:
+                    return images
+                images.append(raster_cache.get_image(page_number))
+    return images
+
+
+def box_iou(a, b) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(
+    reference: YoloResult, candidate: YoloResult, iou_threshold: float
+) -> list[tuple[int, int | None]]:
+    """Greedily match candidate boxes to reference boxes of the same class.
+
+    Candidate boxes are taken in order of confidence. Returns one
+    ``(class, matched)`` pair per candidate box and ``(class, None)`` for each
+    reference box left unmatched.
+    """
+    unmatched = list(range(len(reference.boxes)))
+    pairs = []
+    for box in candidate.boxes:
+        best, best_iou = None, iou_threshold
+        for i in unmatched:
+            ref = reference.boxes[i]
+            if int(ref.cls) != int(box.cls):
+                continue
+            iou = box_iou(ref.xyxy, box.xyxy)
+            if iou >= best_iou:
+                best, best_iou = i, iou
+        if best is not None:
+            unmatched.remove(best)
+        pairs.append((int(box.cls), best))
+    pairs.extend((int(reference.boxes[i].cls), None) for i in unmatched)
+    return pairs
+
+
+def timed_predict(model: OnnxModel, images: list[np.ndarray], batch_size: int):
+    model.warmup()
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(images), batch_size):
+        results.extend(model.predict(images[i : i + batch_size]))
+    return results, len(images) / (time.perf_counter() - start)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, handlers=[RichHandler()])
+    parser = argparse.ArgumentParser(
+        description="Benchmark the INT8 layout model against the FP32 model."
+    )
+    parser.add_argument("paths", nargs="+", type=Path, help="PDF files or folders.")
+    parser.add_argument("--max-pages", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--intra-op-threads", type=int, default=None)
+    args = parser.parse_args()
+
+    images = load_pages(args.paths, args.max_pages)
+    if not images:
+        parser.error("no pages found")
+    logger.info(f"Loaded {len(images)} pages")
+
+    throughput = {}
+    results = {}
+    for name, path in (
+        ("fp32", get_doclayout_onnx_model_path()),
+        ("int8", get_doclayout_int8_onnx_model_path()),
+    ):
+        model = OnnxModel(
+            str(path),
+            batch_size=args.batch_size,
+            intra_op_num_threads=args.intra_op_threads,
+        )
+        results[name], throughput[name] = timed_predict(model, images, args.batch_size)
+        names = model._names
+        logger.info(f"{name}: {throughput[name]:.2f} pages/s")
+
+    # class -> [int8 boxes, fp32 boxes, matched]
+    counts = defaultdict(lambda: [0, 0, 0])
+    for reference, candidate in zip(results["fp32"], results["int8"], strict=True):
+        for cls, matched in match_boxes(reference, candidate, args.iou):
+            counts[cls][2] += matched is not None
+        for box in candidate.boxes:
+            counts[int(box.cls)][0] += 1
+        for box in reference.boxes:
+            counts[int(box.cls)][1] += 1
+
+    table = Table(title=f"INT8 vs FP32 boxes, IoU >= {args.iou}")
+    for column in ("class", "int8", "fp32", "precision", "recall"):
+        table.add_column(column)
+    total = [0, 0, 0]
+    for cls, (candidate_count, reference_count, matched) in sorted(counts.items()):
+        total = [
+            t + c
+            for t, c in zip(
+                total, (candidate_count, reference_count, matched), strict=True
+            )
+        ]
+        table.add_row(
+            str(names.get(cls, cls)),
+            str(candidate_count),
+            str(reference_count),
+            f"{matched / candidate_count:.3f}" if candidate_count else "-",
+            f"{matched / reference_count:.3f}" if reference_count else "-",
+        )
+    table.add_row(
+        "all",
+        str(total[0]),
+        str(total[1]),
+        f"{total[2] / total[0]:.3f}" if total[0] else "-",
+        f"{total[2] / total[1]:.3f}" if total[1] else "-",
+    )
+    console = Console()
+    console.print(table)
+    console.print(
+        f"Pages/s: fp32 {throughput['fp32']:.2f}, int8 {throughput['int8']:.2f} "
+        f"({throughput['int8'] / throughput['fp32']:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
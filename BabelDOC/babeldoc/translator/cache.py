@@ -1,4 +1,14 @@
+import atexit
+import hashlib
 import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Iterable
 from pathlib import Path
 
 from peewee import SQL
@@ -10,15 +20,18 @@ from peewee import TextField
 
 from babeldoc.const import CACHE_FOLDER
 
+logger = logging.getLogger(__name__)
+
 # we don't init the database here
 db = SqliteDatabase(None)
 
 
 class _TranslationCache(Model):
     id = AutoField()
-    translate_engine = CharField(max_length=20)
-    translate_engine_params = TextField()
-    original_text = TextField()
+    # digest of translate engine and its params
+    params_digest = CharField(max_length=32)
+    # digest of the original text
+    text_digest = CharField(max_length=32)
     translation = TextField()
 
     class Meta:
@@ -27,9 +40,8 @@ class _TranslationCache(Model):
             SQL(
                 """
             UNIQUE (
-                translate_engine,
-                translate_engine_params,
-                original_text
+                params_digest,
+                text_digest
                 )
             ON CONFLICT REPLACE
             """,
@@ -37,7 +49,112 @@ class _TranslationCache(Model):
         ]
 
 
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class _LRUCache:
+    """A bounded, thread-safe LRU mapping shared by all TranslationCache instances."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[tuple[str, str], str | None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Marks texts known to be missing from the database, set by prefetch.
+_MISSING = object()
+_memory_cache = _LRUCache(65536)
+
+
+class _CacheWriter:
+    """Writes cache entries from a background thread in batched transactions."""
+
+    def __init__(self, max_batch_size: int = 512, linger: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.linger = linger
+        self._queue: queue.Queue[tuple[str, str, str]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def put(self, params_digest: str, text_digest: str, translation: str):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="translation-cache-writer", daemon=True
+                    )
+                    self._thread.start()
+        self._queue.put((params_digest, text_digest, translation))
+
+    def flush(self):
+        """Block until every queued entry is written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            rows = [self._queue.get()]
+            try:
+                while len(rows) < self.max_batch_size:
+                    rows.append(self._queue.get(timeout=self.linger))
+            except queue.Empty:
+                pass
+            try:
+                self._write(rows)
+            except Exception as e:
+                logger.warning(f"write translation cache failed, ignore it: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _write(rows: list[tuple[str, str, str]]):
+        # Later entries win, like ON CONFLICT REPLACE would do.
+        unique_rows = {(p, t): tr for p, t, tr in rows}
+        database = _TranslationCache._meta.database
+        with database.atomic():
+            _TranslationCache.insert_many(
+                [(p, t, tr) for (p, t), tr in unique_rows.items()],
+                fields=[
+                    _TranslationCache.params_digest,
+                    _TranslationCache.text_digest,
+                    _TranslationCache.translation,
+                ],
+            ).execute()
+
+
+_cache_writer = _CacheWriter()
+atexit.register(_cache_writer.flush)
+
+
+def flush_cache():
+    """Wait until all pending cache writes are committed to the database."""
+    _cache_writer.flush()
+
+
 class TranslationCache:
+    # SQLite limits the number of variables per statement.
+    _prefetch_chunk_size = 500
+
     @staticmethod
     def _sort_dict_recursively(obj):
         if isinstance(obj, dict):
@@ -63,6 +180,9 @@ class TranslationCache:
         self.params = params
         params = self._sort_dict_recursively(params)
         self.translate_engine_params = json.dumps(params)
+        self.params_digest = _digest(
+            f"{self.translate_engine}\0{self.translate_engine_params}"
+        )
 
     def update_params(self, params: dict = None):
         if params is None:
@@ -74,31 +194,182 @@ class TranslationCache:
         self.params[k] = v
         self.replace_params(self.params)
 
-    # Since peewee and the underlying sqlite are thread-safe,
-    # get and set operations don't need locks.
+    # Reads go through the in-memory LRU first, writes are applied to the LRU
+    # at once and committed to SQLite by the background writer.
     def get(self, original_text: str) -> str | None:
+        text_digest = _digest(original_text)
+        cached = _memory_cache.get((self.params_digest, text_digest), None)
+        if cached is _MISSING:
+            return None
+        if cached is not None:
+            return cached
         result = _TranslationCache.get_or_none(
-            translate_engine=self.translate_engine,
-            translate_engine_params=self.translate_engine_params,
-            original_text=original_text,
+            params_digest=self.params_digest,
+            text_digest=text_digest,
         )
-        return result.translation if result else None
+        if result is None:
+            return None
+        _memory_cache.put((self.params_digest, text_digest), result.translation)
+        return result.translation
 
     def set(self, original_text: str, translation: str):
-        _TranslationCache.create(
-            translate_engine=self.translate_engine,
-            translate_engine_params=self.translate_engine_params,
-            original_text=original_text,
-            translation=translation,
+        text_digest = _digest(original_text)
+        _memory_cache.put((self.params_digest, text_digest), translation)
+        _cache_writer.put(self.params_digest, text_digest, translation)
+
+    def prefetch(self, original_texts: Iterable[str]) -> dict[str, str]:
+        """Look up many texts with a few queries and keep the results in memory.
+
+        Returns the translations found. Texts not found are remembered as
+        missing, so later ``get`` calls for them do not hit the database.
+        """
+        result = {}
+        pending: dict[str, list[str]] = {}
+        for text in original_texts:
+            text_digest = _digest(text)
+            cached = _memory_cache.get((self.params_digest, text_digest), None)
+            if cached is _MISSING:
+                continue
+            if cached is not None:
+                result[text] = cached
+            else:
+                pending.setdefault(text_digest, []).append(text)
+        digests = list(pending)
+        for i in range(0, len(digests), self._prefetch_chunk_size):
+            chunk = digests[i : i + self._prefetch_chunk_size]
+            rows = _TranslationCache.select(
+                _TranslationCache.text_digest, _TranslationCache.translation
+            ).where(
+                (_TranslationCache.params_digest == self.params_digest)
+                & (_TranslationCache.text_digest.in_(chunk))
+            )
+            for row in rows:
+                _memory_cache.put(
+                    (self.params_digest, row.text_digest), row.translation
+                )
+                for text in pending.pop(row.text_digest):
+                    result[text] = row.translation
+        for text_digest in pending:
+            _memory_cache.put((self.params_digest, text_digest), _MISSING)
+        return result
+
+
+class ParagraphTranslationCache:
+    """Translations of single paragraphs, independent of how they were batched.
+
+    LLM prompts embed a whole batch plus context hints, so caching on the prompt
+    misses as soon as batch boundaries shift. This cache is keyed per paragraph
+    on the normalized source text (placeholders included), a placeholder
+    signature and the glossary entries active for the paragraph. Translator
+    parameters such as model and languages are part of the cache params.
+    """
+
+    _whitespace_re = re.compile(r"\s+")
+
+    def __init__(self, translation_cache: TranslationCache, params: dict = None):
+        self.cache = TranslationCache(
+            translation_cache.translate_engine,
+            {
+                **translation_cache.params,
+                **(params or {}),
+                "cache_granularity": "paragraph",
+            },
         )
 
+    @classmethod
+    def normalize_text(cls, text: str) -> str:
+        text = unicodedata.normalize("NFC", text)
+        return cls._whitespace_re.sub(" ", text).strip()
+
+    @staticmethod
+    def _digest(obj) -> str:
+        data = json.dumps(obj, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+    def make_key(
+        self,
+        text: str,
+        placeholder_signature=None,
+        glossary_entries: Iterable[tuple[str, str, str]] = (),
+    ) -> str:
+        """Build the cache key of a paragraph.
+
+        :param text: translation input of the paragraph, with placeholders
+        :param placeholder_signature: anything else that shapes the prompt for
+            this paragraph, e.g. formula hints and layout label
+        :param glossary_entries: (glossary name, source, target) tuples active
+            for this paragraph
+        """
+        return "\n".join(
+            [
+                self._digest(placeholder_signature),
+                self._digest(sorted(glossary_entries)),
+                self.normalize_text(text),
+            ]
+        )
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, translation: str):
+        self.cache.set(key, translation)
+
+    def prefetch(self, keys: Iterable[str]) -> dict[str, str]:
+        return self.cache.prefetch(keys)
+
+
+def _remove_db_file(db_path: Path):
+    for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+        path.unlink(missing_ok=True)
+
+
+def _migrate_v1_db(v1_db_path: Path, chunk_size: int = 1000) -> int:
+    """Copy the rows of a v1 cache database into the current one and delete it.
+
+    v1 stored the engine name, its JSON params and the original text, which
+    hash to the same digests the current schema is keyed by. Returns the
+    number of rows migrated. On failure the v1 file is kept to retry later.
+    """
+    try:
+        v1_db = sqlite3.connect(v1_db_path)
+        try:
+            cursor = v1_db.execute(
+                "SELECT translate_engine, translate_engine_params, original_text, "
+                "translation FROM _translationcache"
+            )
+            count = 0
+            while rows := cursor.fetchmany(chunk_size):
+                with _TranslationCache._meta.database.atomic():
+                    _TranslationCache.insert_many(
+                        [
+                            {
+                                "params_digest": _digest(f"{engine}\0{params}"),
+                                "text_digest": _digest(text),
+                                "translation": translation,
+                            }
+                            for engine, params, text, translation in rows
+                        ]
+                    ).execute()
+                count += len(rows)
+        finally:
+            v1_db.close()
+    except Exception as e:
+        logger.warning(f"Failed to migrate translation cache {v1_db_path}: {e}")
+        return 0
+    _remove_db_file(v1_db_path)
+    logger.info(f"Migrated {count} translation cache entries from {v1_db_path}")
+    return count
+
 
 def init_db(remove_exists=False):
     CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
-    # The current version does not support database migration, so add the version number to the file name.
-    cache_db_path = CACHE_FOLDER / "cache.v1.db"
-    if remove_exists and cache_db_path.exists():
-        cache_db_path.unlink()
+    # The version number in the file name changes with the schema, older
+    # versions are migrated on first open.
+    cache_db_path = CACHE_FOLDER / "cache.v2.db"
+    v1_db_path = CACHE_FOLDER / "cache.v1.db"
+    if remove_exists:
+        _remove_db_file(cache_db_path)
+        _remove_db_file(v1_db_path)
     db.init(
         cache_db_path,
         pragmas={
@@ -107,6 +378,8 @@ def init_db(remove_exists=False):
         },
     )
     db.create_tables([_TranslationCache], safe=True)
+    if v1_db_path.exists():
+        _migrate_v1_db(v1_db_path)
 
 
 def init_test_db():
@@ -123,6 +396,8 @@ def init_test_db():
             "busy_timeout": 1000,
         },
     )
+    flush_cache()
+    _memory_cache.clear()
     test_db.bind([_TranslationCache], bind_refs=False, bind_backrefs=False)
     test_db.connect()
     test_db.create_tables([_TranslationCache], safe=True)
@@ -130,6 +405,8 @@ def init_test_db():
 
 
 def clean_test_db(test_db):
+    flush_cache()
+    _memory_cache.clear()
     test_db.drop_tables([_TranslationCache])
     test_db.close()
     db_path = Path(test_db.database)
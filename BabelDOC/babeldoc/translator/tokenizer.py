@@ -0,0 +1,247 @@
+"""Offline token counting used to size LLM batches.
+
+Counting tokens through the remote API costs one HTTP round-trip per paragraph,
+so batch sizing uses a local BPE tokenizer instead. The BPE ranks are loaded
+from the ``*.tiktoken`` files shipped with the application; when neither
+tiktoken nor the rank files are available a character based estimate is used.
+
+The remote counter is only consulted in calibration mode, where a small sample
+of texts is counted both ways and the local counts are scaled accordingly.
+"""
+
+import base64
+import logging
+import math
+import os
+import sys
+import threading
+import unicodedata
+from collections.abc import Callable
+from collections.abc import Iterable
+from pathlib import Path
+
+from babeldoc.const import CACHE_FOLDER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING_NAME = "o200k_base"
+
+# Pre-tokenization patterns and special tokens of the encodings we ship,
+# copied from tiktoken_ext.openai_public so no network access is needed.
+_ENCODING_DEFINITIONS = {
+    "o200k_base": {
+        "pat_str": "|".join(
+            [
+                r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+                r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+                r"""\p{N}{1,3}""",
+                r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+                r"""\s*[\r\n]+""",
+                r"""\s+(?!\S)""",
+                r"""\s+""",
+            ]
+        ),
+        "special_tokens": {"<|endoftext|>": 199999, "<|endofprompt|>": 200018},
+    },
+    "cl100k_base": {
+        "pat_str": r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s""",
+        "special_tokens": {
+            "<|endoftext|>": 100257,
+            "<|fim_prefix|>": 100258,
+            "<|fim_middle|>": 100259,
+            "<|fim_suffix|>": 100260,
+            "<|endofprompt|>": 100276,
+        },
+    },
+}
+
+
+def _tiktoken_search_dirs() -> list[Path]:
+    dirs = [CACHE_FOLDER / "tiktoken"]
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        dirs.append(Path(os.environ["TIKTOKEN_CACHE_DIR"]))
+    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
+        dirs.append(Path(sys._MEIPASS) / "tiktoken_data")
+        dirs.append(Path(sys._MEIPASS))
+    # source checkout: <repo>/BabelDOC/babeldoc/translator/tokenizer.py
+    dirs.append(Path(__file__).resolve().parents[3] / "tiktoken_data")
+    return dirs
+
+
+def find_bpe_file(encoding_name: str) -> Path | None:
+    for directory in _tiktoken_search_dirs():
+        path = directory / f"{encoding_name}.tiktoken"
+        if path.is_file():
+            return path
+    return None
+
+
+def load_bpe_ranks(path: Path) -> dict[bytes, int]:
+    ranks = {}
+    with path.open("rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+def _load_encoding(encoding_name: str):
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed, token counts will be estimated")
+        return None
+
+    definition = _ENCODING_DEFINITIONS.get(encoding_name)
+    path = find_bpe_file(encoding_name)
+    if definition is None or path is None:
+        logger.warning(
+            f"BPE file for {encoding_name} not found, token counts will be estimated"
+        )
+        return None
+    return tiktoken.Encoding(
+        name=encoding_name,
+        pat_str=definition["pat_str"],
+        mergeable_ranks=load_bpe_ranks(path),
+        special_tokens=definition["special_tokens"],
+    )
+
+
+def estimate_token_count(text: str) -> int:
+    """Rough token estimate: one token per CJK character, four chars per token otherwise."""
+    wide = 0
+    for ch in text:
+        if unicodedata.east_asian_width(ch) in ("W", "F"):
+            wide += 1
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+class LocalTokenizer:
+    """Thread-safe, memoized local token counter."""
+
+    def __init__(
+        self,
+        encoding_name: str = DEFAULT_ENCODING_NAME,
+        scale: float = 1.0,
+        cache_size: int = 65536,
+        _encoding=None,
+    ):
+        self.encoding_name = encoding_name
+        self.encoding = (
+            _encoding if _encoding is not None else _load_encoding(encoding_name)
+        )
+        self.scale = scale
+        self.cache_size = cache_size
+        self._cache: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_estimated(self) -> bool:
+        return self.encoding is None
+
+    def _apply_scale(self, count: int) -> int:
+        if self.scale == 1.0:
+            return count
+        return math.ceil(count * self.scale)
+
+    def _remember(self, counts: dict[str, int]):
+        with self._lock:
+            if len(self._cache) + len(counts) > self.cache_size:
+                self._cache.clear()
+            self._cache.update(counts)
+
+    def count_tokens(self, text: str | None) -> int:
+        if not text:
+            return 0
+        count = self._cache.get(text)
+        if count is not None:
+            return count
+        if self.encoding is None:
+            count = self._apply_scale(estimate_token_count(text))
+        else:
+            count = self._apply_scale(len(self.encoding.encode_ordinary(text)))
+        self._remember({text: count})
+        return count
+
+    def count_tokens_many(self, texts: Iterable[str | None]) -> list[int]:
+        """Count tokens for many texts at once.
+
+        Duplicated and already counted texts are looked up in the memo, the
+        rest are encoded in a single batch call which tiktoken spreads over
+        its thread pool.
+        """
+        texts = list(texts)
+        counts = {}
+        pending = []
+        for text in texts:
+            if not text or text in counts:
+                continue
+            count = self._cache.get(text)
+            if count is None:
+                counts[text] = 0
+                pending.append(text)
+            else:
+                counts[text] = count
+        if pending:
+            if self.encoding is None:
+                new_counts = {
+                    t: self._apply_scale(estimate_token_count(t)) for t in pending
+                }
+            else:
+                encoded = self.encoding.encode_ordinary_batch(pending)
+                new_counts = {
+                    t: self._apply_scale(len(tokens))
+                    for t, tokens in zip(pending, encoded, strict=True)
+                }
+            counts.update(new_counts)
+            self._remember(new_counts)
+        return [counts[t] if t else 0 for t in texts]
+
+    def calibrate(
+        self,
+        remote_count_tokens: Callable[[str], int],
+        samples: Iterable[str],
+        max_samples: int = 8,
+    ) -> "LocalTokenizer":
+        """Return a tokenizer whose counts are scaled to match the remote counter.
+
+        Only ``max_samples`` texts are sent to the remote counter. If calibration
+        fails the returned tokenizer is unscaled.
+        """
+        local_total = 0
+        remote_total = 0
+        for text in samples:
+            if not text:
+                continue
+            try:
+                remote_total += remote_count_tokens(text)
+            except Exception as e:
+                logger.warning(f"Remote token count failed, skip calibration: {e}")
+                return self
+            local_total += self.count_tokens(text)
+            max_samples -= 1
+            if max_samples <= 0:
+                break
+        if not local_total or not remote_total:
+            return self
+        scale = remote_total / (local_total / self.scale)
+        logger.info(
+            f"Calibrated {self.encoding_name} token counts against remote counter, scale: {scale:.3f}"
+        )
+        return LocalTokenizer(self.encoding_name, scale=scale, _encoding=self.encoding)
+
+
+_tokenizers: dict[str, LocalTokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(encoding_name: str = DEFAULT_ENCODING_NAME) -> LocalTokenizer:
+    """Return the process-wide tokenizer for ``encoding_name``."""
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(encoding_name)
+        if tokenizer is None:
+            tokenizer = LocalTokenizer(encoding_name)
+            _tokenizers[encoding_name] = tokenizer
+        return tokenizer
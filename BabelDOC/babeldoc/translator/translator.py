@@ -1,5 +1,11 @@
+import asyncio
+import collections
+import concurrent.futures
 import contextlib
+import itertools
+import json
 import logging
+import os
 import threading
 import time
 import unicodedata
@@ -15,7 +21,9 @@ from tenacity import retry_if_exception_type
 from tenacity import stop_after_attempt
 from tenacity import wait_exponential
 
+from babeldoc.asynchronize import get_background_loop
 from babeldoc.translator.cache import TranslationCache
+from babeldoc.translator.tokenizer import get_tokenizer
 from babeldoc.utils.atomic_integer import AtomicInteger
 
 logger = logging.getLogger(__name__)
@@ -25,62 +33,416 @@ def remove_control_characters(s):
     return "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
 
 
+# Errors returned when a quota is exceeded, the rate limiter backs off on these.
+RATE_LIMIT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+)
+
+
+class LLMOutputTruncatedError(Exception):
+    """The model stopped because it reached its output token limit."""
+
+
+class ContextCacheUnavailableError(Exception):
+    """The context cache a request referenced has expired or was deleted."""
+
+
+class ContextCache:
+    """A static prompt prefix stored by the translation service.
+
+    Requests referencing it send only the rest of the prompt, and the cached
+    tokens are billed at a reduced rate. Created by
+    BaseTranslator.create_context_cache.
+    """
+
+    def __init__(
+        self, name: str, system_instruction: str, contents: str, ttl_seconds: int
+    ):
+        self.name = name
+        self.system_instruction = system_instruction
+        self.contents = contents
+        self.expire_time = time.monotonic() + ttl_seconds
+
+
 class RateLimiter:
     """
-    A rate limiter using the leaky bucket algorithm to ensure a smooth, constant rate of requests.
+    A token-bucket rate limiter with a request budget (QPS or RPM) and an optional token budget (TPM).
+
+    Each bucket is tracked as a theoretical arrival time (GCRA). A caller reserves its
+    slot under the lock and sleeps after releasing it, so waiting callers do not
+    serialize on each other. After an idle period ``burst`` requests may start at once.
+
+    The effective rate follows the server: a rate limit error halves it (down to
+    ``min_rate_factor`` of the configured rate) and pauses new requests for the
+    suggested retry delay, every successful request grows it back by ``recovery_step``.
     This implementation is thread-safe and robust against system clock changes.
     """
 
-    def __init__(self, max_qps: int):
-        if max_qps <= 0:
-            raise ValueError("max_qps must be a positive number")
-        self.max_qps = max_qps
-        self.min_interval = 1.0 / max_qps
+    def __init__(
+        self,
+        max_qps: float | None = None,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        burst: int | None = None,
+        min_rate_factor: float = 1 / 16,
+        recovery_step: float = 0.05,
+    ):
         self.lock = threading.Lock()
-        # Use monotonic time to prevent issues with system time changes
-        self.next_request_time = time.monotonic()
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+        self.rate_limited_count = 0
+        self.configure(max_qps, rpm, tpm, burst)
 
-    def wait(self, _rate_limit_params: dict = None):
+    def configure(
+        self,
+        max_qps: float | None = None,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        burst: int | None = None,
+    ):
         """
-        Blocks until the next request can be processed, ensuring the rate limit is not exceeded.
+        Updates the budgets and resets the adaptive rate. This operation is thread-safe.
+        """
+        rates = [r for r in (max_qps, rpm / 60 if rpm else None) if r]
+        if not rates or min(rates) <= 0:
+            raise ValueError("max_qps or rpm must be a positive number")
+        if tpm is not None and tpm <= 0:
+            raise ValueError("tpm must be a positive number")
+        with self.lock:
+            self.request_rate = min(rates)
+            self.tpm = tpm
+            self.burst = max(1, burst if burst else int(self.request_rate))
+            self.rate_factor = 1.0
+            # Use monotonic time to prevent issues with system time changes
+            now = time.monotonic()
+            self._request_tat = now
+            self._token_tat = now
+            self._last_backoff = float("-inf")
+
+    @property
+    def max_qps(self) -> float:
+        return self.request_rate
+
+    def _reserve(self, tokens: int, only_if_free: bool = False) -> float | None:
+        """Reserve a slot and return how long the caller has to sleep before using it.
+
+        With ``only_if_free``, nothing is reserved and None is returned unless
+        the slot is available right away and the rate is not backed off.
         """
         with self.lock:
             now = time.monotonic()
+            request_rate = self.request_rate * self.rate_factor
+            request_tat = max(self._request_tat, now) + 1 / request_rate
+            start = request_tat - self.burst / request_rate
+            if self.tpm and tokens:
+                # The token bucket holds as much as the request bucket lets pass in
+                # a burst. A single request larger than that passes once it is full.
+                token_rate = self.tpm / 60 * self.rate_factor
+                capacity = max(token_rate * self.burst / request_rate, tokens)
+                token_tat = max(self._token_tat, now) + tokens / token_rate
+                start = max(start, token_tat - capacity / token_rate)
+            if only_if_free and (start > now or self.rate_factor < 1.0):
+                return None
+            if self.tpm and tokens:
+                self._token_tat = token_tat
+            self._request_tat = request_tat
+            return start - now
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """
+        Takes a slot only if it is free right now, for requests that may be skipped.
+        :param tokens: estimated tokens of the request, counted against the TPM budget
+        """
+        return self._reserve(tokens, only_if_free=True) is not None
 
-            wait_duration = self.next_request_time - now
-            if wait_duration > 0:
-                time.sleep(wait_duration)
+    def wait(self, tokens: int = 0):
+        """
+        Blocks until the next request can be processed, ensuring the rate limit is not exceeded.
+        :param tokens: estimated tokens of the request, counted against the TPM budget
+        """
+        wait_duration = self._reserve(tokens)
+        if wait_duration > 0:
+            time.sleep(wait_duration)
+
+    async def async_wait(self, tokens: int = 0):
+        """
+        Asynchronous version of wait, the event loop is never blocked.
+        """
+        wait_duration = self._reserve(tokens)
+        if wait_duration > 0:
+            await asyncio.sleep(wait_duration)
 
-            # Update the next allowed request time.
-            # If the limiter has been idle, the next request should start from 'now'.
+    def on_rate_limited(self, retry_after: float | None = None):
+        """
+        Shrinks the rate after the server rejected a request and pauses new requests
+        for ``retry_after`` seconds (one request interval if unknown).
+        """
+        with self.lock:
+            self.rate_limited_count += 1
             now = time.monotonic()
-            self.next_request_time = (
-                max(self.next_request_time, now) + self.min_interval
+            request_rate = self.request_rate * self.rate_factor
+            # Requests in flight hit the limit together, shrink once per interval.
+            if now - self._last_backoff >= 1 / request_rate:
+                self._last_backoff = now
+                self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+                request_rate = self.request_rate * self.rate_factor
+                logger.warning(
+                    f"Rate limited, reduce request rate to {request_rate * 60:.2f} RPM"
+                )
+            pause_until = now + (retry_after or 1 / request_rate)
+            self._request_tat = max(
+                self._request_tat, pause_until + (self.burst - 1) / request_rate
             )
 
-    def set_max_qps(self, max_qps: int):
+    def on_success(self):
         """
-        Updates the maximum queries per second. This operation is thread-safe.
+        Grows the rate back towards the configured budget after a successful request.
         """
-        if max_qps <= 0:
-            raise ValueError("max_qps must be a positive number")
+        if self.rate_factor >= 1.0:
+            return
         with self.lock:
-            self.max_qps = max_qps
-            self.min_interval = 1.0 / max_qps
+            self.rate_factor = min(1.0, self.rate_factor + self.recovery_step)
+
+    def set_max_qps(self, max_qps: float):
+        """
+        Updates the maximum queries per second. This operation is thread-safe.
+        """
+        self.configure(max_qps=max_qps, tpm=self.tpm)
 
 
 _translate_rate_limiter = RateLimiter(5)
 
 
-def set_translate_rate_limiter(max_qps):
-    _translate_rate_limiter.set_max_qps(max_qps)
+_hedge_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=256, thread_name_prefix="hedged-request"
+            )
+        return _hedge_executor
+
+
+class RequestHedger:
+    """
+    Duplicates requests that take much longer than usual, to cut tail latency.
+
+    Once ``min_samples`` request durations are known, a request still running
+    after the ``quantile`` of the recent durations is sent a second time if the
+    rate limiter has a free slot and hedges stay within ``max_ratio`` of all
+    requests. The first successful response the caller's validator accepts
+    wins; the other request is cancelled on the event loop, or left to finish
+    and ignored in threads.
+    """
+
+    def __init__(
+        self,
+        max_ratio: float = 0.05,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.max_ratio = max_ratio
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._durations = collections.deque(maxlen=window)
+        self.request_count = 0
+        self.hedged_count = 0
+        self.hedge_win_count = 0
+
+    def record(self, seconds: float):
+        """Record the duration of a successful request."""
+        with self._lock:
+            self._durations.append(seconds)
+
+    def hedge_delay(self) -> float | None:
+        """How long to wait before hedging a new request, None to not hedge it."""
+        with self._lock:
+            self.request_count += 1
+            if self.max_ratio <= 0 or len(self._durations) < self.min_samples:
+                return None
+            durations = sorted(self._durations)
+        return durations[min(len(durations) - 1, int(len(durations) * self.quantile))]
+
+    def _has_hedge_budget(self) -> bool:
+        # Caller holds self._lock.
+        return self.hedged_count + 1 <= self.request_count * self.max_ratio
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return self._has_hedge_budget()
+
+    def _try_hedge(self, tokens: int) -> bool:
+        with self._lock:
+            if not self._has_hedge_budget():
+                return False
+            if not _translate_rate_limiter.try_acquire(tokens):
+                return False
+            self.hedged_count += 1
+            return True
+
+    def _on_hedge_won(self):
+        with self._lock:
+            self.hedge_win_count += 1
+
+    @staticmethod
+    def _is_usable(validate, result) -> bool:
+        if validate is None:
+            return True
+        try:
+            validate(result)
+        except Exception as e:
+            logger.debug(f"Unusable response of a hedged request: {e}")
+            return False
+        return True
+
+    def call(
+        self, fn, text, rate_limit_params: dict | None, tokens: int, validate=None
+    ):
+        """Call ``fn(text, rate_limit_params)``, hedging it if it runs long.
+
+        Returns the result and how long the attempt that produced it ran. Once
+        a request is hedged, the first attempt whose result ``validate`` accepts
+        wins. If none does, the first attempt that returned at all is used.
+        """
+
+        def timed(params):
+            start = time.monotonic()
+            result = fn(text, params)
+            return result, time.monotonic() - start
+
+        delay = self.hedge_delay()
+        if delay is None or not self._may_hedge():
+            return timed(rate_limit_params)
+        executor = _get_hedge_executor()
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return timed(rate_limit_params)
+
+        # The caller must be free to return the hedge's answer, so the primary
+        # runs on a worker too. Time spent queued for one does not count
+        # towards the delay, or a busy pool would hedge every request.
+        primary = executor.submit(run_primary)
+        started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        if not self._try_hedge(tokens):
+            return primary.result()
+        logger.debug(f"Hedge request running longer than {delay:.1f}s")
+        hedge = executor.submit(timed, _copy_params(rate_limit_params))
+        attempts = [primary, hedge]
+        pending = set(attempts)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None and self._is_usable(
+                    validate, future.result()[0]
+                ):
+                    if future is hedge:
+                        self._on_hedge_won()
+                    return future.result()
+        for future in attempts:
+            if future.exception() is None:
+                return future.result()
+        return primary.result()
+
+    async def async_call(
+        self, fn, text, rate_limit_params: dict | None, tokens: int, validate=None
+    ):
+        """Asynchronous version of call, ``fn`` is a coroutine function."""
+
+        async def timed(params):
+            start = time.monotonic()
+            result = await fn(text, params)
+            return result, time.monotonic() - start
+
+        delay = self.hedge_delay()
+        if delay is None or not self._may_hedge():
+            return await timed(rate_limit_params)
+        primary = asyncio.ensure_future(timed(rate_limit_params))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._try_hedge(tokens):
+                return await primary
+            logger.debug(f"Hedge request running longer than {delay:.1f}s")
+            hedge = asyncio.ensure_future(timed(_copy_params(rate_limit_params)))
+            try:
+                attempts = [primary, hedge]
+                pending = set(attempts)
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is None and self._is_usable(
+                            validate, task.result()[0]
+                        ):
+                            if task is hedge:
+                                self._on_hedge_won()
+                            return task.result()
+                for task in attempts:
+                    if task.exception() is None:
+                        return task.result()
+                return primary.result()
+            finally:
+                hedge.cancel()
+        finally:
+            primary.cancel()
+
+    def get_summary(self) -> str:
+        return (
+            f"{self.hedged_count} of {self.request_count} requests hedged, "
+            f"{self.hedge_win_count} hedges answered first"
+        )
+
+
+def _copy_params(rate_limit_params: dict | None) -> dict | None:
+    # Each attempt reports into its own dict, see _record_call_timing.
+    return dict(rate_limit_params) if rate_limit_params is not None else None
+
+
+def set_translate_rate_limiter(
+    max_qps: float | None = None,
+    rpm: float | None = None,
+    tpm: float | None = None,
+    burst: int | None = None,
+):
+    _translate_rate_limiter.configure(max_qps, rpm, tpm, burst)
 
 
 class BaseTranslator(ABC):
-    # Due to cache limitations, name should be within 20 characters.
-    # cache.py: translate_engine = CharField(max_length=20)
+    # Part of the translation cache key, see TranslationCache.replace_params.
     name = "base"
     lang_map = {}
+    # Translators that implement do_llm_translate_async natively set this to
+    # True so callers can schedule batches on event_loop instead of threads.
+    supports_async_llm_translate = False
+    # Translators that accept a system instruction and can constrain the
+    # response to a JSON schema implement do_llm_translate_structured.
+    supports_structured_output = False
+    # Translators that can store a prompt prefix for structured requests
+    # implement create/refresh/delete_context_cache.
+    supports_context_cache = False
+    # Smallest prefix in tokens the service accepts for context caching.
+    min_context_cache_tokens = 0
+    # Upper bound for concurrently running async llm translations.
+    max_concurrent_requests = 32
+    # How often a request rejected by the server quota is retried.
+    max_rate_limited_retries = 30
+    # Most tokens the model generates in one response, bounds the batch size.
+    max_output_tokens = 8192
 
     def __init__(self, lang_in, lang_out, ignore_cache):
         self.ignore_cache = ignore_cache
@@ -99,6 +461,8 @@ class BaseTranslator(ABC):
 
         self.translate_call_count = 0
         self.translate_cache_call_count = 0
+        # Duplicates straggling llm requests, max_ratio 0 turns it off.
+        self.hedger = RequestHedger()
 
     def __del__(self):
         with contextlib.suppress(Exception):
@@ -132,16 +496,25 @@ class BaseTranslator(ABC):
                     return cache
             except Exception as e:
                 logger.debug(f"try get cache failed, ignore it: {e}")
-        _translate_rate_limiter.wait()
-        translation = self.do_translate(text, rate_limit_params)
+        translation = self._rate_limited_call(
+            self.do_translate, text, rate_limit_params
+        )
         if not (self.ignore_cache or ignore_cache):
             self.cache.set(text, translation)
         return translation
 
-    def llm_translate(self, text, ignore_cache=False, rate_limit_params: dict = None):
+    def llm_translate(
+        self,
+        text,
+        ignore_cache=False,
+        rate_limit_params: dict = None,
+        validate_output=None,
+    ):
         """
         Translate the text, and the other part should call this method.
         :param text: text to translate
+        :param validate_output: raises for responses that are not usable, used
+            to choose between the responses of a hedged request
         :return: translated text
         """
         self.translate_call_count += 1
@@ -153,12 +526,307 @@ class BaseTranslator(ABC):
                     return cache
             except Exception as e:
                 logger.debug(f"try get cache failed, ignore it: {e}")
-        _translate_rate_limiter.wait()
-        translation = self.do_llm_translate(text, rate_limit_params)
+        translation = self._rate_limited_call(
+            self.do_llm_translate,
+            text,
+            rate_limit_params,
+            hedge=True,
+            validate_output=validate_output,
+        )
         if not (self.ignore_cache or ignore_cache):
             self.cache.set(text, translation)
         return translation
 
+    @staticmethod
+    def _structured_cache_key(
+        text, system_instruction, response_schema, context_cache=None
+    ) -> str:
+        schema = json.dumps(response_schema, sort_keys=True, separators=(",", ":"))
+        if context_cache is not None:
+            text = f"{context_cache.contents}\n{text}"
+        return f"{system_instruction}\n{schema}\n{text}"
+
+    def llm_translate_structured(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        ignore_cache=False,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+        validate_output=None,
+    ):
+        """
+        Translate the text with the response constrained to a JSON schema.
+        :param text: text to translate
+        :param system_instruction: static instructions, sent apart from the text
+        :param response_schema: JSON schema the response must follow
+        :param context_cache: prompt prefix stored by create_context_cache, the
+            text is appended to it
+        :param validate_output: see llm_translate
+        :return: translated text
+        """
+        self.translate_call_count += 1
+        cache_key = self._structured_cache_key(
+            text, system_instruction, response_schema, context_cache
+        )
+        if not (self.ignore_cache or ignore_cache):
+            try:
+                cache = self.cache.get(cache_key)
+                if cache is not None:
+                    self.translate_cache_call_count += 1
+                    return cache
+            except Exception as e:
+                logger.debug(f"try get cache failed, ignore it: {e}")
+        translation = self._rate_limited_call(
+            lambda text, params: self.do_llm_translate_structured(
+                text, system_instruction, response_schema, params, context_cache
+            ),
+            text,
+            rate_limit_params,
+            hedge=True,
+            validate_output=validate_output,
+        )
+        if not (self.ignore_cache or ignore_cache):
+            self.cache.set(cache_key, translation)
+        return translation
+
+    async def async_llm_translate_structured(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        ignore_cache=False,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+        validate_output=None,
+    ):
+        """
+        Asynchronous version of llm_translate_structured.
+        :param text: text to translate
+        :return: translated text
+        """
+        self.translate_call_count += 1
+        cache_key = self._structured_cache_key(
+            text, system_instruction, response_schema, context_cache
+        )
+        if not (self.ignore_cache or ignore_cache):
+            try:
+                # A miss in memory queries SQLite, keep it off the event loop.
+                cache = await asyncio.to_thread(self.cache.get, cache_key)
+                if cache is not None:
+                    self.translate_cache_call_count += 1
+                    return cache
+            except Exception as e:
+                logger.debug(f"try get cache failed, ignore it: {e}")
+        translation = await self._async_rate_limited_call(
+            lambda text, params: self.do_llm_translate_structured_async(
+                text, system_instruction, response_schema, params, context_cache
+            ),
+            text,
+            rate_limit_params,
+            hedge=True,
+            validate_output=validate_output,
+        )
+        if not (self.ignore_cache or ignore_cache):
+            self.cache.set(cache_key, translation)
+        return translation
+
+    def _rate_limit_tokens(self, text, rate_limit_params: dict = None) -> int:
+        """Estimate the tokens a request spends from the TPM budget."""
+        if not _translate_rate_limiter.tpm or not text:
+            return 0
+        # The completion is about as long as the paragraphs being translated.
+        completion_tokens = (rate_limit_params or {}).get("paragraph_token_count", 0)
+        return self.count_tokens(text) + completion_tokens
+
+    @staticmethod
+    def _record_call_timing(
+        rate_limit_params: dict | None, wait_seconds: float, request_seconds: float
+    ):
+        """Report how long the successful call waited and ran to the caller.
+
+        Callers that pass ``rate_limit_params`` find the time spent waiting for
+        the rate limiter in ``rate_limit_wait_seconds`` and the duration of the
+        request itself in ``request_seconds``.
+        """
+        if rate_limit_params is not None:
+            rate_limit_params["rate_limit_wait_seconds"] = wait_seconds
+            rate_limit_params["request_seconds"] = request_seconds
+
+    def _rate_limited_call(
+        self,
+        fn,
+        text,
+        rate_limit_params: dict = None,
+        hedge: bool = False,
+        validate_output=None,
+    ):
+        tokens = self._rate_limit_tokens(text, rate_limit_params)
+        wait_seconds = 0.0
+        for attempt in itertools.count(1):
+            wait_start = time.monotonic()
+            _translate_rate_limiter.wait(tokens)
+            request_start = time.monotonic()
+            wait_seconds += request_start - wait_start
+            try:
+                if hedge:
+                    result, request_seconds = self.hedger.call(
+                        fn, text, rate_limit_params, tokens, validate_output
+                    )
+                else:
+                    result = fn(text, rate_limit_params)
+                    request_seconds = time.monotonic() - request_start
+            except RATE_LIMIT_ERRORS as e:
+                if attempt >= self.max_rate_limited_retries:
+                    raise
+                logger.warning(f"{self.name} rate limited, retry: {e}")
+                _translate_rate_limiter.on_rate_limited(getattr(e, "retry_after", None))
+                continue
+            _translate_rate_limiter.on_success()
+            if hedge:
+                self.hedger.record(request_seconds)
+            self._record_call_timing(rate_limit_params, wait_seconds, request_seconds)
+            return result
+
+    async def _async_rate_limited_call(
+        self,
+        fn,
+        text,
+        rate_limit_params: dict = None,
+        hedge: bool = False,
+        validate_output=None,
+    ):
+        tokens = self._rate_limit_tokens(text, rate_limit_params)
+        wait_seconds = 0.0
+        for attempt in itertools.count(1):
+            wait_start = time.monotonic()
+            await _translate_rate_limiter.async_wait(tokens)
+            request_start = time.monotonic()
+            wait_seconds += request_start - wait_start
+            try:
+                if hedge:
+                    result, request_seconds = await self.hedger.async_call(
+                        fn, text, rate_limit_params, tokens, validate_output
+                    )
+                else:
+                    result = await fn(text, rate_limit_params)
+                    request_seconds = time.monotonic() - request_start
+            except RATE_LIMIT_ERRORS as e:
+                if attempt >= self.max_rate_limited_retries:
+                    raise
+                logger.warning(f"{self.name} rate limited, retry: {e}")
+                _translate_rate_limiter.on_rate_limited(getattr(e, "retry_after", None))
+                continue
+            _translate_rate_limiter.on_success()
+            if hedge:
+                self.hedger.record(request_seconds)
+            self._record_call_timing(rate_limit_params, wait_seconds, request_seconds)
+            return result
+
+    async def async_llm_translate(
+        self,
+        text,
+        ignore_cache=False,
+        rate_limit_params: dict = None,
+        validate_output=None,
+    ):
+        """
+        Asynchronous version of llm_translate.
+        :param text: text to translate
+        :return: translated text
+        """
+        self.translate_call_count += 1
+        if not (self.ignore_cache or ignore_cache):
+            try:
+                # A miss in memory queries SQLite, keep it off the event loop.
+                cache = await asyncio.to_thread(self.cache.get, text)
+                if cache is not None:
+                    self.translate_cache_call_count += 1
+                    return cache
+            except Exception as e:
+                logger.debug(f"try get cache failed, ignore it: {e}")
+        translation = await self._async_rate_limited_call(
+            self.do_llm_translate_async,
+            text,
+            rate_limit_params,
+            hedge=True,
+            validate_output=validate_output,
+        )
+        if not (self.ignore_cache or ignore_cache):
+            self.cache.set(text, translation)
+        return translation
+
+    @property
+    def event_loop(self):
+        """The event loop async llm translations of this translator run on."""
+        return get_background_loop()
+
+    async def do_llm_translate_async(self, text, rate_limit_params: dict = None):
+        """
+        Actual translate text asynchronously, override this method.
+        The default implementation runs do_llm_translate in a worker thread.
+        :param text: text to translate
+        :return: translated text
+        """
+        return await asyncio.to_thread(self.do_llm_translate, text, rate_limit_params)
+
+    def do_llm_translate_structured(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+    ):
+        """
+        Actual structured translate, override this method together with
+        supports_structured_output.
+        :param text: text to translate
+        :return: JSON text following response_schema
+        """
+        raise NotImplementedError
+
+    async def do_llm_translate_structured_async(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+    ):
+        """
+        Asynchronous version of do_llm_translate_structured.
+        The default implementation runs it in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.do_llm_translate_structured,
+            text,
+            system_instruction,
+            response_schema,
+            rate_limit_params,
+            context_cache,
+        )
+
+    def create_context_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> ContextCache:
+        """
+        Store a prompt prefix for structured requests, override this method
+        together with supports_context_cache.
+        :param system_instruction: system instruction of the requests
+        :param contents: start of the text of the requests
+        :param ttl_seconds: how long the service keeps it
+        """
+        raise NotImplementedError
+
+    def refresh_context_cache(self, context_cache: ContextCache, ttl_seconds: int):
+        """Extend the lifetime of a context cache to ttl_seconds from now."""
+        raise NotImplementedError
+
+    def delete_context_cache(self, context_cache: ContextCache):
+        raise NotImplementedError
+
     @abstractmethod
     def do_llm_translate(self, text, rate_limit_params: dict = None):
         """
@@ -185,6 +853,13 @@ class BaseTranslator(ABC):
     def __str__(self):
         return f"{self.name} {self.lang_in} {self.lang_out} {self.model}"
 
+    def count_tokens(self, text: str) -> int:
+        """Count tokens locally. Used for batch sizing, never hits the network."""
+        return get_tokenizer().count_tokens(text)
+
+    def count_tokens_many(self, texts: list[str]) -> list[int]:
+        return get_tokenizer().count_tokens_many(texts)
+
     def get_rich_text_left_placeholder(self, placeholder_id: int):
         return f"<b{placeholder_id}>"
 
@@ -210,7 +885,7 @@ class OpenAITranslator(BaseTranslator):
     ):
         super().__init__(lang_in, lang_out, ignore_cache)
         self.options = {"temperature": 0}  # 随机采样可能会打断公式标记
-        self.model = model # self.model 초기화
+        self.model = model  # self.model 초기화
         self.client = genai.GenerativeModel(self.model)
         self.add_cache_impact_parameters("temperature", self.options["temperature"])
         self.model = model
@@ -220,12 +895,6 @@ class OpenAITranslator(BaseTranslator):
         self.prompt_token_count = AtomicInteger()
         self.completion_token_count = AtomicInteger()
 
-    @retry(
-        retry=retry_if_exception_type(google_exceptions.ResourceExhausted),
-        stop=stop_after_attempt(100),
-        wait=wait_exponential(multiplier=1, min=1, max=15),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
-    )
     def do_translate(self, text, rate_limit_params: dict = None) -> str:
         response = self.client.chat.completions.create(
             model=self.model,
@@ -247,18 +916,17 @@ class OpenAITranslator(BaseTranslator):
             },
         ]
 
-    @retry(
-        retry=retry_if_exception_type(google_exceptions.ResourceExhausted),
-        stop=stop_after_attempt(100),
-        wait=wait_exponential(multiplier=1, min=1, max=15),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
-    )
     def do_llm_translate(self, text, rate_limit_params: dict = None):
         if text is None:
             return None
 
         response = self.client.generate_content(text)
         self.update_token_count(response)
+        with contextlib.suppress(AttributeError, IndexError):
+            if response.candidates[0].finish_reason.name == "MAX_TOKENS":
+                raise LLMOutputTruncatedError(
+                    f"{self.model} stopped at its output token limit"
+                )
         return response.text
 
     def update_token_count(self, response):
@@ -286,5 +954,325 @@ class OpenAITranslator(BaseTranslator):
             f"<\\s*style\\s*id\\s*=\\s*'\\s*{placeholder_id}\\s*'\\s*>",
         )
 
-    def count_tokens(self, text: str) -> int:
+    def count_tokens_remote(self, text: str) -> int:
+        """Count tokens with the Gemini API. Only used to calibrate the local tokenizer."""
         return self.client.count_tokens(text).total_tokens
+
+
+GEMINI_API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# Smallest prompt prefix accepted for context caching by model name prefix,
+# the first match wins.
+GEMINI_MIN_CONTEXT_CACHE_TOKENS = (
+    ("gemini-2.5-pro", 4096),
+    ("gemini-2.5", 1024),
+    ("gemini-2.0", 4096),
+    ("gemini-1.5", 32768),
+)
+
+# Output token limits by model name prefix, the first match wins.
+GEMINI_MAX_OUTPUT_TOKENS = (
+    ("gemini-2.5", 65536),
+    ("gemini-2.0", 8192),
+    ("gemini-1.5", 8192),
+)
+
+# Errors worth retrying right away: transient server errors and dropped
+# connections. Rate limit errors are left to the rate limiter.
+_GEMINI_RETRYABLE_ERRORS = (
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    httpx.TransportError,
+)
+
+
+class GeminiTranslator(BaseTranslator):
+    """Translator talking to the Gemini REST API directly.
+
+    Requests are issued from the background event loop through one pooled
+    ``httpx.AsyncClient``, so many batches can be in flight at once without a
+    thread per request. The synchronous methods submit to the same loop.
+    """
+
+    name = "gemini"
+    supports_async_llm_translate = True
+    supports_structured_output = True
+    supports_context_cache = True
+
+    def __init__(
+        self,
+        lang_in,
+        lang_out,
+        model,
+        api_key=None,
+        base_url=None,
+        ignore_cache=False,
+        max_concurrent_requests=256,
+        timeout=120.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        super().__init__(lang_in, lang_out, ignore_cache)
+        self.options = {"temperature": 0}  # 随机采样可能会打断公式标记
+        self.model = model
+        self.api_key = (
+            api_key
+            or os.environ.get("GEMINI_API_KEY")
+            or os.environ.get("GOOGLE_API_KEY")
+        )
+        if not self.api_key:
+            raise ValueError("Gemini API key is required")
+        self.base_url = (base_url or GEMINI_API_BASE_URL).rstrip("/")
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_output_tokens = next(
+            (
+                limit
+                for prefix, limit in GEMINI_MAX_OUTPUT_TOKENS
+                if self.model.startswith(prefix)
+            ),
+            BaseTranslator.max_output_tokens,
+        )
+        self.min_context_cache_tokens = next(
+            (
+                limit
+                for prefix, limit in GEMINI_MIN_CONTEXT_CACHE_TOKENS
+                if self.model.startswith(prefix)
+            ),
+            4096,
+        )
+        self.timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self.add_cache_impact_parameters("temperature", self.options["temperature"])
+        self.add_cache_impact_parameters("model", self.model)
+        self.add_cache_impact_parameters("prompt", self.prompt(""))
+        self.token_count = AtomicInteger()
+        self.prompt_token_count = AtomicInteger()
+        self.completion_token_count = AtomicInteger()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only ever called on the event loop thread, no locking needed.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-goog-api-key": self.api_key},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrent_requests,
+                    max_keepalive_connections=self.max_concurrent_requests,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        self.event_loop.run(self.aclose())
+
+    @retry(
+        retry=retry_if_exception_type(_GEMINI_RETRYABLE_ERRORS),
+        # Keep this short: persistent failures are handled by the batch
+        # fallback of the caller rather than by retrying for minutes here.
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=1, min=1, max=15),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )
+    async def _request(self, http_method: str, path: str, body: dict = None) -> dict:
+        response = await self._get_client().request(http_method, path, json=body)
+        if response.is_error:
+            try:
+                error = response.json()["error"]
+                message = error["message"]
+            except Exception:
+                error = {}
+                message = response.text
+            exc = google_exceptions.from_http_status(response.status_code, message)
+            exc.retry_after = self._parse_retry_after(response, error)
+            raise exc
+        return response.json() if response.content else {}
+
+    async def _post(self, method: str, body: dict) -> dict:
+        return await self._request("POST", f"/models/{self.model}:{method}", body)
+
+    @staticmethod
+    def _parse_retry_after(response: httpx.Response, error: dict) -> float | None:
+        """Read the retry delay from a google.rpc.RetryInfo detail or the Retry-After header."""
+        for detail in error.get("details") or []:
+            delay = detail.get("retryDelay")
+            if isinstance(delay, str) and delay.endswith("s"):
+                with contextlib.suppress(ValueError):
+                    return float(delay[:-1])
+        with contextlib.suppress(TypeError, ValueError):
+            return float(response.headers.get("retry-after"))
+        return None
+
+    async def generate_content(
+        self,
+        text: str,
+        system_instruction: str = None,
+        response_schema: dict = None,
+        cached_content: str = None,
+    ):
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": text}]}],
+            "generationConfig": dict(self.options),
+        }
+        if cached_content:
+            # The system instruction is part of the cached content.
+            body["cachedContent"] = cached_content
+        elif system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        if response_schema:
+            body["generationConfig"]["responseMimeType"] = "application/json"
+            body["generationConfig"]["responseSchema"] = response_schema
+        try:
+            response = await self._post("generateContent", body)
+        except (google_exceptions.NotFound, google_exceptions.Forbidden) as e:
+            if cached_content:
+                raise ContextCacheUnavailableError(
+                    f"{cached_content} is not available: {e}"
+                ) from e
+            raise
+        self.update_token_count(response)
+        candidates = response.get("candidates") or []
+        if not candidates:
+            raise ValueError(
+                f"Gemini returned no candidates: {response.get('promptFeedback')}"
+            )
+        if candidates[0].get("finishReason") == "MAX_TOKENS":
+            raise LLMOutputTruncatedError(
+                f"{self.model} stopped at its output token limit"
+            )
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    def do_translate(self, text, rate_limit_params: dict = None) -> str:
+        system_prompt, user_prompt = (m["content"] for m in self.prompt(text))
+        response = self.event_loop.run(
+            self.generate_content(user_prompt, system_instruction=system_prompt)
+        )
+        return response.strip()
+
+    def prompt(self, text):
+        return [
+            {
+                "role": "system",
+                "content": "You are a professional,authentic machine translation engine.",
+            },
+            {
+                "role": "user",
+                "content": f";; Treat next line as plain text input and translate it into {self.lang_out}, output translation ONLY. If translation is unnecessary (e.g. proper nouns, codes, {'{{1}}, etc. '}), return the original text. NO explanations. NO notes. Input:\n\n{text}",
+            },
+        ]
+
+    def do_llm_translate(self, text, rate_limit_params: dict = None):
+        if text is None:
+            return None
+        return self.event_loop.run(self.do_llm_translate_async(text, rate_limit_params))
+
+    async def do_llm_translate_async(self, text, rate_limit_params: dict = None):
+        if text is None:
+            return None
+        return await self.generate_content(text)
+
+    def do_llm_translate_structured(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+    ):
+        return self.event_loop.run(
+            self.do_llm_translate_structured_async(
+                text,
+                system_instruction,
+                response_schema,
+                rate_limit_params,
+                context_cache,
+            )
+        )
+
+    async def do_llm_translate_structured_async(
+        self,
+        text,
+        system_instruction: str,
+        response_schema: dict,
+        rate_limit_params: dict = None,
+        context_cache: ContextCache | None = None,
+    ):
+        return await self.generate_content(
+            text,
+            system_instruction=system_instruction,
+            response_schema=response_schema,
+            cached_content=context_cache.name if context_cache else None,
+        )
+
+    def create_context_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> ContextCache:
+        response = self.event_loop.run(
+            self._request(
+                "POST",
+                "/cachedContents",
+                {
+                    "model": f"models/{self.model}",
+                    "systemInstruction": {"parts": [{"text": system_instruction}]},
+                    "contents": [{"role": "user", "parts": [{"text": contents}]}],
+                    "ttl": f"{ttl_seconds}s",
+                },
+            )
+        )
+        return ContextCache(response["name"], system_instruction, contents, ttl_seconds)
+
+    def refresh_context_cache(self, context_cache: ContextCache, ttl_seconds: int):
+        self.event_loop.run(
+            self._request(
+                "PATCH",
+                f"/{context_cache.name}?updateMask=ttl",
+                {"ttl": f"{ttl_seconds}s"},
+            )
+        )
+        context_cache.expire_time = time.monotonic() + ttl_seconds
+
+    def delete_context_cache(self, context_cache: ContextCache):
+        self.event_loop.run(self._request("DELETE", f"/{context_cache.name}"))
+
+    def update_token_count(self, response: dict):
+        try:
+            usage = response.get("usageMetadata") or {}
+            prompt_tokens = usage.get("promptTokenCount", 0)
+            completion_tokens = usage.get("candidatesTokenCount", 0)
+            total_tokens = usage.get(
+                "totalTokenCount", prompt_tokens + completion_tokens
+            )
+
+            self.token_count.inc(total_tokens)
+            self.prompt_token_count.inc(prompt_tokens)
+            self.completion_token_count.inc(completion_tokens)
+        except Exception:
+            logger.exception("Error updating token count")
+
+    def get_formular_placeholder(self, placeholder_id: int):
+        return "{v" + str(placeholder_id) + "}", f"{{\\s*v\\s*{placeholder_id}\\s*}}"
+
+    def get_rich_text_left_placeholder(self, placeholder_id: int):
+        return (
+            f"<style id='{placeholder_id}'>",
+            f"<\\s*style\\s*id\\s*=\\s*'\\s*{placeholder_id}\\s*'\\s*>",
+        )
+
+    def count_tokens_remote(self, text: str) -> int:
+        """Count tokens with the Gemini API. Only used to calibrate the local tokenizer."""
+        response = self.event_loop.run(
+            self._post(
+                "countTokens",
+                {"contents": [{"role": "user", "parts": [{"text": text}]}]},
+            )
+        )
+        return response["totalTokens"]
@@ -0,0 +1,43 @@
+import onnx
+import pytest
+from onnx import TensorProto
+from onnx import helper
+
+
+def _write_layout_model(path, batch_dim):
+    """A stand-in layout model emitting one box per image filled with its mean."""
+    graph = helper.make_graph(
+        [
+            helper.make_node(
+                "ReduceMean", ["images"], ["mean"], axes=[1, 2, 3], keepdims=1
+            ),
+            helper.make_node("Reshape", ["mean", "shape"], ["mean3"]),
+            helper.make_node("Expand", ["mean3", "expand"], ["output0"]),
+        ],
+        "fake_doclayout",
+        [
+            helper.make_tensor_value_info(
+                "images", TensorProto.FLOAT, [batch_dim, 3, "h", "w"]
+            )
+        ],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, None)],
+        initializer=[
+            helper.make_tensor("shape", TensorProto.INT64, [3], [-1, 1, 1]),
+            helper.make_tensor("expand", TensorProto.INT64, [3], [1, 1, 6]),
+        ],
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8
+    )
+    for key, value in (("stride", "32"), ("names", "{0: 'text'}")):
+        entry = model.metadata_props.add()
+        entry.key = key
+        entry.value = value
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def write_layout_model():
+    """Writes a stand-in ONNX layout model, see :func:`_write_layout_model`."""
+    return _write_layout_model
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from babeldoc.assets import assets
+
+
+def _setup(monkeypatch, tmp_path):
+    manifest = assets.VerifiedAssetManifest(tmp_path / "verified_assets.json")
+    monkeypatch.setattr(assets, "verified_asset_manifest", manifest)
+    hashed = []
+    hash_file = assets._hash_file
+
+    def counting_hash_file(path):
+        hashed.append(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(assets, "_hash_file", counting_hash_file)
+    asset = tmp_path / "font.ttf"
+    asset.write_bytes(b"font data")
+    return asset, hashlib.sha3_256(b"font data").hexdigest(), hashed
+
+
+class TestVerifiedAssetManifest:
+    def test_unchanged_file_is_hashed_once(self, monkeypatch, tmp_path):
+        asset, digest, hashed = _setup(monkeypatch, tmp_path)
+        assert assets.verify_file(asset, digest)
+        assert assets.verify_file(asset, digest)
+        assert len(hashed) == 1
+
+        # the manifest survives a restart
+        reloaded = assets.VerifiedAssetManifest(tmp_path / "verified_assets.json")
+        assert reloaded.is_verified(asset, digest)
+        assert not reloaded.is_verified(asset, "other digest")
+
+    def test_changed_file_is_rehashed(self, monkeypatch, tmp_path):
+        asset, digest, hashed = _setup(monkeypatch, tmp_path)
+        assert assets.verify_file(asset, digest)
+        asset.write_bytes(b"corrupted!")
+        assert not assets.verify_file(asset, digest)
+        assert len(hashed) == 2
+        assert assets.verified_asset_manifest.entries() == []
+
+    def test_reverify_finds_corruption_with_same_stamp(self, monkeypatch, tmp_path):
+        asset, digest, _ = _setup(monkeypatch, tmp_path)
+        assert assets.verify_file(asset, digest)
+        st = asset.stat()
+        asset.write_bytes(b"font DATA")
+        os.utime(asset, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert assets.verify_file(asset, digest)
+        assert assets.reverify_assets() == [asset]
+        assert not assets.verify_file(asset, digest)
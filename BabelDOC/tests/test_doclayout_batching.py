@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from babeldoc.docvision import model_registry
+from babeldoc.docvision.doclayout import OnnxModel
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    """Keep optimized models written by OnnxModel out of the real cache folder."""
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr(
+        model_registry,
+        "get_cache_file_path",
+        lambda filename, _sub_folder=None: cache_dir / filename,
+    )
+    return cache_dir
+
+
+def _boxes(result):
+    return np.array([[*box.xyxy, box.conf] for box in result.boxes])
+
+
+class _FakePage:
+    def __init__(self, page_number):
+        self.page_number = page_number
+
+
+class _FakeRasterCache:
+    def __init__(self, images):
+        self.images = images
+
+    def get_image(self, page_number, dpi=72):
+        return self.images[page_number]
+
+
+class _FakeConfig:
+    def __init__(self, images):
+        self.raster_cache = _FakeRasterCache(images)
+
+    def raise_if_cancelled(self):
+        pass
+
+    def get_page_raster_cache(self, mupdf_doc):
+        return self.raster_cache
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    shapes = [(800, 600), (600, 800), (800, 600), (800, 600), (600, 800)]
+    return [rng.integers(100, 255, size=(h, w, 3), dtype=np.uint8) for h, w in shapes]
+
+
+class TestOnnxModelBatching:
+    def test_batched_matches_single(self, tmp_path, write_layout_model):
+        model = OnnxModel(
+            write_layout_model(tmp_path / "m.onnx", "batch"), batch_size=4
+        )
+        assert model.supports_batching
+        images = _images()
+        batched = model.predict(images)
+        single = [model.predict(image)[0] for image in images]
+        assert len(batched) == len(images)
+        for a, b in zip(batched, single, strict=True):
+            np.testing.assert_allclose(_boxes(a), _boxes(b), rtol=1e-5)
+
+    def test_fixed_batch_dimension_runs_one_by_one(self, tmp_path, write_layout_model):
+        model = OnnxModel(write_layout_model(tmp_path / "m.onnx", 1), batch_size=4)
+        assert not model.supports_batching
+        assert len(model.predict(_images())) == 5
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 8])
+    def test_handle_document_keeps_page_order(
+        self, tmp_path, batch_size, write_layout_model
+    ):
+        model = OnnxModel(
+            write_layout_model(tmp_path / "m.onnx", "batch"),
+            batch_size=batch_size,
+            intra_op_num_threads=1,
+            inter_op_num_threads=1,
+        )
+        images = _images()
+        pages = [_FakePage(i) for i in range(len(images))]
+        debug_pages = []
+        results = list(
+            model.handle_document(
+                pages,
+                None,
+                _FakeConfig(images),
+                lambda _image, _result, page_number: debug_pages.append(page_number),
+            )
+        )
+        assert [page for page, _ in results] == pages
+        assert debug_pages == [1, 2, 3, 4, 5]
+        expected = model.predict(images)
+        for (_, result), ref in zip(results, expected, strict=True):
+            np.testing.assert_allclose(_boxes(result), _boxes(ref), rtol=1e-5)
+
+
+class TestModelRegistry:
+    def test_loads_each_key_once(self):
+        registry = model_registry.ModelRegistry()
+        loads = []
+        first = registry.get(("a",), lambda: loads.append("a") or object())
+        assert registry.get(("a",), lambda: loads.append("a") or object()) is first
+        assert registry.get(("b",), lambda: loads.append("b") or object()) is not first
+        assert loads == ["a", "b"]
+        registry.clear()
+        assert registry.get(("a",), object) is not first
+
+
+class TestOptimizedModelCache:
+    def test_optimized_model_is_saved_and_reused(
+        self, tmp_path, cache_dir, write_layout_model
+    ):
+        path = write_layout_model(tmp_path / "layout.onnx", "batch")
+        model = OnnxModel(path)
+        (cached,) = cache_dir.iterdir()
+        mtime = cached.stat().st_mtime_ns
+
+        reloaded = OnnxModel(path)
+        assert list(cache_dir.iterdir()) == [cached]
+        assert cached.stat().st_mtime_ns == mtime
+        assert reloaded.stride == model.stride
+        assert reloaded._names == {0: "text"}
+        image = np.full((64, 48, 3), 100, np.uint8)
+        assert len(reloaded.predict(image, 64)[0].boxes) == 1
+
+    def test_corrupt_optimized_model_falls_back(
+        self, tmp_path, cache_dir, write_layout_model
+    ):
+        path = write_layout_model(tmp_path / "layout.onnx", "batch")
+        OnnxModel(path)
+        (cached,) = cache_dir.iterdir()
+        cached.write_bytes(b"not a model")
+
+        model = OnnxModel(path)
+        assert model._names == {0: "text"}
+        assert not cached.exists()
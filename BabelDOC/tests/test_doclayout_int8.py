@@ -0,0 +1,40 @@
+from babeldoc.assets import assets
+
+
+class TestDoclayoutInt8Model:
+    def test_quantized_once_and_verified(
+        self, monkeypatch, tmp_path, write_layout_model
+    ):
+        manifest = assets.VerifiedAssetManifest(tmp_path / "verified_assets.json")
+        monkeypatch.setattr(assets, "verified_asset_manifest", manifest)
+        fp32_path = write_layout_model(tmp_path / "fp32.onnx", "batch")
+
+        async def get_fp32_path(_client=None):
+            return fp32_path
+
+        quantized = []
+        quantize = assets._quantize_onnx_model
+
+        def counting_quantize(model_path, output_path):
+            quantized.append(model_path)
+            quantize(model_path, output_path)
+
+        monkeypatch.setattr(
+            assets,
+            "get_cache_file_path",
+            lambda filename, _sub_folder=None: tmp_path / filename,
+        )
+        monkeypatch.setattr(
+            assets, "get_doclayout_onnx_model_path_async", get_fp32_path
+        )
+        monkeypatch.setattr(assets, "_quantize_onnx_model", counting_quantize)
+
+        path = assets.get_doclayout_int8_onnx_model_path()
+        assert assets.get_doclayout_int8_onnx_model_path() == path
+        assert len(quantized) == 1
+        sha3_256 = path.with_name(f"{path.name}.sha3_256").read_text()
+        assert assets.verified_asset_manifest.is_verified(path, sha3_256)
+
+        path.write_bytes(b"corrupted")
+        assert assets.get_doclayout_int8_onnx_model_path() == path
+        assert len(quantized) == 2
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pymupdf
+from babeldoc.format.pdf.document_il.utils import fontmap
+
+
+def _patch_assets(monkeypatch, tmp_path, loads):
+    font_path = tmp_path / "helv.ttf"
+    font_path.write_bytes(pymupdf.Font("helv").buffer)
+    family = {
+        "normal": ["normal.ttf", "serif.ttf"],
+        "script": ["normal.ttf"],
+        "fallback": ["fallback.ttf"],
+        "base": ["normal.ttf"],
+    }
+
+    def get_font_and_metadata(font_file_name):
+        loads.append(font_file_name)
+        return font_path, {"ascent": 718, "descent": -207, "encoding_length": 2}
+
+    monkeypatch.setattr(fontmap.assets, "get_font_family", lambda _lang: family)
+    monkeypatch.setattr(fontmap.assets, "get_font_and_metadata", get_font_and_metadata)
+
+
+class TestFontRegistry:
+    def test_font_mappers_share_fonts(self, monkeypatch, tmp_path):
+        loads = []
+        _patch_assets(monkeypatch, tmp_path, loads)
+        registry = fontmap.FontRegistry()
+        monkeypatch.setattr(fontmap, "font_registry", registry)
+        config = SimpleNamespace(lang_out="en", primary_font_family=None)
+
+        first = fontmap.FontMapper(config)
+        second = fontmap.FontMapper(config)
+
+        assert sorted(loads) == ["fallback.ttf", "normal.ttf", "serif.ttf"]
+        assert first.base_font is second.base_font
+        assert first.fontid2font["base"] is first.fontid2font["normal.ttf"]
+        assert first.has_char("A") and second.has_char("A")
+        assert not first.has_char("中")
+        assert first.map_in_type is second.map_in_type
+        assert first.base_font.ascent_fontmap == 718
+
+        registry.clear()
+        fontmap.FontMapper(config)
+        assert len(loads) == 6
+
+
+class TestGlyphCoverage:
+    def test_matches_has_glyph_and_persists(self, tmp_path):
+        font = pymupdf.Font("helv")
+        cache_path = tmp_path / "helv.coverage"
+        coverage = fontmap.GlyphCoverage.for_font(font, cache_path)
+        assert cache_path.exists()
+        for codepoint in [*range(0x3000), 0x4E2D, -1, 0x110000]:
+            expected = codepoint >= 0 and bool(font.has_glyph(codepoint))
+            assert (codepoint in coverage) == expected
+        assert fontmap.GlyphCoverage.for_font(None, cache_path)._bytes == (
+            coverage._bytes
+        )
+        assert coverage.contains_many([65, 0x4E2D, -5]).tolist() == [
+            True,
+            False,
+            False,
+        ]
+
+    def test_map_many_matches_per_type_lookup(self, monkeypatch, tmp_path):
+        _patch_assets(monkeypatch, tmp_path, [])
+        monkeypatch.setattr(fontmap, "font_registry", fontmap.FontRegistry())
+        mapper = fontmap.FontMapper(
+            SimpleNamespace(lang_out="en", primary_font_family=None)
+        )
+
+        def reference(flags, char):
+            # script, normal and fallback fonts by style, then any covering font
+            for font_type in ("script", "normal", "fallback"):
+                font = mapper.map_in_type(*flags, char, font_type)
+                if font is not None:
+                    return font
+                if font_type == "script" and flags[1]:
+                    for font in mapper.script_fonts:
+                        if ord(char) in font.coverage:
+                            return font
+            for font in mapper.fallback_fonts:
+                if ord(char) in font.coverage:
+                    return font
+            return None
+
+        chars = "Hello, 中"
+        for bold in (False, True):
+            for italic in (False, True):
+                for serif in (False, True):
+                    original_font = fontmap.PdfFont(
+                        bold=bold, italic=italic, monospace=False, serif=serif
+                    )
+                    flags = (bold, italic, False, serif)
+                    assert mapper.map_many(chars, original_font) == [
+                        reference(flags, c) for c in chars
+                    ]
+        original_font = pymupdf.Font("helv")
+        original_font.font_id = "F1"
+        assert mapper.map(original_font, "中") is None
+        assert mapper.map(original_font, "A") is mapper.fontid2font["normal.ttf"]
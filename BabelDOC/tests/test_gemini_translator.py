@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import (
+    ContextCacheKeeper,
+)
+from babeldoc.translator.translator import ContextCacheUnavailableError
+from babeldoc.translator.translator import GeminiTranslator
+from babeldoc.translator.translator import LLMOutputTruncatedError
+
+
+def _gemini_response(text):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+        "usageMetadata": {
+            "promptTokenCount": 7,
+            "candidatesTokenCount": 3,
+            "totalTokenCount": 10,
+        },
+    }
+
+
+class LocalGeminiService:
+    """Stand-in for the cachedContents and generateContent endpoints."""
+
+    def __init__(self):
+        self.cached_contents = {}
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        body = json.loads(request.content) if request.content else {}
+        path = request.url.path.removeprefix("/v1beta/")
+        if path == "cachedContents":
+            name = f"cachedContents/{len(self.requests)}"
+            self.cached_contents[name] = body
+            return httpx.Response(200, json={"name": name, "ttl": body["ttl"]})
+        if path.startswith("cachedContents/"):
+            if path not in self.cached_contents:
+                return httpx.Response(404, json={"error": {"message": "not found"}})
+            if request.method == "DELETE":
+                del self.cached_contents[path]
+            else:
+                self.cached_contents[path]["ttl"] = body["ttl"]
+            return httpx.Response(200, json={})
+        prompt = body["contents"][0]["parts"][0]["text"]
+        if "cachedContent" in body:
+            cached = self.cached_contents.get(body["cachedContent"])
+            if cached is None:
+                return httpx.Response(
+                    403, json={"error": {"message": "CachedContent not found"}}
+                )
+            prompt = cached["contents"][0]["parts"][0]["text"] + prompt
+        return httpx.Response(200, json=_gemini_response(prompt.upper()))
+
+
+class TestGeminiTranslator:
+    def _translator(self, handler):
+        return GeminiTranslator(
+            "en",
+            "ko",
+            model="gemini-test",
+            api_key="test-key",
+            ignore_cache=True,
+            transport=httpx.MockTransport(handler),
+        )
+
+    def test_llm_translate_sync_and_async(self):
+        requests = []
+
+        def handler(request: httpx.Request):
+            requests.append(request)
+            body = json.loads(request.content)
+            text = body["contents"][0]["parts"][0]["text"]
+            return httpx.Response(200, json=_gemini_response(text.upper()))
+
+        translator = self._translator(handler)
+        assert translator.llm_translate("hello") == "HELLO"
+
+        async def translate_many():
+            return await asyncio.gather(
+                *(translator.async_llm_translate(f"text {i}") for i in range(8))
+            )
+
+        results = translator.event_loop.run(translate_many())
+        assert results == [f"TEXT {i}" for i in range(8)]
+        assert translator.token_count.value == 90
+        assert translator.prompt_token_count.value == 63
+        assert requests[0].url.path == "/v1beta/models/gemini-test:generateContent"
+        assert requests[0].headers["x-goog-api-key"] == "test-key"
+        translator.close()
+
+    def test_probe_and_count_tokens_remote(self):
+        def handler(request: httpx.Request):
+            assert request.url.path.endswith(":countTokens")
+            return httpx.Response(200, json={"totalTokens": 42})
+
+        translator = self._translator(handler)
+        assert translator.do_llm_translate(None) is None
+        assert translator.count_tokens_remote("some text") == 42
+
+    def test_truncated_response_and_call_timing(self):
+        def handler(_request: httpx.Request):
+            response = _gemini_response('[{"id": 0, "output": "cut')
+            response["candidates"][0]["finishReason"] = "MAX_TOKENS"
+            return httpx.Response(200, json=response)
+
+        translator = self._translator(handler)
+        assert translator.max_output_tokens == 8192
+        rate_limit_params = {}
+        with pytest.raises(LLMOutputTruncatedError):
+            translator.llm_translate("hello", rate_limit_params=rate_limit_params)
+        assert "request_seconds" not in rate_limit_params
+
+        ok = self._translator(
+            lambda _request: httpx.Response(200, json=_gemini_response("ok"))
+        )
+        assert ok.llm_translate("hello", rate_limit_params=rate_limit_params) == "ok"
+        assert rate_limit_params["request_seconds"] >= 0
+        assert rate_limit_params["rate_limit_wait_seconds"] >= 0
+        translator.close()
+        ok.close()
+
+    def test_structured_output_request(self):
+        bodies = []
+
+        def handler(request: httpx.Request):
+            bodies.append(json.loads(request.content))
+            return httpx.Response(
+                200, json=_gemini_response('[{"id":0,"output":"안녕"}]')
+            )
+
+        translator = self._translator(handler)
+        assert translator.supports_structured_output
+        schema = {"type": "ARRAY", "items": {"type": "STRING"}}
+        output = translator.llm_translate_structured(
+            '[{"id":0,"input":"hello"}]', "Translate into ko.", schema
+        )
+        assert json.loads(output) == [{"id": 0, "output": "안녕"}]
+        output = translator.event_loop.run(
+            translator.async_llm_translate_structured("x", "Rules", schema)
+        )
+        body = bodies[0]
+        assert body["systemInstruction"] == {"parts": [{"text": "Translate into ko."}]}
+        assert body["generationConfig"]["responseMimeType"] == "application/json"
+        assert body["generationConfig"]["responseSchema"] == schema
+        assert bodies[1]["contents"][0]["parts"][0]["text"] == "x"
+        translator.close()
+
+    def test_context_cache(self):
+        service = LocalGeminiService()
+        translator = self._translator(service)
+        context_cache = translator.create_context_cache("Rules", "glossary ", 600)
+        cached = service.cached_contents[context_cache.name]
+        assert cached["model"] == "models/gemini-test"
+        assert cached["ttl"] == "600s"
+
+        output = translator.llm_translate_structured(
+            "text", "Rules", {}, context_cache=context_cache
+        )
+        assert output == "GLOSSARY TEXT"
+        body = json.loads(service.requests[-1].content)
+        assert body["cachedContent"] == context_cache.name
+        assert "systemInstruction" not in body
+
+        translator.refresh_context_cache(context_cache, 300)
+        assert cached["ttl"] == "300s"
+        translator.delete_context_cache(context_cache)
+        with pytest.raises(ContextCacheUnavailableError):
+            translator.llm_translate_structured(
+                "more", "Rules", {}, context_cache=context_cache
+            )
+        translator.close()
+
+    def test_context_cache_keeper(self):
+        service = LocalGeminiService()
+        translator = self._translator(service)
+        context_cache = translator.create_context_cache("Rules", "glossary", 600)
+        keeper = ContextCacheKeeper(translator, context_cache, ttl_seconds=0.3)
+        while not any(r.method == "PATCH" for r in service.requests):
+            time.sleep(0.05)
+        keeper.close()
+        assert keeper.context_cache is None
+        assert service.cached_contents == {}
+        translator.close()
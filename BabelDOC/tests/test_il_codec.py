@@ -0,0 +1,73 @@
+import pickle
+
+from babeldoc.format.pdf.document_il import il_version_1
+from babeldoc.format.pdf.document_il.utils import il_codec
+
+
+def _style():
+    return il_version_1.PdfStyle(
+        font_id="F1",
+        font_size=10.5,
+        graphic_state=il_version_1.GraphicState(passthrough_per_char_instruction="0 g"),
+    )
+
+
+def _chars(num_chars):
+    return [
+        il_version_1.PdfCharacter(
+            pdf_style=_style(),
+            box=il_version_1.Box(i * 6.0, 700.0, i * 6.0 + 5.5, 710.5),
+            char_unicode="abcdefghij"[i % 10],
+            pdf_character_id=i,
+            advance=5.5,
+        )
+        for i in range(num_chars)
+    ]
+
+
+def _page(num_chars=12):
+    style = _style()
+    paragraph = il_version_1.PdfParagraph(
+        box=il_version_1.Box(0, 690, 200, 712),
+        pdf_style=style,
+        pdf_paragraph_composition=[
+            il_version_1.PdfParagraphComposition(
+                pdf_line=il_version_1.PdfLine(pdf_character=_chars(num_chars))
+            ),
+            il_version_1.PdfParagraphComposition(
+                pdf_same_style_unicode_characters=il_version_1.PdfSameStyleUnicodeCharacters(
+                    unicode="안녕하세요", pdf_style=style
+                )
+            ),
+        ],
+        unicode="Hello, world",
+        optimal_scale=0.85,
+        debug_id="abc",
+    )
+    return il_version_1.Page(
+        cropbox=il_version_1.Cropbox(box=il_version_1.Box(0, 0, 595, 842)),
+        pdf_font=[
+            il_version_1.PdfFont(
+                font_id="F1",
+                name="Helvetica",
+                pdf_font_char_bounding_box=[
+                    il_version_1.PdfFontCharBoundingBox(x=0, y=0, x2=1, y2=1, char_id=1)
+                ],
+            )
+        ],
+        pdf_paragraph=[paragraph],
+        pdf_character=_chars(num_chars),
+        page_number=3,
+    )
+
+
+class TestILCodec:
+    def test_roundtrip(self):
+        page = _page()
+        decoded = il_codec.loads(il_version_1.Page, il_codec.dumps(page))
+        assert decoded == page
+        assert decoded.pdf_paragraph[0].pdf_paragraph_composition[0].pdf_line
+
+    def test_smaller_than_pickle(self):
+        page = _page(num_chars=500)
+        assert len(il_codec.dumps(page)) < len(pickle.dumps(page)) / 2
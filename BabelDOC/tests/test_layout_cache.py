@@ -0,0 +1,173 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pymupdf
+from babeldoc.docvision import layout_cache
+from babeldoc.docvision.base_doclayout import YoloBox
+from babeldoc.docvision.base_doclayout import YoloResult
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import PageRasterCache
+
+
+def _result(page_number):
+    return YoloResult(
+        names={0: "text", 1: "title"},
+        boxes=[
+            YoloBox(xyxy=np.array([1.0, 2.0, 30.5, 40.0]), conf=np.float32(0.5), cls=0),
+            YoloBox(
+                xyxy=np.array([5.0, 6.0, 7.0, 8.0]),
+                conf=np.float32(0.25 + page_number / 100),
+                cls=1.0,
+            ),
+        ],
+    )
+
+
+class _FakeModel:
+    cache_id = "fake:1"
+
+    def __init__(self):
+        self.calls = []
+
+    def handle_document(self, pages, mupdf_doc, config, save_debug_image):
+        pages = list(pages)
+        self.calls.append([page.page_number for page in pages])
+        for page in pages:
+            yield page, _result(page.page_number)
+
+
+class _FakeRasterCache:
+    def get_image(self, page_number, dpi=72):
+        return np.full((8, 6, 3), page_number % 2, np.uint8)
+
+
+class _FakeConfig:
+    layout_cache = True
+
+    def get_page_raster_cache(self, mupdf_doc):
+        return _FakeRasterCache()
+
+    def raise_if_cancelled(self):
+        pass
+
+
+class _RenderingModel(_FakeModel):
+    """Reads each page's raster like the ONNX model, pulling pages lazily."""
+
+    batch_size = 2
+
+    def handle_document(self, pages, mupdf_doc, config, save_debug_image):
+        raster_cache = config.get_page_raster_cache(mupdf_doc)
+        self.calls.append([])
+        for page in pages:
+            raster_cache.get_image(page.page_number)
+            self.calls[-1].append(page.page_number)
+            yield page, _result(page.page_number)
+
+
+class _RasterConfig(_FakeConfig):
+    def __init__(self, raster_cache):
+        self.raster_cache = raster_cache
+
+    def get_page_raster_cache(self, mupdf_doc):
+        return self.raster_cache
+
+
+def _run(model, page_numbers, debug_pages=None):
+    debug_pages = [] if debug_pages is None else debug_pages
+    pages = [SimpleNamespace(page_number=n) for n in page_numbers]
+    results = layout_cache.handle_document_cached(
+        model,
+        pages,
+        None,
+        _FakeConfig(),
+        lambda _image, _result, page_number: debug_pages.append(page_number),
+    )
+    return {page.page_number: result for page, result in results}
+
+
+class TestLayoutResultCache:
+    def test_roundtrip(self, tmp_path):
+        cache = layout_cache.LayoutResultCache(tmp_path / "layout.db")
+        cache.put("k", _result(0))
+        (restored,) = cache.get_many(["k", "missing"]).values()
+        assert restored.names == {0: "text", 1: "title"}
+        assert [list(box.xyxy) for box in restored.boxes] == [
+            [1.0, 2.0, 30.5, 40.0],
+            [5.0, 6.0, 7.0, 8.0],
+        ]
+        assert [box.conf.item() for box in restored.boxes] == [0.5, 0.25]
+        assert [restored.names[box.cls] for box in restored.boxes] == ["text", "title"]
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        entry_size = len(layout_cache.LayoutResultCache.encode(_result(0)))
+        cache = layout_cache.LayoutResultCache(
+            tmp_path / "layout.db", max_bytes=entry_size * 3
+        )
+        for key in "abc":
+            cache.put(key, _result(0))
+        assert len(cache.get_many(["a"])) == 1
+        cache.put("d", _result(0))
+        reopened = layout_cache.LayoutResultCache(tmp_path / "layout.db")
+        assert sorted(reopened.get_many("abcd")) == ["a", "d"]
+
+    def test_handle_document_skips_cached_pages(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(
+            layout_cache,
+            "layout_cache",
+            layout_cache.LayoutResultCache(tmp_path / "layout.db"),
+        )
+        model = _FakeModel()
+        first = _run(model, [0, 1, 2])
+        debug_pages = []
+        second = _run(model, [0, 1, 2, 3], debug_pages)
+        # pages 2 and 3 share the raster of pages 0 and 1
+        assert model.calls == [[0, 1, 2], []]
+        assert debug_pages == [1, 2, 3, 4]
+        assert second[3].boxes[0].conf == first[1].boxes[0].conf
+
+        model.cache_id = None
+        _run(model, [0])
+        assert model.calls[-1] == [0]
+
+    def test_concurrent_puts(self, tmp_path):
+        cache = layout_cache.LayoutResultCache(tmp_path / "layout.db")
+        threads = [
+            threading.Thread(target=cache.put, args=(str(i), _result(i)))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(cache.get_many(str(i) for i in range(8))) == 8
+
+    def test_pages_beyond_raster_budget_render_once(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(
+            layout_cache,
+            "layout_cache",
+            layout_cache.LayoutResultCache(tmp_path / "layout.db"),
+        )
+        doc = pymupdf.open()
+        for i in range(20):
+            doc.new_page(width=100, height=100).insert_text((10, 50), f"page {i}")
+        pages = [SimpleNamespace(page_number=i) for i in range(20)]
+        model = _RenderingModel()
+
+        def run(page_subset):
+            raster_cache = PageRasterCache(doc, max_bytes=12 * 100 * 100 * 3)
+            results = layout_cache.handle_document_cached(
+                model,
+                page_subset,
+                None,
+                _RasterConfig(raster_cache),
+                lambda _image, _result, _page_number: None,
+            )
+            order = [page.page_number for page, _ in results]
+            return order, raster_cache.render_count
+
+        assert run(pages[::3]) == (list(range(0, 20, 3)), 7)
+        order, render_count = run(pages)
+        assert order == list(range(20))
+        assert render_count == len(pages)
+        assert model.calls[-1] == [i for i in range(20) if i % 3]
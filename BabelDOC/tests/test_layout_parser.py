@@ -0,0 +1,107 @@
+import contextlib
+from types import SimpleNamespace
+
+from babeldoc.docvision.base_doclayout import YoloResult
+from babeldoc.format.pdf.document_il import il_version_1
+from babeldoc.format.pdf.document_il.midend.layout_parser import LayoutParser
+
+
+def _char(x, y, text="a", size=10.0):
+    return il_version_1.PdfCharacter(
+        box=il_version_1.Box(x, y, x + size * 0.5, y + size),
+        pdf_style=il_version_1.PdfStyle(font_size=size),
+        char_unicode=text,
+    )
+
+
+def _page(page_number, chars=(), figures=()):
+    return il_version_1.Page(
+        page_number=page_number,
+        cropbox=il_version_1.Cropbox(box=il_version_1.Box(0, 0, 600, 800)),
+        pdf_character=list(chars),
+        pdf_figure=[il_version_1.PdfFigure(box=il_version_1.Box(*f)) for f in figures],
+    )
+
+
+def _column(x0, x1, y0=100, y1=700):
+    return [_char(x, y) for y in range(y0, y1, 12) for x in range(x0, x1, 5)]
+
+
+class _FakeModel:
+    def __init__(self):
+        self.pages = []
+
+    def handle_document(self, pages, mupdf_doc, config, save_debug_image):
+        for page in pages:
+            self.pages.append(page.page_number)
+            yield page, YoloResult(names={0: "title"}, boxes=[])
+
+
+class _Progress:
+    def advance(self, n):
+        pass
+
+
+def _config(simple_page_layout=True):
+    model = _FakeModel()
+    config = SimpleNamespace(
+        doc_layout_model=model,
+        simple_page_layout=simple_page_layout,
+        layout_cache=False,
+        debug=False,
+        progress_monitor=SimpleNamespace(
+            stage_start=lambda *_: contextlib.nullcontext(_Progress())
+        ),
+        get_page_raster_cache=lambda _doc: None,
+    )
+    return config, model
+
+
+class TestPageClassification:
+    def test_classify(self):
+        parser = LayoutParser(_config()[0])
+        assert parser.classify_page(_page(0)) == LayoutParser.PAGE_EMPTY
+        assert (
+            parser.classify_page(_page(0, [_char(10, 10, " "), _char(20, 10, "\n")]))
+            == LayoutParser.PAGE_EMPTY
+        )
+        assert parser.classify_page(_page(0, _column(50, 550))) == (
+            LayoutParser.PAGE_SIMPLE
+        )
+        two_columns = _column(50, 280) + _column(320, 550)
+        assert parser.classify_page(_page(0, two_columns)) == LayoutParser.PAGE_MODEL
+        with_figure = _page(0, _column(50, 550), [(50, 100, 550, 400)])
+        assert parser.classify_page(with_figure) == LayoutParser.PAGE_MODEL
+        heading = [_char(x, 720, size=18) for x in range(50, 550, 9)]
+        assert parser.classify_page(_page(0, _column(50, 550) + heading)) == (
+            LayoutParser.PAGE_MODEL
+        )
+        footnote_marks = [_char(x, 690, size=6) for x in range(50, 550, 25)]
+        assert parser.classify_page(_page(0, _column(50, 550) + footnote_marks)) == (
+            LayoutParser.PAGE_SIMPLE
+        )
+
+    def test_simple_pages_need_opt_in(self):
+        parser = LayoutParser(_config(simple_page_layout=False)[0])
+        assert parser.classify_page(_page(0, _column(50, 550))) == (
+            LayoutParser.PAGE_MODEL
+        )
+
+    def test_process_short_circuits(self):
+        config, model = _config()
+        docs = il_version_1.Document(
+            page=[
+                _page(0),
+                _page(1, _column(50, 550)),
+                _page(2, _column(50, 280) + _column(320, 550)),
+            ]
+        )
+        parser = LayoutParser(config)
+        parser.process(docs, None)
+        assert model.pages == [2]
+        assert (parser.empty_page_count, parser.simple_page_count) == (1, 1)
+        assert docs.page[0].page_layout == []
+        (layout,) = docs.page[1].page_layout
+        assert layout.class_name == "plain text"
+        assert (layout.box.x, layout.box.y) == (49, 99)
+        assert docs.page[2].page_layout == []
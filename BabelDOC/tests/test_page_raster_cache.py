@@ -0,0 +1,36 @@
+import pymupdf
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import PageRasterCache
+
+
+def _make_doc(page_count=3):
+    doc = pymupdf.open()
+    for _ in range(page_count):
+        doc.new_page(width=200, height=100)
+    return doc
+
+
+class TestPageRasterCache:
+    def test_each_page_rendered_once_per_dpi(self):
+        cache = PageRasterCache(_make_doc())
+        image = cache.get_image(0)
+        assert image.shape == (100, 200, 3)
+        assert cache.get_image(0) is image
+        assert cache.get_size(0) == (200, 100)
+        assert cache.get_size(0, dpi=144) == (400, 200)
+        assert cache.render_count == 2
+        assert cache.hit_count == 2
+
+    def test_rotation_is_ignored_and_restored(self):
+        doc = _make_doc(1)
+        doc[0].set_rotation(90)
+        cache = PageRasterCache(doc)
+        assert cache.get_size(0) == (200, 100)
+        assert doc[0].rotation == 90
+
+    def test_bounded_by_memory(self):
+        page_bytes = 200 * 100 * 3
+        cache = PageRasterCache(_make_doc(), max_bytes=2 * page_bytes)
+        for page_number in range(3):
+            cache.get_image(page_number)
+        cache.get_image(0)
+        assert cache.render_count == 4
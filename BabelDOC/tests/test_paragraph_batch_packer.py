@@ -0,0 +1,136 @@
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import (
+    AdaptiveBatchSizer,
+)
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import (
+    ILTranslatorLLMOnly,
+)
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import LLMBatchStats
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import (
+    ParagraphBatchPacker,
+)
+from babeldoc.format.pdf.document_il.midend.il_translator_llm_only import (
+    ParagraphDeduplicator,
+)
+from babeldoc.translator.translator import LLMOutputTruncatedError
+
+
+class TestParagraphBatchPacker:
+    def test_packs_across_pages(self):
+        submitted = []
+        packer = ParagraphBatchPacker(
+            lambda batch, tokens: submitted.append((batch, tokens))
+        )
+        pages = [
+            [("header", 10), ("body", 30)],
+            [("figure caption", 20)],
+            [("footer", 5), ("long body", 190), ("tail", 3)],
+        ]
+        for page_number, page in enumerate(pages):
+            font_maps = ({"F1": page_number}, {})
+            for text, tokens in page:
+                packer.add(text, None, (text, None), None, tokens, *font_maps)
+        packer.flush()
+
+        assert [batch.paragraphs for batch, _ in submitted] == [
+            ["header", "body", "figure caption", "footer", "long body"],
+            ["tail"],
+        ]
+        assert [tokens for _, tokens in submitted] == [255, 3]
+        first_batch = submitted[0][0]
+        assert [m[0]["F1"] for m in first_batch.font_maps] == [0, 0, 1, 2, 2]
+        assert packer.batch_sizes == [5, 1]
+        assert "2 LLM batches" in packer.get_batch_size_summary()
+
+    def test_paragraph_limit(self):
+        submitted = []
+        packer = ParagraphBatchPacker(
+            lambda batch, _tokens: submitted.append(len(batch.paragraphs))
+        )
+        for i in range(14):
+            packer.add(i, None, (str(i), None), None, 1, {}, {})
+        packer.flush()
+        packer.flush()
+        assert submitted == [6, 6, 2]
+
+
+class TestAdaptiveBatchSizer:
+    def _feed(self, sizer, count, seconds_per_token, waited):
+        for _ in range(count):
+            sizer.on_batch_succeeded(
+                100,
+                {
+                    "request_seconds": seconds_per_token * 100,
+                    "rate_limit_wait_seconds": 1.0 if waited else 0.0,
+                },
+            )
+
+    def test_grows_while_rate_limited(self):
+        sizer = AdaptiveBatchSizer("ko", max_output_tokens=65536)
+        self._feed(sizer, 4, 0.01, waited=True)
+        assert sizer.get_limits() == (300, 7)
+        self._feed(sizer, 4, 0.01, waited=False)
+        assert sizer.tokens == 300
+        self._feed(sizer, 4, 0.05, waited=True)
+        assert sizer.tokens == 200
+
+    def test_shrinks_on_failure_and_respects_output_budget(self):
+        sizer = AdaptiveBatchSizer("ko", max_output_tokens=1024, initial_tokens=800)
+        # 1024 * 0.8 / (2.0 + 20 / 40)
+        assert sizer.tokens == 327
+        sizer.on_batch_failed(LLMOutputTruncatedError())
+        assert sizer.tokens == 163
+        for _ in range(5):
+            sizer.on_batch_failed(ValueError())
+        assert sizer.tokens == sizer.min_tokens
+
+    def test_packer_uses_sizer_limits(self):
+        sizer = AdaptiveBatchSizer("en", max_output_tokens=8192, initial_tokens=50)
+        submitted = []
+        packer = ParagraphBatchPacker(
+            lambda _batch, tokens: submitted.append(tokens), batch_sizer=sizer
+        )
+        for _ in range(4):
+            packer.add("p", None, ("p", None), None, 30, {}, {})
+        assert submitted == [60, 60]
+
+
+class TestParagraphDeduplicator:
+    def test_single_flight(self):
+        dedup = ParagraphDeduplicator()
+        key = ("Copyright 2024", "footer", None)
+        assert dedup.join(key, "page 1") is ParagraphDeduplicator.LEAD
+        assert dedup.join(key, "page 2") is ParagraphDeduplicator.FOLLOW
+        assert dedup.join(key, "page 3") is ParagraphDeduplicator.FOLLOW
+        assert dedup.resolve(key, "저작권 2024") == ["page 2", "page 3"]
+        assert dedup.join(key, "page 4") == "저작권 2024"
+        assert dedup.duplicate_count == 3
+
+    def test_failed_leader_releases_followers(self):
+        dedup = ParagraphDeduplicator()
+        key = ("Header", "title", None)
+        assert dedup.join(key, "page 1") is ParagraphDeduplicator.LEAD
+        assert dedup.join(key, "page 2") is ParagraphDeduplicator.FOLLOW
+        assert dedup.abandon(key) == ["page 2"]
+        assert dedup.join(key, "page 3") is ParagraphDeduplicator.LEAD
+
+
+class TestLLMOutputSalvage:
+    def test_salvages_items_of_truncated_output(self):
+        output = (
+            '[{"id": 0, "output": "가 {v1}"}, {"id": 1, "output": "나"}, '
+            '{"id": 2, "output": "다 미완'
+        )
+        items = ILTranslatorLLMOnly._salvage_json_items(output)
+        assert items == [{"id": 0, "output": "가 {v1}"}, {"id": 1, "output": "나"}]
+
+    def test_nothing_to_salvage(self):
+        assert ILTranslatorLLMOnly._salvage_json_items("Sorry, I can't") == []
+        assert ILTranslatorLLMOnly._salvage_json_items('{"output": "x"}') == []
+
+    def test_batch_stats_rates(self):
+        stats = LLMBatchStats()
+        stats.record(batches=2, items=10)
+        stats.record(retried_items=3, fallback_items=1)
+        assert stats.retry_rate == 0.3
+        assert stats.fallback_rate == 0.1
+        assert "retry rate 30.0%" in stats.get_summary()
@@ -0,0 +1,40 @@
+import pytest
+from babeldoc.translator.cache import ParagraphTranslationCache
+from babeldoc.translator.cache import TranslationCache
+from babeldoc.translator.cache import clean_test_db
+from babeldoc.translator.cache import init_test_db
+
+
+@pytest.fixture
+def test_db():
+    test_db = init_test_db()
+    yield test_db
+    clean_test_db(test_db)
+
+
+class TestParagraphTranslationCache:
+    def test_key_normalizes_whitespace(self):
+        cache = ParagraphTranslationCache(TranslationCache("gemini", {"model": "m"}))
+        assert cache.make_key("Hello   <b1>world</b1>\n") == cache.make_key(
+            "Hello <b1>world</b1>"
+        )
+
+    def test_key_depends_on_signature_and_glossary(self):
+        cache = ParagraphTranslationCache(TranslationCache("gemini", {"model": "m"}))
+        base = cache.make_key("text", {"layout_label": "plain text"})
+        assert base != cache.make_key("text", {"layout_label": "title"})
+        assert base != cache.make_key(
+            "text", {"layout_label": "plain text"}, [("g", "text", "텍스트")]
+        )
+
+    def test_separate_from_prompt_cache(self, test_db):
+        translation_cache = TranslationCache("gemini", {"model": "m"})
+        cache = ParagraphTranslationCache(translation_cache)
+        key = cache.make_key("Hello world")
+        cache.set(key, "안녕 세상")
+        assert cache.get(key) == "안녕 세상"
+        assert translation_cache.get(key) is None
+        other_model = ParagraphTranslationCache(
+            TranslationCache("gemini", {"model": "other"})
+        )
+        assert other_model.get(key) is None
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import time
+
+from babeldoc.translator import translator
+from babeldoc.translator.translator import RateLimiter
+from babeldoc.translator.translator import RequestHedger
+
+
+class TestRateLimiter:
+    def test_burst_then_steady_rate(self):
+        limiter = RateLimiter(max_qps=20, burst=5)
+        waits = [limiter._reserve(0) for _ in range(7)]
+        assert all(w <= 0 for w in waits[:5])
+        assert waits[5] > 0
+        assert abs((waits[6] - waits[5]) - 1 / 20) < 0.01
+
+    def test_rpm_and_qps_use_the_lower_rate(self):
+        limiter = RateLimiter(max_qps=10, rpm=60)
+        assert limiter.max_qps == 1
+
+    def test_tpm_budget_delays_large_requests(self):
+        limiter = RateLimiter(max_qps=100, tpm=60_000, burst=1)
+        assert limiter._reserve(500) <= 0
+        # 1000 tokens per second: the next 500 token request waits about 0.5s
+        assert 0.4 < limiter._reserve(500) < 0.6
+
+    def test_rate_limit_backoff_and_recovery(self):
+        limiter = RateLimiter(max_qps=100, recovery_step=0.25)
+        limiter.on_rate_limited(retry_after=0.2)
+        # the second error from the same burst does not shrink the rate again
+        limiter.on_rate_limited(retry_after=0.2)
+        assert limiter.rate_factor == 0.5
+        assert limiter.rate_limited_count == 2
+        assert limiter._reserve(0) > 0.15
+        limiter.on_success()
+        limiter.on_success()
+        limiter.on_success()
+        assert limiter.rate_factor == 1.0
+
+    def test_wait_does_not_sleep_under_lock(self):
+        limiter = RateLimiter(max_qps=10, burst=1)
+        limiter.wait()
+        start = time.monotonic()
+        wait = limiter._reserve(0)
+        # reserving from another caller is immediate even though a wait is pending
+        assert time.monotonic() - start < 0.05
+        assert wait > 0
+
+    def test_try_acquire_only_takes_free_slots(self):
+        limiter = RateLimiter(max_qps=10, burst=1)
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        # a refused hedge does not delay regular requests
+        assert limiter._reserve(0) < 0.11
+
+
+def _trained_hedger(monkeypatch, **kwargs):
+    monkeypatch.setattr(
+        translator, "_translate_rate_limiter", RateLimiter(max_qps=1000, burst=100)
+    )
+    hedger = RequestHedger(min_samples=5, **kwargs)
+    for _ in range(5):
+        hedger.record(0.05)
+    return hedger
+
+
+class TestRequestHedger:
+    def test_straggler_is_hedged(self, monkeypatch):
+        hedger = _trained_hedger(monkeypatch, max_ratio=1.0)
+        calls = []
+        lock = threading.Lock()
+
+        def fn(_text, params):
+            with lock:
+                calls.append(params)
+                first = len(calls) == 1
+            time.sleep(2 if first else 0.01)
+            return "first" if first else "hedge"
+
+        start = time.monotonic()
+        result, seconds = hedger.call(fn, "text", {"paragraph_token_count": 3}, 0)
+        assert time.monotonic() - start < 1
+        assert result == "hedge"
+        # only the hedge's own latency, not the delay before it was sent
+        assert seconds < 0.05
+        assert calls[0] is not calls[1]
+        assert (hedger.hedged_count, hedger.hedge_win_count) == (1, 1)
+
+    def test_queue_time_does_not_trigger_hedge(self, monkeypatch):
+        hedger = _trained_hedger(monkeypatch, max_ratio=1.0)
+        executor = translator.concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(translator, "_hedge_executor", executor)
+        executor.submit(time.sleep, 0.3)
+
+        def fn(text, _params):
+            time.sleep(0.01)
+            return text
+
+        assert hedger.call(fn, "text", None, 0)[0] == "text"
+        assert hedger.hedged_count == 0
+        executor.shutdown()
+
+    def test_runs_on_caller_thread_without_budget(self, monkeypatch):
+        hedger = _trained_hedger(monkeypatch, max_ratio=0.5)
+        threads = []
+
+        def fn(text, _params):
+            threads.append(threading.current_thread())
+            return text
+
+        assert hedger.call(fn, "text", None, 0)[0] == "text"
+        assert threads == [threading.current_thread()]
+
+    def test_unusable_response_does_not_win(self, monkeypatch):
+        hedger = _trained_hedger(monkeypatch, max_ratio=1.0)
+        calls = []
+        lock = threading.Lock()
+
+        def fn(_text, _params):
+            with lock:
+                calls.append(None)
+                first = len(calls) == 1
+            time.sleep(0.3 if first else 0.01)
+            return '{"id": 0}' if first else '{"id": 0, "out'
+
+        result, seconds = hedger.call(fn, "text", None, 0, validate=json.loads)
+        assert result == '{"id": 0}'
+        assert seconds >= 0.3
+        assert (hedger.hedged_count, hedger.hedge_win_count) == (1, 0)
+
+    def test_budget_and_async(self, monkeypatch):
+        hedger = _trained_hedger(monkeypatch, max_ratio=0.5)
+        attempts = []
+
+        async def fn(text, _params):
+            attempts.append(text)
+            await asyncio.sleep(0.2 if len(attempts) == 1 else 0.01)
+            return text
+
+        async def run():
+            # one request is not enough budget for a hedge at 50%
+            assert (await hedger.async_call(fn, "a", None, 0))[0] == "a"
+            assert attempts == ["a"]
+            attempts.clear()
+            return await hedger.async_call(fn, "b", None, 0)
+
+        assert asyncio.run(run())[0] == "b"
+        assert attempts == ["b", "b"]
+        assert hedger.hedged_count == 1
+        assert "1 of 2 requests hedged" in hedger.get_summary()
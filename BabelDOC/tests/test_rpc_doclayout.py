@@ -0,0 +1,187 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import cv2
+import msgpack
+import numpy as np
+import pytest
+from babeldoc.docvision import rpc_doclayout
+from babeldoc.docvision.rpc_doclayout import AnalyzeLayoutProtocol
+from babeldoc.docvision.rpc_doclayout import RpcDocLayoutModel
+from babeldoc.docvision.rpc_doclayout import RpcLayoutError
+from babeldoc.docvision.rpc_doclayout2 import RpcDocLayoutModel as PaddleRpcModel
+
+
+class LocalLayoutServer:
+    """Stand-in for the MOSEC, PaddleX and OCR matching layout services.
+
+    Every page gets one box at a fixed place of the uploaded image, so tests
+    can check how boxes are mapped back to the page.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.failures = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                server.requests.append((self.path, self.headers, body))
+                if server.failures:
+                    self._reply(server.failures.pop(0), b"busy", "text/plain")
+                elif self.path.startswith("/analyze"):
+                    self._reply(200, json.dumps(server.analyze()).encode(), "json")
+                else:
+                    payload = server.inference(msgpack.unpackb(body))
+                    self._reply(200, msgpack.packb(payload), "msgpack")
+
+            def _reply(self, status, content, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def inference(self, body):
+        images = [cv2.imdecode(np.frombuffer(i, np.uint8), 1) for i in body["image"]]
+        if "imgsz" in body:
+            assert all(image.shape[:2] == (800, 800) for image in images)
+            return [
+                {
+                    "boxes": [{"xyxy": [20, 40, 220, 440], "conf": 0.9, "cls": 0}],
+                    "names": {"0": "text"},
+                }
+                for _ in images
+            ]
+        (image,) = images
+        return {
+            "boxes": [
+                {"coordinate": [150, 150, 300, 300], "score": 0.9, "label": "title"},
+                {"coordinate": [0, 0, 10, 10], "score": 0.5, "label": "text"},
+                {"coordinate": [0, 0, 150, 150], "score": 0.8, "label": "table"},
+            ]
+        }
+
+    def analyze(self):
+        return {
+            "boxes": [
+                {
+                    "coords": [150, 150, 300, 300],
+                    "ocr_match_score": 0.95,
+                    "label": "text",
+                }
+            ]
+        }
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(RpcDocLayoutModel, "RETRY_MIN_WAIT_SECONDS", 0)
+    monkeypatch.setattr(RpcDocLayoutModel, "RETRY_MAX_WAIT_SECONDS", 0)
+    server = LocalLayoutServer()
+    yield server
+    server.close()
+
+
+def _xyxy(result):
+    return [np.asarray(box.xyxy).tolist() for box in result.boxes]
+
+
+class _FakeRasterCache:
+    def get_image(self, page_number, dpi=72):
+        side = 300 if dpi == 150 else 400
+        return np.full((side, side * 2 // 3, 3), page_number, np.uint8)
+
+
+class _FakeConfig:
+    def get_page_raster_cache(self, mupdf_doc):
+        return _FakeRasterCache()
+
+    def raise_if_cancelled(self):
+        pass
+
+
+class TestRpcDocLayoutModel:
+    def test_batches_pages_over_kept_alive_connections(self, server):
+        model = RpcDocLayoutModel(
+            server.host, concurrency=2, batch_size=4, image_format="png"
+        )
+        images = [np.full((400, 400, 3), 255, np.uint8) for _ in range(6)]
+        for _ in range(3):
+            results = model.predict(images)
+            assert [_xyxy(result) for result in results] == [
+                [[10.0, 20.0, 110.0, 220.0]]
+            ] * 6
+            assert results[0].names == {0: "text"}
+        assert len(server.requests) == 6
+        assert server.connections <= 2
+        model.close()
+
+    def test_paddle_protocol_retries_server_errors(self, server):
+        server.failures = [503, 429]
+        model = PaddleRpcModel(server.host, image_format="webp", image_quality=80)
+        (result,) = model.predict(np.full((300, 200, 3), 255, np.uint8))
+        assert len(server.requests) == 3
+        # boxes come back on the 72 DPI raster, low scores are dropped
+        assert _xyxy(result) == [[72.0, 72.0, 144.0, 144.0], [0.0, 0.0, 72.0, 72.0]]
+        assert [result.names[box.cls] for box in result.boxes] == ["title", "table"]
+        model.close()
+
+    def test_client_errors_are_not_retried(self, server):
+        server.failures = [400]
+        model = RpcDocLayoutModel(server.host)
+        with pytest.raises(RpcLayoutError):
+            model.predict(np.full((400, 400, 3), 255, np.uint8))
+        assert len(server.requests) == 1
+        model.close()
+
+    def test_handle_document_keeps_page_order(self, server):
+        model = RpcDocLayoutModel(
+            server.host, protocol=AnalyzeLayoutProtocol(), concurrency=3
+        )
+        pages = [SimpleNamespace(page_number=i) for i in range(7)]
+        debug_pages = []
+        results = list(
+            model.handle_document(
+                pages,
+                None,
+                _FakeConfig(),
+                lambda _image, _result, page_number: debug_pages.append(page_number),
+            )
+        )
+        assert [page.page_number for page, _ in results] == list(range(7))
+        assert debug_pages == list(range(1, 8))
+        assert _xyxy(results[0][1]) == [[72.0, 72.0, 144.0, 144.0]]
+        path, headers, body = server.requests[0]
+        assert path.startswith("/analyze?min_sim=0.7")
+        assert b'filename="image.jpg"' in body
+        model.close()
+
+    def test_rejects_unknown_image_format(self):
+        with pytest.raises(ValueError):
+            rpc_doclayout.RpcDocLayoutModel(image_format="bmp")
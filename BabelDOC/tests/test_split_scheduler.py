@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pymupdf
+import pytest
+from babeldoc.format.pdf import high_level
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import PageRasterCache
+from babeldoc.format.pdf.document_il.utils.mupdf_helper import mupdf_lock
+from babeldoc.format.pdf.split_manager import SplitPartScheduler
+from babeldoc.format.pdf.translation_config import TranslateResult
+from babeldoc.format.pdf.translation_config import TranslationConfig
+from babeldoc.format.pdf.translation_config import WatermarkOutputMode
+from babeldoc.progress_monitor import ProgressMonitor
+
+
+class TestSplitPartScheduler:
+    def test_translation_turns_follow_part_order(self):
+        scheduler = SplitPartScheduler(total_parts=4, max_parts_in_flight=3)
+        scheduler.scanned_detection_done()
+        order = []
+        running = set()
+        max_running = 0
+        lock = threading.Lock()
+
+        def translate_part(i):
+            nonlocal max_running
+            with lock:
+                running.add(i)
+                max_running = max(max_running, len(running))
+            # later parts finish parsing first
+            time.sleep(0.05 * (4 - i))
+            with scheduler.translation_turn(i):
+                order.append(i)
+            with lock:
+                running.discard(i)
+            return f"part{i}"
+
+        results = scheduler.run([0, 1, 2, 3], translate_part)
+        assert order == [0, 1, 2, 3]
+        assert results == {i: f"part{i}" for i in range(4)}
+        assert 1 < max_running <= 3
+
+    def test_skipped_part_does_not_block_later_turns(self):
+        scheduler = SplitPartScheduler(total_parts=3, max_parts_in_flight=3)
+        scheduler.scanned_detection_done()
+        order = []
+
+        def translate_part(i):
+            if i == 1:
+                return None
+            with scheduler.translation_turn(i):
+                order.append(i)
+            return i
+
+        assert scheduler.run([0, 1, 2], translate_part) == {0: 0, 1: None, 2: 2}
+        assert order == [0, 2]
+
+    def test_later_parts_wait_for_scanned_detection(self):
+        scheduler = SplitPartScheduler(total_parts=2, max_parts_in_flight=2)
+        events = []
+
+        def translate_part(i):
+            scheduler.wait_scanned_detection(i)
+            events.append(f"start{i}")
+            if i == 0:
+                time.sleep(0.05)
+                events.append("detected")
+                scheduler.scanned_detection_done()
+            return i
+
+        scheduler.run([0, 1], translate_part)
+        assert events.index("detected") < events.index("start1")
+
+    def test_failure_aborts_waiting_parts(self):
+        scheduler = SplitPartScheduler(total_parts=3, max_parts_in_flight=3)
+        scheduler.scanned_detection_done()
+
+        def translate_part(i):
+            if i == 0:
+                time.sleep(0.05)
+                raise ValueError("part 0 failed")
+            with scheduler.translation_turn(i):
+                return i
+
+        with pytest.raises(ValueError, match="part 0 failed"):
+            scheduler.run([0, 1, 2], translate_part)
+
+
+class TestSplitDoTranslate:
+    def test_parts_overlap_only_in_translation_turns(self, monkeypatch, tmp_path):
+        input_file = tmp_path / "input.pdf"
+        doc = pymupdf.open()
+        for i in range(6):
+            doc.new_page(width=200, height=100).insert_text((10, 50), f"page {i}")
+        doc.save(input_file)
+        config = TranslationConfig(
+            translator=None,
+            input_file=input_file,
+            lang_in="en",
+            lang_out="zh",
+            doc_layout_model=object(),
+            output_dir=tmp_path / "output",
+            working_dir=tmp_path / "working",
+            no_dual=True,
+            watermark_output_mode=WatermarkOutputMode.NoWatermark,
+            split_strategy=TranslationConfig.create_max_pages_per_part_split_strategy(
+                2
+            ),
+            skip_scanned_detection=True,
+            max_parts_in_flight=3,
+        )
+        lock = threading.Lock()
+        in_mupdf = set()
+        in_turn = set()
+        overlaps = []
+        part_texts = {}
+
+        def mupdf_work(part_index):
+            assert mupdf_lock._is_owned()
+            with lock:
+                in_mupdf.add(part_index)
+                overlaps.append((len(in_mupdf), bool(in_turn)))
+            time.sleep(0.03)
+            with lock:
+                in_mupdf.discard(part_index)
+
+        # Stands in for the stages of a part: MuPDF work around the turn.
+        def translate_document(part_config, part_scheduler=None, part_index=0):
+            mupdf_work(part_index)
+            part_doc = pymupdf.open(part_config.input_file)
+            PageRasterCache(part_doc).get_image(0)
+            part_texts[part_index] = [page.get_text().strip() for page in part_doc]
+            with high_level._translation_turn(part_scheduler, part_index):
+                assert not mupdf_lock._is_owned()
+                with lock:
+                    in_turn.add(part_index)
+                time.sleep(0.1)
+                with lock:
+                    in_turn.discard(part_index)
+            mupdf_work(part_index)
+            mono_pdf_path = part_config.get_output_file_path("part.mono.pdf")
+            part_doc.save(mono_pdf_path)
+            return TranslateResult(mono_pdf_path, None)
+
+        monkeypatch.setattr(high_level, "_translate_document", translate_document)
+        with ProgressMonitor(high_level.get_translation_stage(config)) as pm:
+            high_level.do_translate(pm, config)
+
+        # MuPDF work never overlaps, but it does overlap other parts' turns
+        assert len(overlaps) == 6
+        assert all(count == 1 for count, _ in overlaps)
+        assert any(turn_running for _, turn_running in overlaps)
+        assert part_texts == {
+            i: [f"page {2 * i}", f"page {2 * i + 1}"] for i in range(3)
+        }
@@ -0,0 +1,40 @@
+from babeldoc.translator.tokenizer import LocalTokenizer
+from babeldoc.translator.tokenizer import estimate_token_count
+
+
+class TestLocalTokenizer:
+    def test_count_tokens_many_matches_single(self):
+        tokenizer = LocalTokenizer()
+        texts = ["Hello world", None, "", "번역할 문장입니다.", "Hello world"]
+        assert tokenizer.count_tokens_many(texts) == [
+            tokenizer.count_tokens(t) for t in texts
+        ]
+        assert tokenizer.count_tokens_many(texts)[1:3] == [0, 0]
+
+    def test_calibrate_scales_counts(self):
+        tokenizer = LocalTokenizer()
+        calls = []
+
+        def remote_count_tokens(text):
+            calls.append(text)
+            return tokenizer.count_tokens(text) * 2
+
+        samples = [f"sample paragraph number {i}" for i in range(20)]
+        calibrated = tokenizer.calibrate(remote_count_tokens, samples, max_samples=4)
+        assert len(calls) == 4
+        assert calibrated.scale == 2.0
+        assert calibrated.count_tokens("some text") == 2 * tokenizer.count_tokens(
+            "some text"
+        )
+
+    def test_calibrate_failure_keeps_tokenizer(self):
+        tokenizer = LocalTokenizer()
+
+        def remote_count_tokens(_text):
+            raise RuntimeError("offline")
+
+        assert tokenizer.calibrate(remote_count_tokens, ["text"]) is tokenizer
+
+    def test_estimate_token_count(self):
+        assert estimate_token_count("abcd") == 1
+        assert estimate_token_count("漢字") == 2
@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+import pytest
+from babeldoc.translator import cache as cache_module
+from babeldoc.translator.cache import TranslationCache
+from babeldoc.translator.cache import clean_test_db
+from babeldoc.translator.cache import flush_cache
+from babeldoc.translator.cache import init_test_db
+
+
+@pytest.fixture
+def test_db():
+    test_db = init_test_db()
+    yield test_db
+    clean_test_db(test_db)
+
+
+class TestTranslationCache:
+    def test_set_is_written_in_background(self, test_db):
+        cache = TranslationCache("gemini", {"model": "m"})
+        for i in range(100):
+            cache.set(f"text {i}", f"translation {i}")
+        # served from memory before the writer commits
+        assert cache.get("text 5") == "translation 5"
+        flush_cache()
+        assert cache_module._TranslationCache.select().count() == 100
+        cache_module._memory_cache.clear()
+        assert cache.get("text 42") == "translation 42"
+        assert TranslationCache("gemini", {"model": "other"}).get("text 42") is None
+
+    def test_prefetch(self, test_db):
+        cache = TranslationCache("gemini", {"model": "m"})
+        cache.set("a", "A")
+        cache.set("b", "B")
+        flush_cache()
+        cache_module._memory_cache.clear()
+        assert cache.prefetch(["a", "b", "c", "a"]) == {"a": "A", "b": "B"}
+        # hits and misses are now answered from memory
+        test_db.drop_tables([cache_module._TranslationCache])
+        assert cache.get("a") == "A"
+        assert cache.get("c") is None
+        test_db.create_tables([cache_module._TranslationCache])
+
+    def test_migrates_v1_db(self, test_db, tmp_path):
+        v1_db_path = tmp_path / "cache.v1.db"
+        v1_db = sqlite3.connect(v1_db_path)
+        v1_db.execute(
+            "CREATE TABLE _translationcache (id INTEGER PRIMARY KEY, "
+            "translate_engine VARCHAR(20), translate_engine_params TEXT, "
+            "original_text TEXT, translation TEXT)"
+        )
+        params = json.dumps({"lang_in": "en", "model": "m"})
+        v1_db.executemany(
+            "INSERT INTO _translationcache (translate_engine, "
+            "translate_engine_params, original_text, translation) "
+            "VALUES (?, ?, ?, ?)",
+            [("gemini", params, f"text {i}", f"translation {i}") for i in range(5)],
+        )
+        v1_db.commit()
+        v1_db.close()
+
+        assert cache_module._migrate_v1_db(v1_db_path, chunk_size=2) == 5
+        assert not v1_db_path.exists()
+        cache = TranslationCache("gemini", {"model": "m", "lang_in": "en"})
+        assert cache.get("text 3") == "translation 3"
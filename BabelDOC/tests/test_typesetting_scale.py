@@ -0,0 +1,70 @@
+import pymupdf
+import pytest
+from babeldoc.format.pdf.document_il import il_version_1
+from babeldoc.format.pdf.document_il.midend import typesetting as typesetting_module
+from babeldoc.format.pdf.document_il.midend.typesetting import Typesetting
+from babeldoc.format.pdf.document_il.midend.typesetting import TypesettingUnit
+from babeldoc.format.pdf.document_il.utils import il_codec
+
+
+def _units(text):
+    font = pymupdf.Font("helv")
+    style = il_version_1.PdfStyle(
+        font_id="base", font_size=10, graphic_state=il_version_1.GraphicState()
+    )
+    return [
+        TypesettingUnit(unicode=c, font=font, font_size=10, style=style, xobj_id=0)
+        for c in text
+    ]
+
+
+class TestTypesettingScaleSearch:
+    def test_first_fit_matches_linear_scan(self):
+        for size in range(1, 12):
+            for threshold in range(size + 1):
+                expected = threshold if threshold < size else None
+                for probe in range(size):
+                    calls = []
+
+                    def fits(i, threshold=threshold, calls=calls):
+                        calls.append(i)
+                        return i >= threshold
+
+                    assert Typesetting._first_fit(0, size - 1, probe, fits) == expected
+                    assert len(calls) <= size.bit_length() + 2
+
+    def test_break_widths_match_suffix_scan(self):
+        units = _units("hello, wide world of typesetting")
+        typesetting = Typesetting.__new__(Typesetting)
+        widths = typesetting._get_break_widths(units)
+        for i in range(len(units)):
+            expected = 0
+            if not units[i].can_break_line:
+                for unit in units[i:]:
+                    if unit.can_break_line:
+                        break
+                    expected += unit.width
+            assert widths[i] == pytest.approx(expected)
+
+
+class TestTypesettingWorker:
+    def test_scale_fit_cache_is_per_task(self, monkeypatch):
+        # paragraph ids in the cache keys do not outlive a worker task
+        entries = []
+
+        def fake_typeset(page, *_args):
+            entries.append(dict(typesetting._scale_fit_cache))
+            typesetting._scale_fit_cache[(id(page), 1)] = True
+            return []
+
+        typesetting = Typesetting.__new__(Typesetting)
+        typesetting._scale_fit_cache = {("stale",): True}
+        typesetting.preprocess_page = fake_typeset
+        typesetting.render_page = fake_typeset
+        monkeypatch.setattr(typesetting_module, "_worker_typesetting", typesetting)
+
+        data = il_codec.dumps(il_version_1.Page())
+        assert typesetting_module._preprocess_page_in_worker(data) == []
+        typesetting_module._render_page_in_worker(data, [])
+        assert entries == [{}, {}]
+        assert typesetting._scale_fit_cache == {}
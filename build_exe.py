@@ -44,6 +44,7 @@ def build_portable_exe():
     # --add-data '원본경로;대상경로' 형식으로 .exe 파일 내에 포함될 파일을 지정합니다.
     pyinstaller_args.extend(['--add-data', 'BabelDOC/babeldoc/assets;babeldoc/assets'])
     pyinstaller_args.extend(['--add-data', 'config.json;.'])
+    pyinstaller_args.extend(['--add-data', 'tiktoken_data;tiktoken_data'])
     
     
 
@@ -56,7 +57,6 @@ def build_portable_exe():
         'google.api_core.exceptions', 'google.api_core.future', 'google.api_core.gapic_v1',
         'google.api_core.grpc_helpers', 'google.api_core.path_template',
         'customtkinter', 'PIL', 'darkdetect',
-        'flask', 'werkzeug', 'jinja2', 'itsdangerous', 'click',
         'keyring.backends.Windows', 'keyring.backends.SecretService', 'keyring.backends.macOS',
         'babeldoc', 're', 'pkg_resources'
     ]
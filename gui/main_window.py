@@ -11,14 +11,14 @@ from pathlib import Path
 import re
 import asyncio
 import logging
+import multiprocessing
 from types import SimpleNamespace
 
 # Import BabelDOC modules directly
 from babeldoc.format.pdf.high_level import async_translate, init as babeldoc_init
 from babeldoc.format.pdf.translation_config import TranslationConfig, WatermarkOutputMode
-from babeldoc.translator.translator import OpenAITranslator, set_translate_rate_limiter
+from babeldoc.translator.translator import GeminiTranslator, OpenAITranslator, set_translate_rate_limiter
 from babeldoc.docvision.doclayout import DocLayoutModel
-from babeldoc.translator.gemini_bridge import start_gemini_bridge
 from babeldoc.glossary import Glossary
 
 # Configure logging to avoid conflicts with BabelDOC's internal logging
@@ -269,7 +269,11 @@ class PDFTranslatorGUI:
             args.no_dual = False
             args.no_mono = False
             args.debug = False # Set to True for more verbose logging
-            args.qps = 0.25 # Default QPS for Gemini free tier
+            # Free tier quotas of the selected model from config.json
+            rate_limits = self.config.get("rate_limits", {}).get(args.gemini_model, {})
+            args.rpm = rate_limits.get("rpm", 15)
+            args.tpm = rate_limits.get("tpm")
+            args.qps = args.rpm / 60
             args.gemini_qps = args.qps # Ensure gemini_qps is also set
             args.pages = None
             args.min_text_length = 5
@@ -298,7 +302,7 @@ class PDFTranslatorGUI:
             args.primary_font_family = None
             args.only_include_translated_page = False
             args.save_auto_extracted_glossary = False
-            args.openai = False # Will be set to True if gemini bridge starts
+            args.openai = False
             args.openai_model = None
             args.openai_base_url = None
             args.openai_api_key = None
@@ -313,37 +317,22 @@ class PDFTranslatorGUI:
             self.root.after(0, self.update_log, f"AI 모델: {args.gemini_model}\n")
             self.root.after(0, self.update_log, f"출력 형식: {self.output_format.get()}\n\n")
 
-            # --- Gemini 브릿지 실행 로직 (babeldoc.main.py에서 가져옴) ---
+            # Instantiate translator
             if args.gemini:
-                self.root.after(0, self.update_log, "Gemini 모드가 활성화되었습니다. 로컬 브릿지 서버를 시작합니다...\n")
-                
                 if not args.gemini_api_key:
                     self.root.after(0, lambda: messagebox.showerror("오류", "Gemini API 키가 필요합니다."))
                     raise ValueError("Gemini API key is required.")
-                
-                try:
-                    base_url, port = start_gemini_bridge(
-                        api_key=args.gemini_api_key, 
-                        model=args.gemini_model, 
-                        qps=args.qps
-                    )
-                    
-                    args.openai = True
-                    args.openai_base_url = base_url
-                    args.openai_api_key = "DUMMY_KEY_FOR_BRIDGE"
-                    args.openai_model = args.gemini_model
-                    
-                    
-                    self.root.after(0, self.update_log, f"✅ Gemini 브릿지 서버가 {base_url} 에서 성공적으로 시작되었습니다.\n")
-                    self.root.after(0, self.update_log, "BabelDOC이 이 로컬 서버를 통해 번역을 진행합니다.\n")
-
-                except Exception as e:
-                    self.root.after(0, self.update_log, f"❌ Gemini 브릿지 서버 시작에 실패했습니다: {e}\n")
-                    self.root.after(0, lambda: messagebox.showerror("오류", f"Gemini 브릿지 서버 시작 실패: {e}"))
-                    raise
 
-            # Instantiate translator
-            if args.openai: # Now args.openai should be True if Gemini bridge started
+                # GeminiTranslator는 로컬 브릿지 없이 Gemini API와 직접 통신합니다.
+                translator = GeminiTranslator(
+                    lang_in="en", # BabelDOC's default, can be made configurable if needed
+                    lang_out=args.lang_out,
+                    model=args.gemini_model,
+                    api_key=args.gemini_api_key,
+                    ignore_cache=False, # Can be made configurable
+                )
+                self.root.after(0, self.update_log, "Gemini 모드가 활성화되었습니다. Gemini API와 직접 통신합니다.\n")
+            elif args.openai:
                 translator = OpenAITranslator(
                     lang_in="en", # BabelDOC's default, can be made configurable if needed
                     lang_out=args.lang_out,
@@ -353,11 +342,11 @@ class PDFTranslatorGUI:
                     ignore_cache=False, # Can be made configurable
                 )
             else:
-                self.root.after(0, lambda: messagebox.showerror("오류", "번역 서비스를 선택하거나 Gemini 브릿지 시작에 실패했습니다."))
-                raise ValueError("No translation service selected or Gemini bridge failed.")
+                self.root.after(0, lambda: messagebox.showerror("오류", "번역 서비스를 선택하세요."))
+                raise ValueError("No translation service selected.")
 
             # Set translation rate limit
-            set_translate_rate_limiter(args.qps)
+            set_translate_rate_limiter(rpm=args.rpm, tpm=args.tpm)
 
             # Initialize document layout model
             doc_layout_model = DocLayoutModel.load_onnx()
@@ -450,5 +439,8 @@ class PDFTranslatorGUI:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    # Typesetting and PDF saving start worker processes; the frozen exe must
+    # not open another window in them.
+    multiprocessing.freeze_support()
     app = PDFTranslatorGUI()
     app.run()